@@ -0,0 +1,166 @@
+"""Resized, compressed image variants for the login page, served as static files.
+
+`python assets.py` (or the first page load after a source image changes) writes WebP and,
+where Pillow supports it, AVIF variants of every image in ASSETS at its display widths
+(1x and 2x) into static/assets/, plus a manifest. File names carry a content hash, so a
+CDN or reverse proxy in front of /app/static/ can cache them as immutable; Streamlit itself
+serves them with ETag / Last-Modified, so browsers revalidate with a 304 instead of
+re-downloading.
+
+Pages call render_asset(name): it emits a <picture> with srcset pointing at the static
+files, or, when static serving is off or the variants could not be built, falls back to
+st.image with the source bytes read once per process.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import streamlit as st
+
+# === CONFIGURATION ===
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_ROOT, "static")
+OUTPUT_DIR = os.path.join(STATIC_DIR, "assets")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "manifest.json")
+STATIC_URL = "app/static/assets"
+QUALITY = {"webp": 80, "avif": 60}
+
+# name -> (source file, CSS display widths in px); each width is also built at 2x for high-DPI screens.
+ASSETS = {
+    "ganesh_logo": ("Ganesh_logo.png", [500]),
+    "prk_logo": ("PRK_logo.jpg", [480]),
+    "excellent_logo": ("Excellent_logo.jpg", [480]),
+    "payment_qr": ("Qr logo.jpg", [250]),
+}
+
+# === BUILDING ===
+
+def _formats():
+    from PIL import features
+    return ["avif", "webp"] if features.check("avif") else ["webp"]
+
+def build_asset(name, source, widths, formats):
+    """Writes the variants of one image and returns its manifest entry (None if the source is missing)."""
+    from PIL import Image
+    source_path = os.path.join(APP_ROOT, source)
+    if not os.path.exists(source_path):
+        return None
+    with open(source_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    with Image.open(source_path) as image:
+        image.load()
+        natural_width, natural_height = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        variants = []
+        pixel_widths = sorted({min(natural_width, width * scale) for width in widths for scale in (1, 2)})
+        for pixel_width in pixel_widths:
+            height = round(natural_height * pixel_width / natural_width)
+            resized = image if pixel_width == natural_width else image.resize((pixel_width, height), Image.LANCZOS)
+            for fmt in formats:
+                file_name = f"{name}-{pixel_width}w-{digest}.{fmt}"
+                resized.save(os.path.join(OUTPUT_DIR, file_name), fmt.upper(), quality=QUALITY[fmt])
+                variants.append({"format": fmt, "width": pixel_width, "file": file_name,
+                                 "bytes": os.path.getsize(os.path.join(OUTPUT_DIR, file_name))})
+    return {"source": source, "digest": digest, "width": natural_width, "height": natural_height,
+            "display_width": max(widths), "variants": variants}
+
+def build_all():
+    """Rebuilds every variant and the manifest, removing variants of older source versions."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    formats = _formats()
+    manifest = {}
+    for name, (source, widths) in ASSETS.items():
+        entry = build_asset(name, source, widths, formats)
+        if entry is not None:
+            manifest[name] = entry
+    current_files = {variant["file"] for entry in manifest.values() for variant in entry["variants"]}
+    for file_name in os.listdir(OUTPUT_DIR):
+        if file_name != os.path.basename(MANIFEST_PATH) and file_name not in current_files:
+            os.remove(os.path.join(OUTPUT_DIR, file_name))
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def _manifest_is_current(manifest):
+    for name, (source, _) in ASSETS.items():
+        source_path = os.path.join(APP_ROOT, source)
+        entry = manifest.get(name)
+        if not os.path.exists(source_path):
+            continue
+        if entry is None or any(not os.path.exists(os.path.join(OUTPUT_DIR, v["file"])) for v in entry["variants"]):
+            return False
+        if os.path.getmtime(source_path) > os.path.getmtime(MANIFEST_PATH):
+            return False
+    return True
+
+# === SERVING ===
+
+@st.cache_resource
+def load_manifest():
+    """Returns the variant manifest, building the variants first if they are missing or stale."""
+    try:
+        if os.path.exists(MANIFEST_PATH):
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if _manifest_is_current(manifest):
+                return manifest
+        return build_all()
+    except Exception:
+        return {}  # fall back to serving the source files
+
+@st.cache_resource
+def load_source_bytes(source):
+    """Reads a source image once per process (None if it does not exist)."""
+    source_path = os.path.join(APP_ROOT, source)
+    if not os.path.exists(source_path):
+        return None
+    with open(source_path, "rb") as f:
+        return f.read()
+
+def render_asset(name, width=None, caption=None, lazy=True):
+    """Shows an image from ASSETS at `width` px (or the container width when None).
+
+    Pass lazy=False for images at the top of the page, so the browser fetches them right away.
+    """
+    entry = load_manifest().get(name)
+    if entry is None or not st.get_option("server.enableStaticServing"):
+        data = load_source_bytes(ASSETS[name][0])
+        if data is None:
+            return
+        if width is None:
+            st.image(data, use_container_width=True, caption=caption)
+        else:
+            st.image(data, width=width, caption=caption)
+        return
+    sources = []
+    for fmt in ("avif", "webp"):
+        srcset = ", ".join(f"{STATIC_URL}/{v['file']} {v['width']}w" for v in entry["variants"] if v["format"] == fmt)
+        if srcset:
+            sources.append(f'<source type="image/{fmt}" srcset="{srcset}" sizes="{f"{width}px" if width else "100vw"}">')
+    fallback = max((v for v in entry["variants"] if v["format"] == "webp"), key=lambda v: v["width"])
+    style = f"width: {width}px; max-width: 100%;" if width else "width: 100%;"
+    html = (f'<picture>{"".join(sources)}<img src="{STATIC_URL}/{fallback["file"]}" alt="{name}" '
+            f'width="{entry["width"]}" height="{entry["height"]}" style="{style} height: auto;" loading="{"lazy" if lazy else "eager"}"></picture>')
+    if caption:
+        html = f'<figure style="margin: 0;">{html}<figcaption style="color: grey; font-size: 0.9em;">{caption}</figcaption></figure>'
+    st.markdown(html, unsafe_allow_html=True)
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the resized WebP/AVIF variants of the app's images.")
+    parser.parse_args()
+    manifest = build_all()
+    for name, (source, _) in ASSETS.items():
+        entry = manifest.get(name)
+        if entry is None:
+            print(f"{name:16} missing source '{source}', skipped")
+            continue
+        built = ", ".join(f"{v['width']}w {v['format']} {v['bytes'] / 1024:.0f} KB" for v in entry["variants"])
+        print(f"{name:16} {os.path.getsize(os.path.join(APP_ROOT, source)) / 1024:.0f} KB -> {built}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
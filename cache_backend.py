@@ -0,0 +1,205 @@
+"""Pluggable cache backends for the data layer's collection frames.
+
+Entries are stored under versioned keys: the data layer puts the current version of a
+collection into every key it reads or writes, and invalidating the collection bumps that
+version in the backend. Every process sharing the backend therefore stops using the old
+entries at once, and the old entries simply expire.
+
+Choose the backend with CACHE_BACKEND:
+    memory  in-process dictionary (default; one copy per Streamlit process)
+    file    SQLite file at SHARED_CACHE_PATH, shared by every process on the host
+    redis   Redis-compatible server at CACHE_URL, shared by every replica; version bumps are
+            also published on INVALIDATION_CHANNEL so replicas update their version map
+            without a round-trip per lookup
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# === CONFIGURATION ===
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_URL = os.environ.get("CACHE_URL", "redis://localhost:6379/0")
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", os.path.join("cache", "shared.db"))
+KEY_PREFIX = "prk"
+INVALIDATION_CHANNEL = f"{KEY_PREFIX}:invalidate"
+VERSION_RECHECK_SECONDS = 5  # a replica that missed a message re-reads versions this often
+
+# === BACKENDS ===
+
+class CacheBackend(ABC):
+    """Stores picklable values with a TTL and keeps an integer version per namespace."""
+
+    @abstractmethod
+    def get(self, key):
+        """Returns the value stored under `key`, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Stores `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    def version(self, namespace):
+        """Returns the current version of a namespace (0 until it is first bumped)."""
+
+    @abstractmethod
+    def bump(self, namespace):
+        """Invalidates everything stored under the namespace's current version."""
+
+class MemoryBackend(CacheBackend):
+    """Per-process backend; values are kept as the objects themselves, without pickling."""
+
+    def __init__(self):
+        self.entries = {}   # key -> (expires_at, value)
+        self.versions = {}  # namespace -> version
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self.lock:
+            for expired_key in [k for k, (expires_at, _) in self.entries.items() if expires_at < now]:
+                del self.entries[expired_key]
+            self.entries[key] = (now + ttl, value)
+
+    def version(self, namespace):
+        with self.lock:
+            return self.versions.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+class FileBackend(CacheBackend):
+    """Backend shared by the processes of one host through a SQLite file in WAL mode."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL);
+    CREATE TABLE IF NOT EXISTS versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL);
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(self._SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+            return pickle.loads(row[0]) if row else None
+        finally:
+            conn.close()
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, blob, now + ttl))
+        finally:
+            conn.close()
+
+    def version(self, namespace):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version FROM versions WHERE namespace = ?", (namespace,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def bump(self, namespace):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO versions (namespace, version) VALUES (?, 1) "
+                         "ON CONFLICT(namespace) DO UPDATE SET version = version + 1", (namespace,))
+        finally:
+            conn.close()
+
+class RedisBackend(CacheBackend):
+    """Backend shared by every replica through a Redis-compatible server (needs the 'redis' package)."""
+
+    def __init__(self, url=CACHE_URL):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("CACHE_BACKEND=redis needs the 'redis' package: pip install redis") from e
+        self.client = redis.Redis.from_url(url)
+        self.versions = {}  # namespace -> (version, checked_at)
+        self.lock = threading.Lock()
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def _key(self, key):
+        return f"{KEY_PREFIX}:{key}"
+
+    def _listen(self):
+        """Applies version bumps published by other replicas; reconnects if the server goes away."""
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    namespace, _, version = message["data"].decode().rpartition(":")
+                    with self.lock:
+                        self.versions[namespace] = (int(version), time.time())
+            except Exception:
+                time.sleep(VERSION_RECHECK_SECONDS)
+
+    def get(self, key):
+        blob = self.client.get(self._key(key))
+        return pickle.loads(blob) if blob is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self._key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
+
+    def version(self, namespace):
+        with self.lock:
+            cached = self.versions.get(namespace)
+        if cached is not None and time.time() - cached[1] < VERSION_RECHECK_SECONDS:
+            return cached[0]
+        version = int(self.client.get(self._key(f"version:{namespace}")) or 0)
+        with self.lock:
+            self.versions[namespace] = (version, time.time())
+        return version
+
+    def bump(self, namespace):
+        version = self.client.incr(self._key(f"version:{namespace}"))
+        with self.lock:
+            self.versions[namespace] = (version, time.time())
+        self.client.publish(INVALIDATION_CHANNEL, f"{namespace}:{version}")
+
+# === SELECTION ===
+
+BACKENDS = {"memory": MemoryBackend, "file": FileBackend, "redis": RedisBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Returns this process's backend, created on first use from CACHE_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if CACHE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown CACHE_BACKEND '{CACHE_BACKEND}'; use one of {', '.join(BACKENDS)}")
+            _backend = BACKENDS[CACHE_BACKEND]()
+        return _backend
@@ -0,0 +1,140 @@
+"""Compaction of the live 'answers' collection.
+
+Every failed attempt is a new document in 'answers', so retries pile up. This job keeps only
+the latest attempt per student and homework (Student_Gmail, Class, Date, Question) in the hot
+collection and moves the older ones to 'answers_archive', in batched writes. Attempts whose
+homework has since been passed (it is in 'answer_bank') are archived as well. Each run
+records the hot collection size in system_metrics/answers, shown in the Admin panel.
+
+Run with:
+    python compact_answers.py                 # once
+    python compact_answers.py --dry-run       # report what would move
+    python compact_answers.py --every 3600    # hourly
+"""
+import argparse
+import sys
+import time
+from firebase_admin import firestore
+from firestore_client import MAX_BATCH_WRITES, UPDATED_AT_FIELD, record_deletion
+
+# === CONFIGURATION ===
+ANSWERS_COLLECTION = "answers"
+ANSWER_BANK_COLLECTION = "answer_bank"
+ARCHIVE_COLLECTION = "answers_archive"
+METRICS_COLLECTION = "system_metrics"
+METRICS_DOC = "answers"
+KEY_FIELDS = ["Student_Gmail", "Class", "Date", "Question"]
+FETCH_CHUNK_SIZE = 200
+
+# === PLANNING ===
+
+def attempt_key(data):
+    """Identifies the student and homework an answer belongs to."""
+    return tuple(str(data.get(field) or "").strip() for field in KEY_FIELDS)
+
+def _timestamp(stamp):
+    return stamp.timestamp() if hasattr(stamp, "timestamp") else 0.0
+
+def _written_at(doc):
+    """Orders the attempts of one key: Firestore's own create/update times, then Updated_At.
+
+    Legacy answers carry no Updated_At, but every document has server-side times, so ties
+    never fall through to the random document id.
+    """
+    data = doc.to_dict() or {}
+    return (_timestamp(getattr(doc, "create_time", None)), _timestamp(getattr(doc, "update_time", None)),
+            _timestamp(data.get(UPDATED_AT_FIELD)))
+
+def find_stale_attempts(db):
+    """Returns (ids of live answers to archive, hot collection size).
+
+    Only the key fields are read here; full documents are fetched when they are moved.
+    """
+    passed = {attempt_key(doc.to_dict() or {})
+              for doc in db.collection(ANSWER_BANK_COLLECTION).select(KEY_FIELDS).stream()}
+    latest = {}
+    stale = []
+    hot_count = 0
+    for doc in db.collection(ANSWERS_COLLECTION).select(KEY_FIELDS + [UPDATED_AT_FIELD]).stream():
+        hot_count += 1
+        data = doc.to_dict() or {}
+        key = attempt_key(data)
+        if key in passed:
+            stale.append(doc.id)
+            continue
+        candidate = (_written_at(doc), doc.id)
+        if key not in latest:
+            latest[key] = candidate
+        elif candidate > latest[key]:
+            stale.append(latest[key][1])
+            latest[key] = candidate
+        else:
+            stale.append(doc.id)
+    return stale, hot_count
+
+# === ARCHIVING ===
+
+def archive_answers(db, doc_ids):
+    """Copies answers to the archive and deletes them from the hot collection; returns how many moved."""
+    answers_ref = db.collection(ANSWERS_COLLECTION)
+    archive_ref = db.collection(ARCHIVE_COLLECTION)
+    # Each move is two writes (archive copy + delete), plus one deletion marker per batch.
+    moves_per_batch = (MAX_BATCH_WRITES - 1) // 2
+    moved = 0
+    for start in range(0, len(doc_ids), FETCH_CHUNK_SIZE):
+        snapshots = [snapshot for snapshot in db.get_all([answers_ref.document(doc_id) for doc_id in doc_ids[start:start + FETCH_CHUNK_SIZE]])
+                     if snapshot.exists]
+        for batch_start in range(0, len(snapshots), moves_per_batch):
+            batch = db.batch()
+            chunk = snapshots[batch_start:batch_start + moves_per_batch]
+            for snapshot in chunk:
+                batch.set(archive_ref.document(snapshot.id), {**(snapshot.to_dict() or {}), "Archived_At": firestore.SERVER_TIMESTAMP})
+                batch.delete(snapshot.reference)
+            record_deletion(db, ANSWERS_COLLECTION, batch)
+            batch.commit()
+            moved += len(chunk)
+    return moved
+
+def record_metrics(db, hot_count, moved):
+    """Stores the hot collection size after a run and the running archive total."""
+    db.collection(METRICS_COLLECTION).document(METRICS_DOC).set({
+        "Hot_Count": hot_count - moved, "Last_Moved": moved,
+        "Archived_Total": firestore.Increment(moved), "Last_Compaction": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+def compact(db, dry_run=False):
+    """Runs one compaction pass and returns (hot answers before, answers archived)."""
+    stale, hot_count = find_stale_attempts(db)
+    if dry_run:
+        return hot_count, len(stale)
+    moved = archive_answers(db, stale)
+    record_metrics(db, hot_count, moved)
+    return hot_count, moved
+
+def load_answer_metrics(db):
+    """Returns the latest compaction metrics, or {} before the first run."""
+    snapshot = db.collection(METRICS_COLLECTION).document(METRICS_DOC).get()
+    return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive superseded attempts from the live 'answers' collection.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many answers would be archived")
+    parser.add_argument("--every", type=int, default=0, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    while True:
+        hot_count, moved = compact(db, args.dry_run)
+        verb = "Would archive" if args.dry_run else "Archived"
+        print(f"{verb} {moved} of {hot_count} live answers; {hot_count - moved} remain.")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""Near-duplicate (copied answer) detection using shingling, MinHash and LSH buckets.
+
+Every submitted answer is indexed once: its MinHash signature is stored and each LSH band
+is added to a bucket document scoped to the homework question. Only answers sharing a
+bucket are compared, so the cost per answer stays flat as the answer corpus grows.
+
+Backfill existing answers with:
+    python copy_detection.py --backfill
+"""
+import argparse
+import hashlib
+import re
+import sys
+import numpy as np
+from firebase_admin import firestore
+
+# === CONFIGURATION ===
+SHINGLE_SIZE = 5          # characters per shingle; robust to small edits and reordered punctuation
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16            # 16 bands x 4 rows: pairs above ~50% similarity usually share a bucket
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+FLAG_THRESHOLD = 0.8      # estimated Jaccard similarity at which two answers are flagged
+MODEL_MARGIN = 0.1        # a pair must be closer to each other than to the model answer by this much
+MIN_SHINGLES = 20         # very short answers ("yes", a number) are too ambiguous to flag
+
+SIGNATURES_COLLECTION = "answer_signatures"
+BUCKETS_COLLECTION = "lsh_buckets"
+FLAGS_COLLECTION = "copy_flags"
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20250712)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+# === SIGNATURES ===
+
+def homework_key(class_name, date_str, question):
+    """Identifies a homework question the same way the dashboards match answers to it."""
+    key = "|".join([str(class_name), str(date_str), " ".join(str(question).lower().split())])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def shingles(text):
+    """Returns the set of character shingles of an answer after normalizing case and punctuation."""
+    joined = " ".join(re.findall(r"\w+", str(text).lower()))
+    return {joined[i:i + SHINGLE_SIZE] for i in range(len(joined) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(shingle_set):
+    """Computes a MinHash signature with NUM_PERMUTATIONS universal hash functions."""
+    if not shingle_set:
+        return None
+    base = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingle_set),
+        dtype=np.uint64, count=len(shingle_set)
+    )
+    hashed = (np.outer(_PERM_A, base) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return hashed.min(axis=1).astype(np.int64).tolist()
+
+def estimate_similarity(sig1, sig2):
+    """Estimates Jaccard similarity as the share of equal MinHash slots."""
+    return float(np.mean(np.array(sig1) == np.array(sig2)))
+
+def band_bucket_ids(hw_key, signature):
+    """Returns one bucket document id per LSH band."""
+    ids = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        band_hash = hashlib.sha1(",".join(map(str, rows)).encode("ascii")).hexdigest()[:16]
+        ids.append(f"{hw_key}_{band}_{band_hash}")
+    return ids
+
+# === INDEXING ===
+
+def register_answer(db, answer_id, answer_doc, model_answer=""):
+    """Indexes one submitted answer and flags earlier answers from other students that it nearly duplicates.
+
+    Students are shown the model answer before writing, so two answers that are both close to
+    the model answer are not flagged unless they are clearly closer to each other.
+    Returns the list of flags written for this answer.
+    """
+    shingle_set = shingles(answer_doc.get("Answer", ""))
+    if len(shingle_set) < MIN_SHINGLES:
+        return []
+    signature = minhash_signature(shingle_set)
+    model_signature = minhash_signature(shingles(model_answer))
+    model_similarity = estimate_similarity(signature, model_signature) if model_signature else 0.0
+    hw_key = homework_key(answer_doc.get("Class"), answer_doc.get("Date"), answer_doc.get("Question"))
+    bucket_ids = band_bucket_ids(hw_key, signature)
+
+    # Join the buckets before reading them, so two answers arriving together still see each other.
+    batch = db.batch()
+    batch.set(db.collection(SIGNATURES_COLLECTION).document(answer_id), {
+        "Homework_Key": hw_key, "Student_Gmail": answer_doc.get("Student_Gmail"),
+        "Class": answer_doc.get("Class"), "Subject": answer_doc.get("Subject"),
+        "Date": answer_doc.get("Date"), "Question": answer_doc.get("Question"),
+        "Signature": signature, "Model_Similarity": model_similarity
+    })
+    for bucket_id in bucket_ids:
+        batch.set(db.collection(BUCKETS_COLLECTION).document(bucket_id),
+                  {"Homework_Key": hw_key, "Answer_Ids": firestore.ArrayUnion([answer_id])}, merge=True)
+    batch.commit()
+
+    candidate_ids = set()
+    for bucket in db.get_all([db.collection(BUCKETS_COLLECTION).document(b) for b in bucket_ids]):
+        if bucket.exists:
+            candidate_ids.update((bucket.to_dict() or {}).get("Answer_Ids", []))
+    candidate_ids.discard(answer_id)
+    if not candidate_ids:
+        return []
+
+    flags = []
+    candidate_refs = [db.collection(SIGNATURES_COLLECTION).document(c) for c in candidate_ids]
+    for candidate in db.get_all(candidate_refs):
+        if not candidate.exists:
+            continue
+        candidate_data = candidate.to_dict()
+        if candidate_data.get("Student_Gmail") == answer_doc.get("Student_Gmail"):
+            continue  # a student's own resubmission is not copying
+        similarity = estimate_similarity(signature, candidate_data.get("Signature", []))
+        closest_to_model = max(model_similarity, float(candidate_data.get("Model_Similarity", 0.0)))
+        if similarity >= FLAG_THRESHOLD and similarity >= closest_to_model + MODEL_MARGIN:
+            first_id, second_id = sorted([answer_id, candidate.id])
+            flag = {
+                "Homework_Key": hw_key, "Class": answer_doc.get("Class"), "Subject": answer_doc.get("Subject"),
+                "Date": answer_doc.get("Date"), "Question": answer_doc.get("Question"),
+                "Answer_Ids": [first_id, second_id],
+                "Student_Gmails": sorted([answer_doc.get("Student_Gmail"), candidate_data.get("Student_Gmail")]),
+                "Similarity": round(similarity * 100, 2),
+                "Flagged_At": firestore.SERVER_TIMESTAMP
+            }
+            db.collection(FLAGS_COLLECTION).document(f"{first_id}_{second_id}").set(flag)
+            flags.append(flag)
+    return flags
+
+# === CLUSTERS FOR THE TEACHER VIEW ===
+
+def build_clusters(flags):
+    """Groups pairwise flags (list of dicts) into clusters of students per homework question."""
+    # A pair needs two students; a malformed flag would otherwise break the whole dashboard.
+    flags = [flag for flag in flags if len(flag.get("Student_Gmails") or []) >= 2]
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for flag in flags:
+        hw_key = flag.get("Homework_Key")
+        first, second = [(hw_key, gmail) for gmail in flag["Student_Gmails"]][:2]
+        parent[find(first)] = find(second)
+
+    clusters = {}
+    for flag in flags:
+        hw_key = flag.get("Homework_Key")
+        root = find((hw_key, flag["Student_Gmails"][0]))
+        cluster = clusters.setdefault(root, {
+            "Homework_Key": hw_key, "Class": flag.get("Class"), "Subject": flag.get("Subject"),
+            "Date": flag.get("Date"), "Question": flag.get("Question"),
+            "Student_Gmails": set(), "Max_Similarity": 0.0
+        })
+        cluster["Student_Gmails"].update(flag["Student_Gmails"])
+        cluster["Max_Similarity"] = max(cluster["Max_Similarity"], float(flag.get("Similarity", 0)))
+    return sorted(clusters.values(), key=lambda c: (-len(c["Student_Gmails"]), -c["Max_Similarity"]))
+
+# === BACKFILL ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Index existing answers for copy detection.")
+    parser.add_argument("--backfill", action="store_true", help="Index every document in 'answers' and 'answer_bank'")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        return 0
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    model_answers = {}
+    for doc in db.collection("homework").stream():
+        hw = doc.to_dict()
+        model_answers[homework_key(hw.get("Class"), hw.get("Date"), hw.get("Question"))] = hw.get("Model_Answer", "")
+    indexed = flagged = 0
+    for coll_name in ["answer_bank", "answers"]:
+        for doc in db.collection(coll_name).stream():
+            if db.collection(SIGNATURES_COLLECTION).document(doc.id).get().exists:
+                continue
+            answer_doc = doc.to_dict()
+            hw_key = homework_key(answer_doc.get("Class"), answer_doc.get("Date"), answer_doc.get("Question"))
+            flagged += len(register_answer(db, doc.id, answer_doc, model_answers.get(hw_key, "")))
+            indexed += 1
+    print(f"Indexed {indexed} answers, raised {flagged} copy flags.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+"""Shared Firestore data layer for the dashboard pages.
+
+Collections are loaded once per cache period and cast according to COLLECTION_SCHEMAS:
+low-cardinality text becomes categorical, dd-mm-YYYY strings become datetime64, marks and
+points become numeric, and fields no dashboard reads (password hashes, security answers)
+are dropped before the frame is cached.
+
+Each view declares the fields it reads (a {collection: fields} mapping); the loader then
+issues a projected select() query and caches that projection under its own key.
+
+Collections are paged in CHUNK_SIZE chunks ordered by document id (start_after cursors), and
+each chunk is typed as soon as it arrives, so peak memory holds one chunk of raw dicts rather
+than the whole collection. Pages load the user's own documents first with load_matching()
+(equality-filtered queries) and only then the school-wide collections, so the header,
+announcement and personal metrics render before the large downloads finish.
+
+Independent loads run concurrently on a bounded thread pool (load_concurrently), each with
+its own timeout; a load that fails or times out yields an empty frame and a warning instead
+of failing the page, and a cold page costs about its slowest query rather than their sum.
+
+Frames are cached in two tiers: an in-process copy per collection version, and the shared
+cache_backend (in-process, file or Redis) that lets several Streamlit processes reuse one
+warm copy. invalidate_collections() bumps a collection's version in the backend, which
+invalidates it in every process at once.
+
+Full-collection loads go through the disk snapshots in snapshot_cache: after a restart they
+are served from disk at once and refreshed in the background with only the documents whose
+Updated_At stamp is newer than the snapshot.
+
+Everything is scoped to the session's centre (see tenancy): the client returned by
+connect_to_firestore() reads that centre's collections, and cache keys, version namespaces,
+snapshots and invalidations all carry the centre, so one centre's frames never occupy or
+evict another's.
+"""
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import cache_backend
+import profiling
+import snapshot_cache
+from firestore_client import get_firestore_client, last_deletion, UPDATED_AT_FIELD
+from tenancy import DEFAULT_TENANT, TenantClient, current_tenant, scoped_name
+
+# === CONFIGURATION ===
+DATE_FORMAT = "%d-%m-%Y"
+CHUNK_SIZE = 500
+CACHE_TTL_SECONDS = 60
+DOCUMENT_ID_FIELD = "__name__"  # Firestore's order_by key for the document id
+MAX_PARALLEL_LOADS = 5
+LOAD_TIMEOUT_SECONDS = 20
+# Per-collection overrides for LOAD_TIMEOUT_SECONDS (the answer collections are the largest).
+COLLECTION_TIMEOUTS = {"answers": 40, "answer_bank": 40}
+
+# Per-collection schema: which columns to cast to which dtype, and which to drop.
+COLLECTION_SCHEMAS = {
+    "users": {
+        "category": ["Class", "Role", "Payment_Confirmed", "Confirmed", "Subscription_Plan"],
+        "date": ["Subscription_Date", "Subscribed_Till"],
+        "numeric": ["Salary_Points"],
+        "drop": ["Password", "Security_Question", "Security_Answer"],
+    },
+    "homework": {
+        "category": ["Class", "Subject", "Uploaded_By"],
+        "date": ["Date", "Due_Date"],
+        "numeric": [],
+        "drop": ["Source_File"],
+    },
+    "answers": {
+        "category": ["Student_Gmail", "Class", "Subject"],
+        "date": ["Date"],
+        "numeric": ["Marks", "Attempt_Status"],
+        "drop": [],
+    },
+    "answer_bank": {
+        "category": ["Student_Gmail", "Class", "Subject"],
+        "date": ["Date"],
+        "numeric": ["Marks", "Attempt_Status"],
+        "drop": [],
+    },
+    "announcements": {
+        "category": [],
+        "date": ["Date"],
+        "numeric": [],
+        "drop": [],
+    },
+}
+ALL_COLLECTIONS = ["users", "homework", "answers", "answer_bank", "announcements"]
+
+# Frames currently held by the cache, for the memory report (weak, so eviction still frees them).
+_live_frames = {}
+# Snapshots this process has already revalidated; the first load after a start serves the disk copy as-is.
+_revalidated = set()
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+# === CONNECTION ===
+
+@st.cache_resource
+def _firestore_client():
+    """Establishes a connection to Google Firestore and caches it."""
+    try:
+        return get_firestore_client()
+    except Exception as e:
+        st.error(f"Error connecting to Firebase Firestore: {e}")
+        return None
+
+def connect_to_firestore(tenant_id=None):
+    """Returns the Firestore client scoped to this session's centre (or to `tenant_id`)."""
+    client = _firestore_client()
+    return TenantClient(client, tenant_id or current_tenant()) if client is not None else None
+
+# === TYPED FRAMES ===
+
+def apply_schema(df, collection_name, fields=None):
+    """Casts a raw collection frame to its compact typed form.
+
+    With a field projection, only the projected schema columns are added when missing.
+    """
+    schema = COLLECTION_SCHEMAS.get(collection_name)
+    if df.empty or schema is None:
+        return df
+    df = df.drop(columns=[c for c in schema["drop"] + [UPDATED_AT_FIELD] if c in df.columns])
+    if fields is not None:
+        schema = {kind: [c for c in columns if c in fields] for kind, columns in schema.items()}
+    for column in schema["category"]:
+        if column not in df.columns:
+            df[column] = pd.Series(pd.Categorical([None] * len(df)), index=df.index)
+        else:
+            df[column] = df[column].where(df[column].notna() & (df[column] != ""), None).astype("category")
+    for column in schema["date"]:
+        if column not in df.columns:
+            df[column] = pd.NaT
+        else:
+            df[column] = pd.to_datetime(df[column], format=DATE_FORMAT, errors="coerce")
+    for column in schema["numeric"]:
+        if column not in df.columns:
+            df[column] = float("nan")
+        else:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
+
+def empty_frame(collection_name, fields=None):
+    """An empty typed frame with doc_id and the projected (or all schema) columns.
+
+    Loads that find no documents, fail or time out return this instead of a frame without
+    columns, so pages can filter and select columns without guarding every access.
+    """
+    schema = COLLECTION_SCHEMAS.get(collection_name, {"category": [], "date": [], "numeric": []})
+    columns = list(fields) if fields is not None else schema["category"] + schema["date"] + schema["numeric"]
+    df = pd.DataFrame(columns=["doc_id"] + [column for column in columns if column != "doc_id"], dtype=object)
+    for column in df.columns:
+        if column in schema["category"]:
+            df[column] = df[column].astype("category")
+        elif column in schema["date"]:
+            df[column] = pd.to_datetime(df[column])
+        elif column in schema["numeric"]:
+            df[column] = df[column].astype(float)
+    return df
+
+def _to_record(doc):
+    record = doc.to_dict() or {}
+    record['doc_id'] = doc.id
+    return record
+
+def records_to_frame(records, collection_name, fields=None):
+    """Builds a typed DataFrame from document dicts that carry their 'doc_id'."""
+    df = pd.DataFrame(records) if records else pd.DataFrame()
+    return apply_schema(df, collection_name, fields)
+
+def documents_to_frame(docs, collection_name, fields=None):
+    """Builds a typed DataFrame from Firestore document snapshots."""
+    return records_to_frame([_to_record(doc) for doc in docs], collection_name, fields)
+
+def iter_document_chunks(query, chunk_size=CHUNK_SIZE, timeout=None):
+    """Pages through a query in document-id order, yielding lists of at most `chunk_size` snapshots.
+
+    `timeout` bounds each page request, in seconds.
+    """
+    query = query.order_by(DOCUMENT_ID_FIELD)
+    last_doc = None
+    while True:
+        page = query.limit(chunk_size)
+        if last_doc is not None:
+            page = page.start_after(last_doc)
+        docs = list(page.stream(timeout=timeout))
+        if not docs:
+            return
+        yield docs
+        if len(docs) < chunk_size:
+            return
+        last_doc = docs[-1]
+
+def chunks_to_frame(chunks, collection_name, fields=None):
+    """Types each chunk of records as it arrives and concatenates the typed chunks into one frame."""
+    frames = [df for df in (records_to_frame(records, collection_name, fields) for records in chunks) if not df.empty]
+    if not frames:
+        return empty_frame(collection_name, fields)
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    # Chunks carry their own category sets, which concat widens to object; cast them back.
+    for column in COLLECTION_SCHEMAS.get(collection_name, {}).get("category", []):
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+# === DISK SNAPSHOTS ===
+
+def _update_time(record):
+    """Removes the Updated_At stamp from a record and returns it as epoch seconds (0 if unstamped)."""
+    stamp = record.pop(UPDATED_AT_FIELD, None)
+    return stamp.timestamp() if hasattr(stamp, "timestamp") else 0.0
+
+def _full_sync(query, key, collection_name, timeout):
+    staging_id = snapshot_cache.start_full_sync(key)
+    newest_update = 0.0
+    try:
+        for docs in iter_document_chunks(query, timeout=timeout):
+            records = [_to_record(doc) for doc in docs]
+            newest_update = max([newest_update] + [_update_time(record) for record in records])
+            snapshot_cache.stage_records(staging_id, records)
+    except Exception:
+        snapshot_cache.discard_full_sync(staging_id)
+        raise
+    snapshot_cache.finish_full_sync(key, staging_id, collection_name, newest_update)
+
+def _delta_sync(query, key, snapshot, timeout):
+    since = datetime.fromtimestamp(max(0.0, snapshot["newest_update"] - snapshot_cache.CLOCK_SKEW_SECONDS), tz=timezone.utc)
+    records = [_to_record(doc) for doc in query.where(UPDATED_AT_FIELD, ">", since).stream(timeout=timeout)]
+    newest_update = max([0.0] + [_update_time(record) for record in records])
+    snapshot_cache.upsert_records(key, records)
+    snapshot_cache.mark_synced(key, newest_update)
+
+def _refresh(query, key, collection_name, snapshot, timeout, full):
+    if full:
+        _full_sync(query, key, collection_name, timeout)
+    else:
+        _delta_sync(query, key, snapshot, timeout)
+
+def _refresh_in_background(query, key, collection_name, snapshot, timeout, full):
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            _refresh(query, key, collection_name, snapshot, timeout, full)
+        except Exception:
+            pass  # the next load of this collection retries the refresh in the foreground
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def _snapshot_chunks(db, query, collection_name, fields, timeout):
+    """Brings the disk snapshot of a full-collection query up to date and returns its record chunks.
+
+    A missing snapshot is built from a full scan; the first load after a restart serves the
+    snapshot as it is and refreshes it in the background; later loads refresh it before
+    reading. The refresh is a full scan when the snapshot has expired or documents were
+    deleted from the collection since its last full scan, and a delta read otherwise.
+    """
+    key = snapshot_cache.snapshot_key(scoped_name(collection_name, db.tenant_id), fields)
+    snapshot = snapshot_cache.get_snapshot(key)
+    if snapshot is None:
+        _full_sync(query, key, scoped_name(collection_name, db.tenant_id), timeout)
+    else:
+        full = (time.time() - snapshot["full_sync_at"] > snapshot_cache.FULL_REFRESH_SECONDS
+                or last_deletion(db, collection_name) > snapshot["full_sync_at"] - snapshot_cache.CLOCK_SKEW_SECONDS)
+        if key in _revalidated:
+            _refresh(query, key, scoped_name(collection_name, db.tenant_id), snapshot, timeout, full)
+        else:
+            _refresh_in_background(query, key, scoped_name(collection_name, db.tenant_id), snapshot, timeout, full)
+    _revalidated.add(key)
+    return snapshot_cache.iter_record_chunks(key)
+
+# === LOADING ===
+
+def fetch_collection(collection_name, fields=None, filters=(), tenant_id=None):
+    """Reads a centre's Firestore collection (optionally projected and equality-filtered) into a typed DataFrame."""
+    db = connect_to_firestore(tenant_id)
+    if db is None: return pd.DataFrame()
+    query = db.collection(collection_name)
+    for field, value in filters:
+        query = query.where(field, "==", value)
+    timeout = COLLECTION_TIMEOUTS.get(collection_name, LOAD_TIMEOUT_SECONDS)
+    if not filters:
+        if fields is not None:
+            query = query.select(list(fields) + [UPDATED_AT_FIELD])
+        return chunks_to_frame(_snapshot_chunks(db, query, collection_name, fields, timeout), collection_name, fields)
+    if fields is not None:
+        query = query.select(list(fields))
+    chunks = ([_to_record(doc) for doc in docs] for docs in iter_document_chunks(query, timeout=timeout))
+    return chunks_to_frame(chunks, collection_name, fields)
+
+def load_collection(collection_name, fields=None, filters=()):
+    """Loads a Firestore collection into a typed Pandas DataFrame.
+
+    `fields` (a tuple) projects the query server-side with select(), and `filters` (a tuple of
+    (field, value) pairs) keeps only documents whose fields equal those values; each
+    combination is cached separately, per centre. The frame is shared by every session of this process
+    instead of being copied per call, so callers must treat it as read-only (filter or .copy()
+    before adding columns). Errors propagate so that a failed load is never cached; pages go
+    through load_matching() or load_concurrently(), which report them.
+    """
+    tenant_id = current_tenant()
+    version = cache_backend.get_backend().version(scoped_name(collection_name, tenant_id))
+    df = _load_collection_version(collection_name, fields, filters, version, tenant_id)
+    profiling.note_load(collection_name, filters, df)
+    return df
+
+@st.cache_resource(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def _load_collection_version(collection_name, fields, filters, version, tenant_id):
+    """Keeps one in-process copy per centre and collection version, filled from the shared backend when it has one."""
+    backend = cache_backend.get_backend()
+    key = f"frame:{scoped_name(collection_name, tenant_id)}:v{version}:{fields}:{filters}"
+    df = backend.get(key)
+    if df is None:
+        df = fetch_collection(collection_name, fields, filters, tenant_id)
+        backend.set(key, df, CACHE_TTL_SECONDS)
+    _live_frames[(tenant_id, collection_name, fields, filters)] = weakref.ref(df)
+    return df
+
+def invalidate_collections(*collection_names):
+    """Drops this centre's cached frames of the given collections in every process sharing the cache backend."""
+    backend = cache_backend.get_backend()
+    tenant_id = current_tenant()
+    for collection_name in collection_names:
+        backend.bump(scoped_name(collection_name, tenant_id))
+    _load_collection_version.clear()  # frees this process's copies now; other processes miss on the new version
+
+def query_spec(collection_name, view_fields=None, **equals):
+    """Describes one load as the (collection, fields, filters) arguments of load_collection."""
+    fields = view_fields.get(collection_name) if view_fields is not None else None
+    return (collection_name, _as_projection(fields), tuple(sorted(equals.items())))
+
+def load_matching(collection_name, view_fields=None, **equals):
+    """Loads only the documents matching every field=value pair, e.g. load_matching('answers', VIEW, Class='8th')."""
+    try:
+        return load_collection(*query_spec(collection_name, view_fields, **equals))
+    except Exception as e:
+        st.error(f"Failed to load data from collection '{collection_name}': {e}")
+        return empty_frame(collection_name, _as_projection(view_fields.get(collection_name)) if view_fields is not None else None)
+
+def load_concurrently(specs):
+    """Runs independent loads on a bounded thread pool and returns {key: DataFrame}.
+
+    `specs` maps a caller-chosen key to a query_spec(). Each load gets its collection's timeout;
+    one that fails or times out comes back as an empty frame with the projected columns, and a single warning names what is
+    missing, so the rest of the page still renders. A timed-out load keeps running in the
+    background and fills the cache for the next rerun.
+    """
+    if not specs:
+        return {}
+    ctx = get_script_run_ctx()
+
+    def run(spec):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return load_collection(*spec)
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_LOADS, len(specs)))
+    started = time.monotonic()
+    futures = {key: executor.submit(run, spec) for key, spec in specs.items()}
+    frames, failed = {}, []
+    for key, future in futures.items():
+        collection_name, fields, _ = specs[key]
+        deadline = started + COLLECTION_TIMEOUTS.get(collection_name, LOAD_TIMEOUT_SECONDS)
+        try:
+            frames[key] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            frames[key] = empty_frame(collection_name, fields)
+            failed.append(f"{collection_name} (timed out)")
+        except Exception as e:
+            frames[key] = empty_frame(collection_name, fields)
+            failed.append(f"{collection_name} ({e})")
+    executor.shutdown(wait=False)
+    if failed:
+        st.warning("Some data could not be loaded and is missing from this page: " + "; ".join(failed))
+    return frames
+
+def load_all_data(view_fields=None):
+    """Loads the dashboard collections concurrently as typed DataFrames, keyed by collection name.
+
+    `view_fields` maps collection name -> fields the view reads; collections missing from it
+    are skipped, and a value of None loads full documents.
+    """
+    if view_fields is None:
+        view_fields = {coll_name: None for coll_name in ALL_COLLECTIONS}
+    return load_concurrently({coll_name: query_spec(coll_name, view_fields) for coll_name in view_fields})
+
+def _as_projection(fields):
+    return tuple(sorted(fields)) if fields is not None else None
+
+# === HELPERS ===
+
+def format_date(value):
+    """Formats a datetime64 value back to the app's dd-mm-YYYY string ('' for missing dates)."""
+    return value.strftime(DATE_FORMAT) if pd.notna(value) else ""
+
+def today():
+    """Returns today's date as a Timestamp comparable with the typed date columns."""
+    return pd.Timestamp.today().normalize()
+
+def cached_frames():
+    """Returns the frames still alive in this process, keyed by a '[centre] collection [fields]' label."""
+    frames = {}
+    for (tenant_id, coll_name, fields, filters), ref in list(_live_frames.items()):
+        df = ref()
+        if df is None:
+            del _live_frames[(tenant_id, coll_name, fields, filters)]
+            continue
+        label = f"{coll_name} [{', '.join(fields)}]" if fields is not None else f"{coll_name} [all fields]"
+        if tenant_id != DEFAULT_TENANT:
+            label = f"{tenant_id}: {label}"
+        if filters:
+            label += " where " + ", ".join(f"{field}={value}" for field, value in filters)
+        frames[label] = df
+    return frames
+
+def memory_report(frames):
+    """Returns per-frame rows, columns and resident memory (MB, deep) for cached frames."""
+    rows = []
+    for label, df in frames.items():
+        rows.append({
+            "Collection": label, "Rows": len(df), "Columns": len(df.columns),
+            "Memory (MB)": round(df.memory_usage(deep=True).sum() / 1024 ** 2, 3),
+            "Categorical Columns": sum(1 for dtype in df.dtypes if isinstance(dtype, pd.CategoricalDtype)),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,124 @@
+"""Debounced autosave of students' draft answers.
+
+Edits are buffered in the session (the "answer_drafts" PageState namespace) as the student
+types; the text reaches the server whenever the answer box loses focus. A fragment on the
+Student dashboard calls flush() every FLUSH_INTERVAL_SECONDS, which writes a draft once it
+has been unchanged for DEBOUNCE_SECONDS (or has waited MAX_DELAY_SECONDS). All of a
+student's changed drafts go into one merged write of answer_drafts/<gmail>, and no answer
+is autosaved more than MAX_WRITES_PER_ANSWER times. Submitting an answer flushes every
+pending draft and removes the submitted one in that same write.
+
+The drafts document is read once per session (one read); after that the session buffer is
+the source, so reruns cost nothing and a reconnect costs that single read again.
+"""
+import time
+import streamlit as st
+from firebase_admin import firestore
+from firestore_client import stamp_update
+from session_store import PageState
+
+# === CONFIGURATION ===
+DRAFTS_COLLECTION = "answer_drafts"
+FLUSH_INTERVAL_SECONDS = 15
+DEBOUNCE_SECONDS = 10       # a draft is saved once it has not changed for this long...
+MAX_DELAY_SECONDS = 60      # ...or once its oldest unsaved edit is this old
+MAX_WRITES_PER_ANSWER = 40  # autosaves per answer; later edits are kept in the session until submit
+LOADED_KEY, SAVED_AT_KEY = "_loaded", "_saved_at"  # bookkeeping entries of the namespace
+
+# === BUFFER ===
+
+class DraftBuffer:
+    """A student's draft answers: buffered in the session, flushed to Firestore in coalesced writes."""
+
+    def __init__(self, db, student_gmail):
+        self.db = db
+        self.student_gmail = student_gmail
+        self.entries = PageState("answer_drafts", max_entries=200)  # homework id -> draft dict
+        self._load()
+
+    def _ref(self):
+        return self.db.collection(DRAFTS_COLLECTION).document(str(self.student_gmail))
+
+    def _load(self):
+        """Reads the stored drafts the first time this session needs them."""
+        if LOADED_KEY in self.entries or self.db is None:
+            return
+        snapshot = self._ref().get()
+        stored = ((snapshot.to_dict() or {}).get("Drafts") or {}) if snapshot.exists else {}
+        for homework_id, draft in stored.items():
+            text = draft.get("Answer", "")
+            self.entries.set(homework_id, {"text": text, "saved_text": text, "edited_at": 0.0, "unsaved_since": None, "writes": 0})
+        self.entries.set(LOADED_KEY, True)
+
+    def text(self, homework_id, default=""):
+        """The latest draft of an answer, or `default` if the student has not started one."""
+        draft = self.entries.get(homework_id)
+        return draft["text"] if draft else default
+
+    def edit(self, homework_id, text):
+        """Buffers an edit; it is written by a later flush()."""
+        now = time.time()
+        draft = self.entries.get(homework_id) or {"text": "", "saved_text": None, "edited_at": 0.0, "unsaved_since": None, "writes": 0}
+        if text == draft["text"]:
+            return
+        draft.update(text=text, edited_at=now, unsaved_since=draft["unsaved_since"] or now)
+        self.entries.set(homework_id, draft)
+
+    def edit_from_widget(self, homework_id, widget_key):
+        """on_change callback of an answer text area."""
+        self.edit(homework_id, st.session_state.get(widget_key, ""))
+
+    def _drafts(self):
+        return [(key, self.entries.get(key)) for key in list(self.entries.entries) if key not in (LOADED_KEY, SAVED_AT_KEY)]
+
+    def has_unsaved(self):
+        return any(draft["text"] != draft["saved_text"] for _, draft in self._drafts())
+
+    def flush(self, force=False, remove=()):
+        """Writes due drafts (all unsaved ones if `force`) and removes `remove` in one write; returns drafts saved."""
+        if self.db is None:
+            return 0
+        now = time.time()
+        due = [(homework_id, draft) for homework_id, draft in self._drafts()
+               if draft["text"] != draft["saved_text"] and draft["writes"] < MAX_WRITES_PER_ANSWER
+               and (force or now - draft["edited_at"] >= DEBOUNCE_SECONDS or now - draft["unsaved_since"] >= MAX_DELAY_SECONDS)]
+        # Removed drafts are never written; only those that reached Firestore need deleting there.
+        due = [(homework_id, draft) for homework_id, draft in due if homework_id not in remove]
+        removed = [homework_id for homework_id in remove if (self.entries.get(homework_id) or {}).get("saved_text") is not None]
+        if not due and not removed:
+            return 0
+        drafts = {homework_id: {"Answer": draft["text"], "Saved_At": firestore.SERVER_TIMESTAMP} for homework_id, draft in due}
+        drafts.update({homework_id: firestore.DELETE_FIELD for homework_id in removed})
+        self._ref().set(stamp_update({"Drafts": drafts}), merge=True)
+        for homework_id, draft in due:
+            draft.update(saved_text=draft["text"], unsaved_since=None, writes=draft["writes"] + 1)
+            self.entries.set(homework_id, draft)
+        self.entries.set(SAVED_AT_KEY, now)
+        return len(due)
+
+    def submit(self, homework_id):
+        """Flushes every pending draft and drops the submitted answer's draft, in one write.
+
+        A failed write never blocks the submission: the other drafts stay due for the next flush.
+        """
+        try:
+            self.flush(force=True, remove=[homework_id])
+        except Exception:
+            pass
+        self.entries.pop(homework_id)
+
+    def retain(self, active_ids):
+        """Forgets (in the session) drafts of questions that are no longer pending."""
+        self.entries.retain(set(active_ids) | {LOADED_KEY, SAVED_AT_KEY})
+
+# === UI ===
+
+@st.fragment(run_every=FLUSH_INTERVAL_SECONDS)
+def draft_autosaver(drafts):
+    """Flushes due drafts on a timer and shows when the last one was saved."""
+    drafts.flush()
+    saved_at = drafts.entries.get(SAVED_AT_KEY)
+    if drafts.has_unsaved():
+        st.caption("✏️ Unsaved changes — your draft is saved automatically.")
+    elif saved_at:
+        st.caption(f"💾 Draft saved at {time.strftime('%H:%M:%S', time.localtime(saved_at))}")
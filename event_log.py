@@ -0,0 +1,401 @@
+"""Append-only log of school events, with a checkpointed replay engine for derived data.
+
+Every fact that derived numbers are computed from is appended here as an event:
+    homework_posted    a question was posted (by a teacher or the importer), with its Salary Points
+    answer_submitted   a student submitted an answer for grading
+    answer_graded      the grading worker scored an answer (Marks is None if it did not pass)
+    payment_confirmed  the Admin confirmed a student's subscription payment
+    staff_confirmed    the Admin confirmed a staff member
+
+Events are stored in a local SQLite file next to the job queue (one file per centre), one
+row per event with a global offset, the class it belongs to (its partition) and its fields as zlib-compressed
+compact JSON. Rows can only be inserted: triggers reject updates and deletes.
+
+A projection folds the events of one class into a JSON state (marks per student, pending
+homework per student, Salary Points per teacher) and merges the states of all classes into
+a DataFrame. replay() rebuilds a projection with one worker process per class and saves a
+checkpoint (state + last offset) every CHECKPOINT_EVERY events, so the next replay, or one
+that was interrupted, only reads the events appended since:
+    python event_log.py seed     # once, to record the history that predates the log
+    python event_log.py stats
+    python event_log.py replay marks --workers 4
+    python event_log.py replay pending --class 8th --reset -o pending.csv
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from tenancy import current_tenant, tenant_prefix
+
+# === CONFIGURATION ===
+EVENT_LOG_PATH = os.environ.get("EVENT_LOG_PATH", os.path.join("queue", "events.db"))
+READ_CHUNK_SIZE = 2000    # events read per query during replay
+CHECKPOINT_EVERY = 10000  # events applied between checkpoints
+NO_CLASS = ""             # partition of events that belong to no class (staff confirmations)
+
+HOMEWORK_POSTED = "homework_posted"
+ANSWER_SUBMITTED = "answer_submitted"
+ANSWER_GRADED = "answer_graded"
+PAYMENT_CONFIRMED = "payment_confirmed"
+STAFF_CONFIRMED = "staff_confirmed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    offset INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_partition ON events (partition, offset);
+CREATE TRIGGER IF NOT EXISTS events_no_update BEFORE UPDATE ON events
+BEGIN SELECT RAISE(ABORT, 'the event log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS events_no_delete BEFORE DELETE ON events
+BEGIN SELECT RAISE(ABORT, 'the event log is append-only'); END;
+CREATE TABLE IF NOT EXISTS checkpoints (
+    projection TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    state BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (projection, partition)
+);
+"""
+
+# === CONNECTION ===
+
+def log_path(tenant_id=None):
+    """The event log file of a centre (default: the current one); the default centre keeps EVENT_LOG_PATH."""
+    tenant_id = tenant_id or current_tenant()
+    if not tenant_prefix(tenant_id):
+        return EVENT_LOG_PATH
+    root, extension = os.path.splitext(EVENT_LOG_PATH)
+    return f"{root}-{tenant_id}{extension}"
+
+def _connect(path=None):
+    """Opens the event log in WAL mode so replays never block the writers."""
+    path = path or log_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+# === WRITING ===
+
+def append_events(events, path=None):
+    """Appends (kind, class name, fields) events in one transaction; returns the last offset."""
+    now = time.time()
+    rows = [(kind, str(class_name or NO_CLASS), now, _pack(data)) for kind, class_name, data in events]
+    if not rows:
+        return None
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT INTO events (kind, partition, recorded_at, data) VALUES (?, ?, ?, ?)", rows)
+        offset = conn.execute("SELECT MAX(offset) FROM events").fetchone()[0]
+        conn.execute("COMMIT")
+        return offset
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def append_event(kind, class_name, data, path=None):
+    """Appends one event and returns its offset."""
+    return append_events([(kind, class_name, data)], path)
+
+def homework_posted_event(homework_id, homework, points=0):
+    """The event of one posted homework question (answers and model answers stay in Firestore)."""
+    return (HOMEWORK_POSTED, homework.get("Class"), {
+        "Homework_Id": homework_id, "Subject": homework.get("Subject"), "Date": homework.get("Date"),
+        "Due_Date": homework.get("Due_Date"), "Uploaded_By": homework.get("Uploaded_By"), "Points": points,
+    })
+
+def answer_graded_event(answer_id, answer_doc, result, payload):
+    """The event of one graded answer, from the grading worker's job payload and result."""
+    return (ANSWER_GRADED, answer_doc.get("Class"), {
+        "Answer_Id": answer_id, "Homework_Id": payload.get("Homework_Id"), "Student_Gmail": answer_doc.get("Student_Gmail"),
+        "Subject": answer_doc.get("Subject"), "Date": answer_doc.get("Date"), "Marks": result["marks"],
+        "Similarity": result["similarity"], "Collection": result["collection"], "Uploaded_By": payload.get("Uploaded_By"),
+    })
+
+def seed_from_collections(db, path=None):
+    """Records the existing homework, answers and confirmed users as events; returns how many.
+
+    Only runs on an empty log. Seeded homework earns the points the Teacher dashboard would
+    have given (imported questions earn none), and seeded events carry no original timestamps.
+    """
+    if list_partitions(path):
+        raise RuntimeError("the event log already has events; seeding again would count them twice")
+    events = []
+    homework_ids = {}  # (Class, Date, Question) -> homework id
+    for doc in db.collection("homework").select(["Class", "Subject", "Date", "Due_Date", "Uploaded_By", "Question", "Model_Answer"]).stream():
+        data = doc.to_dict() or {}
+        homework_ids[(data.get("Class"), data.get("Date"), data.get("Question"))] = doc.id
+        points = 0 if doc.id.startswith("import_") else max(1, len(str(data.get("Model_Answer") or "").split()) // 10)
+        events.append(homework_posted_event(doc.id, data, points))
+    for collection_name in ("answers_archive", "answer_bank", "answers"):
+        for doc in db.collection(collection_name).select(["Student_Gmail", "Class", "Subject", "Date", "Question", "Marks"]).stream():
+            data = doc.to_dict() or {}
+            homework_id = homework_ids.get((data.get("Class"), data.get("Date"), data.get("Question")))
+            marks = data.get("Marks") if isinstance(data.get("Marks"), (int, float)) else None
+            events.append((ANSWER_SUBMITTED, data.get("Class"), {"Student_Gmail": data.get("Student_Gmail"), "Homework_Id": homework_id,
+                                                                  "Subject": data.get("Subject"), "Date": data.get("Date")}))
+            events.append(answer_graded_event(doc.id, data, {"marks": marks, "similarity": None, "collection": collection_name},
+                                              {"Homework_Id": homework_id}))
+    for doc in db.collection("users").select(["Gmail_ID", "Role", "Class", "Payment_Confirmed", "Confirmed"]).stream():
+        data = doc.to_dict() or {}
+        if data.get("Role") == "Student" and data.get("Payment_Confirmed") == "Yes":
+            events.append((PAYMENT_CONFIRMED, data.get("Class"), {"Student_Gmail": data.get("Gmail_ID")}))
+        elif data.get("Role") != "Student" and data.get("Confirmed") == "Yes":
+            events.append((STAFF_CONFIRMED, None, {"Gmail_ID": data.get("Gmail_ID"), "Role": data.get("Role")}))
+    append_events(events, path)
+    return len(events)
+
+# === READING ===
+
+def iter_events(partition=None, after=0, path=None):
+    """Yields (offset, kind, fields) of a partition's events (or all events) after an offset, in order."""
+    conn = _connect(path)
+    try:
+        while True:
+            if partition is None:
+                rows = conn.execute("SELECT offset, kind, data FROM events WHERE offset > ? ORDER BY offset LIMIT ?",
+                                    (after, READ_CHUNK_SIZE)).fetchall()
+            else:
+                rows = conn.execute("SELECT offset, kind, data FROM events WHERE partition = ? AND offset > ? ORDER BY offset LIMIT ?",
+                                    (partition, after, READ_CHUNK_SIZE)).fetchall()
+            for row in rows:
+                yield row["offset"], row["kind"], _unpack(row["data"])
+            if len(rows) < READ_CHUNK_SIZE:
+                return
+            after = rows[-1]["offset"]
+    finally:
+        conn.close()
+
+def list_partitions(path=None):
+    conn = _connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT DISTINCT partition FROM events ORDER BY partition")]
+    finally:
+        conn.close()
+
+def event_stats(path=None):
+    """Returns one row per (class, kind): event count, last offset and stored size."""
+    conn = _connect(path)
+    try:
+        rows = conn.execute("SELECT partition, kind, COUNT(*), MAX(offset), SUM(LENGTH(data)) FROM events GROUP BY partition, kind").fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame([tuple(row) for row in rows], columns=["Class", "Kind", "Events", "Last Offset", "Stored Bytes"])
+
+def checkpoint_stats(path=None):
+    """Returns one row per saved checkpoint: projection, class, offset reached and when."""
+    conn = _connect(path)
+    try:
+        rows = conn.execute("SELECT projection, partition, offset, LENGTH(state), updated_at FROM checkpoints ORDER BY projection, partition").fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame([(row[0], row[1], row[2], row[3], time.strftime("%d-%m-%Y %H:%M", time.localtime(row[4]))) for row in rows],
+                        columns=["Projection", "Class", "Offset", "State Bytes", "Saved At"])
+
+# === PROJECTIONS ===
+
+class Projection(ABC):
+    """Folds a class's events into a JSON-serialisable state; merges all classes into a DataFrame.
+
+    Bump `version` whenever apply() changes, so old checkpoints are ignored.
+    """
+    name = ""
+    version = 1
+
+    def initial(self):
+        return {}
+
+    @abstractmethod
+    def apply(self, state, kind, data):
+        """Folds one event into a class's state, in place."""
+
+    @abstractmethod
+    def to_frame(self, states):
+        """Builds the projection's table from {class: state}."""
+
+class MarksProjection(Projection):
+    """Graded answers, marks total and average per student; ranks form the class leaderboard."""
+    name = "marks"
+
+    def apply(self, state, kind, data):
+        if kind != ANSWER_GRADED or data.get("Marks") is None:
+            return
+        totals = state.setdefault(str(data.get("Student_Gmail")), {"Graded": 0, "Marks_Total": 0})
+        totals["Graded"] += 1
+        totals["Marks_Total"] += data["Marks"]
+
+    def to_frame(self, states):
+        rows = [{"Class": class_name, "Student_Gmail": gmail, **totals}
+                for class_name, state in states.items() for gmail, totals in state.items()]
+        df = pd.DataFrame(rows, columns=["Class", "Student_Gmail", "Graded", "Marks_Total"])
+        df["Average_Marks"] = (df["Marks_Total"] / df["Graded"]).round(2)
+        df["Rank"] = df.groupby("Class")["Average_Marks"].rank(method="dense", ascending=False).astype(int)
+        return df.sort_values(["Class", "Rank", "Student_Gmail"]).reset_index(drop=True)
+
+class PendingProjection(Projection):
+    """Homework assigned to each class and still unanswered per student."""
+    name = "pending"
+
+    def initial(self):
+        return {"assigned": {}, "students": {}}  # homework id -> 1; gmail -> {homework id -> 1}
+
+    def apply(self, state, kind, data):
+        if kind == HOMEWORK_POSTED:
+            state["assigned"][str(data.get("Homework_Id"))] = 1  # re-imports post the same id again
+        elif kind == ANSWER_SUBMITTED:
+            state["students"].setdefault(str(data.get("Student_Gmail")), {})[str(data.get("Homework_Id"))] = 1
+        elif kind == PAYMENT_CONFIRMED:
+            state["students"].setdefault(str(data.get("Student_Gmail")), {})
+
+    def to_frame(self, states):
+        rows = []
+        for class_name, state in states.items():
+            assigned = state["assigned"]
+            for gmail, submitted in state["students"].items():
+                done = sum(1 for homework_id in submitted if homework_id in assigned)
+                rows.append({"Class": class_name, "Student_Gmail": gmail, "Assigned": len(assigned),
+                             "Submitted": done, "Pending": len(assigned) - done})
+        return pd.DataFrame(rows, columns=["Class", "Student_Gmail", "Assigned", "Submitted", "Pending"])
+
+class SalaryPointsProjection(Projection):
+    """Questions posted and Salary Points earned per teacher."""
+    name = "salary_points"
+
+    def initial(self):
+        return {"teachers": {}, "seen": {}}
+
+    def apply(self, state, kind, data):
+        homework_id = str(data.get("Homework_Id"))
+        if kind != HOMEWORK_POSTED or homework_id in state["seen"]:
+            return
+        state["seen"][homework_id] = 1
+        totals = state["teachers"].setdefault(str(data.get("Uploaded_By")), {"Questions_Posted": 0, "Salary_Points": 0})
+        totals["Questions_Posted"] += 1
+        totals["Salary_Points"] += data.get("Points") or 0
+
+    def to_frame(self, states):
+        totals = {}
+        for state in states.values():
+            for teacher, counts in state["teachers"].items():
+                merged = totals.setdefault(teacher, {"Questions_Posted": 0, "Salary_Points": 0})
+                for field, value in counts.items():
+                    merged[field] += value
+        df = pd.DataFrame([{"Teacher": teacher, **counts} for teacher, counts in totals.items()],
+                          columns=["Teacher", "Questions_Posted", "Salary_Points"])
+        return df.sort_values("Salary_Points", ascending=False).reset_index(drop=True)
+
+PROJECTIONS = {projection.name: projection for projection in (MarksProjection(), PendingProjection(), SalaryPointsProjection())}
+
+# === REPLAY ===
+
+def _load_checkpoint(conn, projection, partition):
+    row = conn.execute("SELECT version, offset, state FROM checkpoints WHERE projection = ? AND partition = ?",
+                       (projection.name, partition)).fetchone()
+    if row is None or row["version"] != projection.version:
+        return 0, projection.initial()
+    return row["offset"], _unpack(row["state"])
+
+def _save_checkpoint(conn, projection, partition, offset, state):
+    conn.execute("INSERT OR REPLACE INTO checkpoints (projection, partition, version, offset, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 (projection.name, partition, projection.version, offset, _pack(state), time.time()))
+
+def replay_partition(projection_name, partition, reset=False, path=None):
+    """Brings one class's state up to the end of the log from its checkpoint; returns (state, offset, applied)."""
+    projection = PROJECTIONS[projection_name]
+    conn = _connect(path)
+    try:
+        offset, state = (0, projection.initial()) if reset else _load_checkpoint(conn, projection, partition)
+        applied = 0
+        for offset, kind, data in iter_events(partition, offset, path):
+            projection.apply(state, kind, data)
+            applied += 1
+            if applied % CHECKPOINT_EVERY == 0:
+                _save_checkpoint(conn, projection, partition, offset, state)
+        if applied or reset:
+            _save_checkpoint(conn, projection, partition, offset, state)
+        return state, offset, applied
+    finally:
+        conn.close()
+
+def replay(projection_name, class_names=None, workers=None, reset=False, path=None):
+    """Rebuilds a projection, one worker process per class; returns (DataFrame, events applied).
+
+    Each class resumes from its own checkpoint; `reset` replays from the start of the log.
+    """
+    projection = PROJECTIONS[projection_name]
+    path = path or log_path()
+    partitions = list(class_names) if class_names else list_partitions(path)
+    workers = min(workers or os.cpu_count() or 1, len(partitions))
+    if workers > 1:
+        # Same start method as the grading pool; each worker opens the log file itself.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(replay_partition, [projection_name] * len(partitions), partitions,
+                                    [reset] * len(partitions), [path] * len(partitions)))
+    else:
+        results = [replay_partition(projection_name, partition, reset, path) for partition in partitions]
+    states = {partition: state for partition, (state, _, _) in zip(partitions, results)}
+    return projection.to_frame(states), sum(applied for _, _, applied in results)
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the event log or rebuild a projection from it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Event counts per class and kind, and saved checkpoints")
+    subparsers.add_parser("seed", help="Record the existing Firestore history in an empty log")
+    replay_parser = subparsers.add_parser("replay", help="Rebuild a projection from its checkpoints")
+    replay_parser.add_argument("projection", choices=list(PROJECTIONS))
+    replay_parser.add_argument("--class", dest="class_names", action="append", help="Only this class (repeatable)")
+    replay_parser.add_argument("--workers", type=int, help="Worker processes (default: one per class, up to the CPU count)")
+    replay_parser.add_argument("--reset", action="store_true", help="Ignore checkpoints and replay from the first event")
+    replay_parser.add_argument("-o", "--output", help="Write the projection to this CSV file")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(event_stats().to_string(index=False))
+        print()
+        print(checkpoint_stats().to_string(index=False))
+        return 0
+    if args.command == "seed":
+        from firestore_client import connect_to_firestore
+        db = connect_to_firestore()
+        if db is None:
+            return 1
+        print(f"Recorded {seed_from_collections(db)} events.")
+        return 0
+    started = time.time()
+    df, applied = replay(args.projection, args.class_names, args.workers, args.reset)
+    print(f"Replayed {applied} events into '{args.projection}' in {time.time() - started:.2f}s ({len(df)} rows).")
+    if args.output:
+        df.to_csv(args.output, index=False)
+    else:
+        print(df.to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Streaming CSV / Excel exports of answer history, class monitoring and leaderboards.
+
+Rows are read from Firestore in CHUNK_SIZE pages (document-id cursors, projected fields)
+and passed through generators straight into the output file, so an export never holds a
+DataFrame of the collection: answer history keeps one page in memory, and the monitoring
+and leaderboard reports keep one running total per student. Class and subject filters are
+Firestore equality queries; dates are stored as dd-mm-YYYY strings, which cannot be
+range-queried, so the date range is applied to each row as it streams past.
+
+Pages use render_export_panel(); the file is only built when the download button is
+clicked. For very large exports run it from the command line instead, which writes
+straight to disk:
+    python exports.py answer_history --class 10th --subject Math --from 01-04-2025 --to 31-03-2026 -o history.xlsx
+"""
+import argparse
+import csv
+import io
+import sys
+import tempfile
+from datetime import datetime
+import streamlit as st
+from data_layer import DATE_FORMAT, LOAD_TIMEOUT_SECONDS, iter_document_chunks
+
+# === CONFIGURATION ===
+CSV_BATCH_ROWS = 200  # rows encoded per yielded CSV block
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+SUBJECTS = ["Hindi", "Sanskrit", "English", "Math", "Science", "SST", "Computer", "GK", "Physics", "Chemistry", "Biology", "Advance Classes"]
+
+# === FILTERS ===
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+def _query(db, collection_name, fields, class_name=None, subject=None, **equals):
+    query = db.collection(collection_name)
+    for field, value in (("Class", class_name), ("Subject", subject), *equals.items()):
+        if value:
+            query = query.where(field, "==", value)
+    return query.select(fields)
+
+def iter_records(db, collection_name, fields, class_name=None, subject=None, date_from=None, date_to=None, **equals):
+    """Yields the documents of a filtered query as dicts, one page in memory at a time."""
+    query = _query(db, collection_name, fields, class_name, subject, **equals)
+    for docs in iter_document_chunks(query, timeout=LOAD_TIMEOUT_SECONDS):
+        for doc in docs:
+            record = doc.to_dict() or {}
+            if date_from or date_to:
+                date = _parse_date(record.get("Date"))
+                if date is None or (date_from and date < date_from) or (date_to and date > date_to):
+                    continue
+            yield record
+
+def load_student_names(db, class_name=None):
+    """Returns {Gmail_ID: (User_Name, Class)} for the students of a class (or all students)."""
+    return {record.get("Gmail_ID"): (record.get("User_Name", ""), record.get("Class", ""))
+            for record in iter_records(db, "users", ["Gmail_ID", "User_Name", "Class"], class_name, Role="Student")}
+
+# === REPORTS ===
+
+ANSWER_HISTORY_COLUMNS = ["Student Name", "Student Gmail", "Class", "Subject", "Date", "Question", "Answer", "Marks", "Remarks", "Status"]
+
+def answer_history_rows(db, class_name=None, subject=None, date_from=None, date_to=None):
+    """Every submitted answer: graded ones from answer_bank, then those still waiting in answers."""
+    names = load_student_names(db, class_name)
+    fields = ["Student_Gmail", "Class", "Subject", "Date", "Question", "Answer", "Marks", "Remarks"]
+    for collection_name, status in (("answer_bank", "Passed"), ("answers", "Not passed yet")):
+        for record in iter_records(db, collection_name, fields, class_name, subject, date_from, date_to):
+            gmail = record.get("Student_Gmail", "")
+            yield [names.get(gmail, ("", ""))[0], gmail, record.get("Class", ""), record.get("Subject", ""),
+                   record.get("Date", ""), record.get("Question", ""), record.get("Answer", ""),
+                   record.get("Marks"), record.get("Remarks", ""), status]
+
+MONITORING_COLUMNS = ["Student Name", "Class", "Assigned", "Completed", "Completion %", "Overdue"]
+
+def monitoring_rows(db, class_name=None, subject=None, date_from=None, date_to=None, uploaded_by=None):
+    """Per-student completion and overdue counts, as on the Teacher's Student Monitoring page."""
+    homework = {}  # (Class, Date, Question) -> due date
+    for record in iter_records(db, "homework", ["Class", "Date", "Due_Date", "Question"], class_name, subject,
+                               date_from, date_to, Uploaded_By=uploaded_by):
+        homework[(record.get("Class"), record.get("Date"), record.get("Question"))] = _parse_date(record.get("Due_Date"))
+    homework_per_class = {}
+    for key, due in homework.items():
+        homework_per_class.setdefault(key[0], []).append((key, due))
+
+    completed = {}  # Student_Gmail -> set of homework keys
+    fields = ["Student_Gmail", "Class", "Date", "Question"]
+    for collection_name in ("answers", "answer_bank"):
+        for record in iter_records(db, collection_name, fields, class_name, subject, date_from, date_to):
+            key = (record.get("Class"), record.get("Date"), record.get("Question"))
+            if key in homework:
+                completed.setdefault(record.get("Student_Gmail"), set()).add(key)
+
+    today = datetime.today().date()
+    for gmail, (name, cls) in sorted(load_student_names(db, class_name).items(), key=lambda item: (str(item[1][1]), str(item[1][0]))):
+        done = completed.get(gmail, set())
+        class_homework = homework_per_class.get(cls, [])
+        assigned = len(class_homework)
+        overdue = sum(1 for key, due in class_homework if due and due < today and key not in done)
+        yield [name, cls, assigned, len(done), round(len(done) / assigned * 100, 2) if assigned else 0.0, overdue]
+
+LEADERBOARD_COLUMNS = ["Rank", "Student Name", "Class", "Average Marks", "Graded Answers"]
+
+def leaderboard_rows(db, class_name=None, subject=None, date_from=None, date_to=None):
+    """Students ranked by their average marks in answer_bank, per class."""
+    totals = {}  # Student_Gmail -> [marks total, graded answers]
+    for record in iter_records(db, "answer_bank", ["Student_Gmail", "Date", "Marks"], class_name, subject, date_from, date_to):
+        marks = record.get("Marks")
+        if isinstance(marks, (int, float)):
+            total = totals.setdefault(record.get("Student_Gmail"), [0.0, 0])
+            total[0] += marks
+            total[1] += 1
+    names = load_student_names(db, class_name)
+    ranked = sorted(((names[gmail][1], -(marks / count), names[gmail][0], count)
+                     for gmail, (marks, count) in totals.items() if gmail in names), key=lambda row: (str(row[0]), row[1]))
+    rank, previous = 0, None
+    for cls, negative_average, name, count in ranked:
+        rank = 1 if previous is None or previous[0] != cls else rank + (previous[1] != negative_average)
+        previous = (cls, negative_average)
+        yield [rank, name, cls, round(-negative_average, 2), count]
+
+EXPORTS = {
+    "answer_history": ("Answer History", ANSWER_HISTORY_COLUMNS, answer_history_rows),
+    "monitoring": ("Class Monitoring", MONITORING_COLUMNS, monitoring_rows),
+    "leaderboard": ("Leaderboard", LEADERBOARD_COLUMNS, leaderboard_rows),
+}
+
+# === WRITERS ===
+
+def iter_csv(columns, rows):
+    """Encodes rows as UTF-8 CSV (with a BOM so Excel detects the encoding), a block at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(["" if value is None else value for value in row])
+        if index % CSV_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def write_export(out, fmt, title, columns, rows):
+    """Writes rows to a binary file object as 'csv' or 'xlsx'."""
+    if fmt == "csv":
+        for block in iter_csv(columns, rows):
+            out.write(block)
+        return
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)  # streams rows to a temporary file instead of keeping cells
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(out)
+
+def build_export(db, export_name, fmt, **filters):
+    """Writes an export through a temporary file and returns its bytes for a download button."""
+    title, columns, make_rows = EXPORTS[export_name]
+    with tempfile.TemporaryFile() as out:
+        write_export(out, fmt, title, columns, make_rows(db, **filters))
+        out.seek(0)
+        return out.read()
+
+# === UI ===
+
+def render_export_panel(db, export_name, key, classes, class_name=None, **fixed_filters):
+    """Renders filters and a download button; the export is only built when the button is clicked.
+
+    `class_name` fixes the class; otherwise the user picks one of `classes` (or all).
+    """
+    title = EXPORTS[export_name][0]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        if class_name is None:
+            choice = st.selectbox("Class", ["All Classes"] + list(classes), key=f"{key}_class")
+            class_name = None if choice == "All Classes" else choice
+        else:
+            st.text_input("Class", value=class_name, disabled=True, key=f"{key}_class")
+    with col2:
+        subject = st.selectbox("Subject", ["All Subjects"] + SUBJECTS, key=f"{key}_subject")
+    with col3:
+        date_range = st.date_input("Date range", value=(), key=f"{key}_dates")
+    with col4:
+        format_label = st.selectbox("Format", list(FORMATS), key=f"{key}_format")
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+    extension, mime = FORMATS[format_label]
+    filters = {"class_name": class_name, "subject": None if subject == "All Subjects" else subject,
+               "date_from": date_from, "date_to": date_to, **fixed_filters}
+    file_name = "_".join(part for part in [title.replace(" ", "_"), class_name, filters["subject"]] if part) + f".{extension}"
+    st.download_button(f"⬇️ Download {title}", data=lambda: build_export(db, export_name, extension, **filters),
+                       file_name=file_name, mime=mime, key=f"{key}_download", on_click="ignore",
+                       disabled=db is None)
+
+# === MAIN ===
+
+def _date_argument(value):
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export answer history, class monitoring or leaderboards to CSV/XLSX.")
+    parser.add_argument("export", choices=list(EXPORTS))
+    parser.add_argument("-o", "--output", required=True, help="Output file; .xlsx writes Excel, anything else CSV")
+    parser.add_argument("--class", dest="class_name", help="Only this class, e.g. 10th")
+    parser.add_argument("--subject", help="Only this subject")
+    parser.add_argument("--from", dest="date_from", type=_date_argument, help=f"First date ({DATE_FORMAT.replace('%', '')})")
+    parser.add_argument("--to", dest="date_to", type=_date_argument, help="Last date")
+    parser.add_argument("--uploaded-by", help="Monitoring only: homework created by this teacher")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    title, columns, make_rows = EXPORTS[args.export]
+    filters = {"class_name": args.class_name, "subject": args.subject, "date_from": args.date_from, "date_to": args.date_to}
+    if args.export == "monitoring":
+        filters["uploaded_by"] = args.uploaded_by
+    fmt = "xlsx" if args.output.lower().endswith(".xlsx") else "csv"
+    with open(args.output, "wb") as out:
+        write_export(out, fmt, title, columns, make_rows(db, **filters))
+    print(f"Wrote {title} to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import json
+import base64
+import sys
+import streamlit as st
+import firebase_admin
+from firebase_admin import credentials, firestore
+from tenancy import TenantClient, current_tenant
+
+# Firestore caps a single batched write at 500 operations.
+MAX_BATCH_WRITES = 500
+# Server-side write time on dashboard documents; the snapshot cache refreshes only documents newer than its last sync.
+UPDATED_AT_FIELD = "Updated_At"
+# Per-collection time of the last document deletion; deletions leave no Updated_At stamp behind.
+DELETIONS_DOC_PATH = "system_metrics/deletions"
+
+# === UTILITY FUNCTIONS for FIREBASE ===
+
+def get_firestore_client():
+    """Initializes firebase_admin from the app's secrets.toml once and returns a Firestore client."""
+    if not firebase_admin._apps:
+        creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
+        creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
+        creds_dict = json.loads(creds_json_str)
+        cred = credentials.Certificate(creds_dict)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+def connect_to_firestore(tenant_id=None):
+    """Connects a command-line tool to one centre's data (default: CENTRE_ID), printing the error instead of raising."""
+    try:
+        return TenantClient(get_firestore_client(), tenant_id or current_tenant())
+    except Exception as e:
+        print(f"Error connecting to Firebase Firestore: {e}", file=sys.stderr)
+        return None
+
+def stamp_update(data):
+    """Returns a copy of a document write with the server-side Updated_At stamp added."""
+    return {**data, UPDATED_AT_FIELD: firestore.SERVER_TIMESTAMP}
+
+def record_deletion(db, collection_name, batch=None):
+    """Notes that documents were deleted from a collection, so disk snapshots of it get rebuilt."""
+    doc_ref = db.document(DELETIONS_DOC_PATH)
+    data = {collection_name: firestore.SERVER_TIMESTAMP}
+    if batch is not None:
+        batch.set(doc_ref, data, merge=True)
+    else:
+        doc_ref.set(data, merge=True)
+
+def last_deletion(db, collection_name):
+    """Returns when documents were last deleted from a collection, as epoch seconds (0 if never)."""
+    snapshot = db.document(DELETIONS_DOC_PATH).get()
+    stamp = (snapshot.to_dict() or {}).get(collection_name) if snapshot.exists else None
+    return stamp.timestamp() if hasattr(stamp, "timestamp") else 0.0
+
+def commit_in_batches(db, operations, batch_size=400, merge=False):
+    """Applies (doc_ref, data) set operations in batched commits and returns how many were written.
+
+    With merge=True, fields not in `data` are left untouched on existing documents.
+    """
+    batch_size = min(batch_size, MAX_BATCH_WRITES)
+    written = 0
+    batch = db.batch()
+    pending = 0
+    for doc_ref, data in operations:
+        batch.set(doc_ref, data, merge=merge)
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            written += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        written += pending
+    return written
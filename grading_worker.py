@@ -0,0 +1,210 @@
+"""Out-of-process auto-grading for student answers.
+
+The Student dashboard only enqueues a "grade" job; a pool of worker processes claims jobs
+in micro-batches, scores them against the model answer and writes every result of the
+batch to Firestore in one batched commit per centre (the job payload names the centre).
+
+Run a standalone pool with:
+    python grading_worker.py --workers 4 --batch-size 20
+
+If no standalone pool is configured (GRADING_WORKERS_EXTERNAL unset), the Streamlit server
+starts a small pool itself the first time a student page loads.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+import job_queue
+
+# === CONFIGURATION ===
+GRADE_JOB = "grade"
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 20
+IDLE_SLEEP_SECONDS = 0.5
+
+# === GRADING ===
+
+def get_text_similarity(text1, text2):
+    """Calculates similarity percentage between two texts."""
+    try:
+        if not text1 or not text2: return 0.0
+        vectorizer = TfidfVectorizer().fit_transform([text1.lower(), text2.lower()])
+        similarity_matrix = cosine_similarity(vectorizer)
+        return similarity_matrix[0][1] * 100
+    except Exception:
+        return 0.0
+
+def get_grade_from_similarity(percentage):
+    """Assigns a grade score based on similarity percentage."""
+    if percentage >= 95: return 5
+    elif percentage >= 80: return 4
+    elif percentage >= 60: return 3
+    else: return 1
+
+def grade_submission(payload):
+    """Scores one submission and returns (collection name, answer document, result summary)."""
+    model_answer = (payload.get("Model_Answer") or "").strip()
+    similarity = get_text_similarity(payload.get("Answer", ""), model_answer)
+    grade_score = get_grade_from_similarity(similarity)
+
+    if grade_score >= 3:
+        collection_name = "answer_bank"
+        remark = "Good! Try for better performance." if grade_score == 3 else f"Auto-Graded: Excellent! ({similarity:.2f}%)"
+        message = f"Your answer was {similarity:.2f}% correct and has been saved."
+    else:
+        collection_name = "answers"
+        remark = f"Auto-Remark: Your answer was {similarity:.2f}% correct. Please improve it."
+        grade_score = None
+        message = f"Your answer was {similarity:.2f}% correct. Please resubmit."
+
+    answer_doc = {
+        "Student_Gmail": payload.get("Student_Gmail"), "Date": payload.get("Date"),
+        "Class": payload.get("Class"), "Subject": payload.get("Subject"),
+        "Question": payload.get("Question"), "Answer": payload.get("Answer"),
+        "Marks": grade_score, "Remarks": remark, "Attempt_Status": 1
+    }
+    result = {"similarity": round(float(similarity), 2), "marks": grade_score, "collection": collection_name,
+              "passed": grade_score is not None, "message": message}
+    return collection_name, answer_doc, result
+
+class StagedWrites:
+    """Collects one job's batch writes, so they reach the shared batch only once the whole job has succeeded."""
+
+    def __init__(self):
+        self.writes = []
+
+    def set(self, doc_ref, data, merge=False):
+        self.writes.append((doc_ref, data, merge))
+
+    def apply(self, batch):
+        for doc_ref, data, merge in self.writes:
+            batch.set(doc_ref, data, merge=merge)
+
+def answer_id(job):
+    """The answer document id of a grading job: a job graded again rewrites the same document."""
+    return f"grade-{int(job['created_at'] * 1000)}-{job['id']}"
+
+def process_batch(db, jobs):
+    """Grades a micro-batch of jobs and commits all their answer documents together.
+
+    Answers are written under answer_id(job). A job whose answer already exists was committed
+    before its worker stopped; it is completed again without adding to counters, summaries,
+    rollups or the event log a second time.
+    """
+    from copy_detection import register_answer
+    from sharded_counters import increment_class_stats
+    from student_summary import add_graded_answer
+    from rollups import RollupBatch, utc_today
+    from event_log import answer_graded_event, append_events, log_path
+    from firestore_client import stamp_update
+
+    graded, already_committed = [], []
+    batch = db.batch()
+    rollup = RollupBatch()
+    for job in jobs:
+        try:
+            collection_name, answer_doc, result = grade_submission(job["payload"])
+            doc_ref = db.collection(collection_name).document(answer_id(job))
+            result["doc_id"] = doc_ref.id
+            if doc_ref.get().exists:
+                already_committed.append((job, answer_doc, result))
+                continue
+            staged = StagedWrites()
+            staged.set(doc_ref, stamp_update(answer_doc))
+            increment_class_stats(db, answer_doc["Class"], staged, Submissions=1,
+                                  Graded_Submissions=1 if result["passed"] else 0,
+                                  Marks_Total=result["marks"] or 0)
+            if result["passed"]:
+                add_graded_answer(db, staged, doc_ref.id, answer_doc)
+        except Exception as e:
+            job_queue.fail(job["id"], e, job["attempts"])
+            continue
+        staged.apply(batch)
+        rollup.add_submission(utc_today(), answer_doc["Class"], answer_doc["Subject"], job["payload"].get("Uploaded_By"),
+                              result["marks"], job["payload"].get("Due_Date"))
+        graded.append((job, answer_doc, result))
+
+    if graded:
+        try:
+            rollup.write(db, batch)
+            batch.commit()
+        except Exception as e:
+            for job, _, _ in graded:
+                job_queue.fail(job["id"], e, job["attempts"])
+            graded = []
+    if graded:
+        try:
+            append_events([answer_graded_event(result["doc_id"], answer_doc, result, job["payload"]) for job, answer_doc, result in graded],
+                          log_path(db.tenant_id))
+        except Exception:
+            pass  # the grades are already committed; the event log must never fail a job
+    for job, answer_doc, result in graded + already_committed:
+        try:
+            register_answer(db, result["doc_id"], answer_doc, job["payload"].get("Model_Answer", ""))  # idempotent
+        except Exception:
+            pass  # copy detection must never hold back a grade
+        job_queue.complete(job["id"], result)
+    return len(graded) + len(already_committed)
+
+# === WORKER PROCESSES ===
+
+def worker_loop(batch_size=DEFAULT_BATCH_SIZE, queue_path=None):
+    """Runs in a worker process: claims, grades and writes back jobs until terminated."""
+    if queue_path:
+        job_queue.QUEUE_PATH = queue_path
+    from firestore_client import connect_to_firestore
+    from tenancy import DEFAULT_TENANT, for_tenant
+    db = connect_to_firestore()
+    if db is None:
+        return
+    last_stale_check = 0.0
+    while True:
+        if time.time() - last_stale_check > 60:
+            job_queue.requeue_stale(GRADE_JOB)
+            last_stale_check = time.time()
+        jobs = job_queue.claim_batch(GRADE_JOB, batch_size)
+        if not jobs:
+            time.sleep(IDLE_SLEEP_SECONDS)
+            continue
+        jobs_by_tenant = {}
+        for job in jobs:
+            jobs_by_tenant.setdefault(job["payload"].get("Tenant") or DEFAULT_TENANT, []).append(job)
+        for tenant_id, tenant_jobs in jobs_by_tenant.items():
+            process_batch(for_tenant(db, tenant_id), tenant_jobs)
+
+def start_worker_pool(num_workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+    """Starts daemon grading processes and returns them."""
+    context = multiprocessing.get_context("spawn")  # firebase/grpc clients are not fork-safe
+    processes = []
+    for _ in range(num_workers):
+        process = context.Process(target=worker_loop, args=(batch_size, job_queue.QUEUE_PATH), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a pool of grading worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    processes = start_worker_pool(args.workers, args.batch_size)
+    print(f"Started {len(processes)} grading workers on {job_queue.QUEUE_PATH}.")
+    try:
+        while True:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    processes[i] = start_worker_pool(1, args.batch_size)[0]
+            time.sleep(5)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
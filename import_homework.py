@@ -0,0 +1,251 @@
+"""Bulk importer for the homework Word files kept under HOMEWORK/<class>/<date>.docx.
+
+Usage:
+    python import_homework.py                       # import every file under HOMEWORK/
+    python import_homework.py --dry-run             # parse and validate only, write nothing
+    python import_homework.py --class 8th --workers 8 --report import_report.json
+
+Each docx is stream-parsed into (subject, question, model answer) items. A line such as
+"Ans: ..." or "Answer - ..." directly after a question becomes its model answer. Documents
+get deterministic ids, so re-running the importer overwrites instead of duplicating.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import xml.etree.ElementTree as ET
+
+# === CONFIGURATION ===
+DATE_FORMAT = "%d-%m-%Y"
+FILE_DATE_FORMAT = "%Y-%m-%d"
+HOMEWORK_DIR = "HOMEWORK"
+HOMEWORK_COLLECTION = "homework"
+VALID_CLASSES = [f"{i}th" for i in range(5, 13)]
+SUBJECTS = ["Hindi", "Sanskrit", "English", "Math", "Science", "SST", "Computer", "GK", "Physics", "Chemistry", "Biology", "Advance Classes"]
+
+# Heading keywords (lower case) mapped onto the subjects used by the "Create Homework" form.
+SUBJECT_KEYWORDS = {
+    "mathematics": "Math", "maths": "Math", "math": "Math", "गणित": "Math",
+    "social science": "SST", "sst": "SST", "history": "SST", "civics": "SST", "geography": "SST",
+    "science": "Science", "विज्ञान": "Science",
+    "english": "English", "hindi": "Hindi", "हिंदी": "Hindi", "हिन्दी": "Hindi",
+    "sanskrit": "Sanskrit", "संस्कृत": "Sanskrit",
+    "computer": "Computer", "gk": "GK", "general knowledge": "GK",
+    "physics": "Physics", "chemistry": "Chemistry", "biology": "Biology",
+}
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+QUESTION_PATTERN = re.compile(r"^\s*(?:[•➤▪◦\-\*]|\(?\d+[.)]|\(?[a-z][.)]\s)\s*", re.IGNORECASE)
+ANSWER_PATTERN = re.compile(r"^\s*(?:ans(?:wer)?|उत्तर)\s*[:.\-–]\s*", re.IGNORECASE)
+PLACEHOLDER_PATTERN = re.compile(r"^\[.*\]$")
+
+# === DOCX PARSING ===
+
+def iter_paragraphs(docx_path):
+    """Streams (text, is_list_item) for every non-empty paragraph of a docx file."""
+    with zipfile.ZipFile(docx_path) as archive:
+        with archive.open("word/document.xml") as document:
+            for event, elem in ET.iterparse(document, events=("end",)):
+                if elem.tag != f"{W_NS}p":
+                    continue
+                text = "".join(node.text or "" for node in elem.iter(f"{W_NS}t")).strip()
+                is_list_item = elem.find(f"{W_NS}pPr/{W_NS}numPr") is not None
+                elem.clear()
+                if text:
+                    yield text, is_list_item
+
+def match_subject(heading):
+    """Maps a heading such as 'Science – Chapter 4: Combustion' onto an app subject."""
+    cleaned = re.sub(r"^[^\wऀ-ॿ]+", "", heading).strip().lower()
+    for keyword in sorted(SUBJECT_KEYWORDS, key=len, reverse=True):
+        if cleaned.startswith(keyword):
+            return SUBJECT_KEYWORDS[keyword]
+    return None
+
+def is_heading(text):
+    """Treats a line as a subject heading if it names a subject or has a 'Subject – Topic' shape."""
+    return match_subject(text) is not None or " – " in text
+
+def parse_homework_file(docx_path):
+    """Parses one homework docx into question items plus the validation messages for that file."""
+    result = {"file": docx_path, "class": None, "date": None, "items": [], "errors": [], "warnings": []}
+    class_name = os.path.basename(os.path.dirname(docx_path))
+    date_stem = os.path.splitext(os.path.basename(docx_path))[0]
+
+    if class_name not in VALID_CLASSES:
+        result["errors"].append(f"Folder '{class_name}' is not a valid class ({VALID_CLASSES[0]} to {VALID_CLASSES[-1]}).")
+    else:
+        result["class"] = class_name
+    try:
+        result["date"] = datetime.strptime(date_stem, FILE_DATE_FORMAT).date()
+    except ValueError:
+        result["errors"].append(f"File name '{date_stem}' is not a date in YYYY-MM-DD format.")
+    if result["errors"]:
+        return result
+
+    subject = None
+    current = None
+    try:
+        for text, is_list_item in iter_paragraphs(docx_path):
+            if PLACEHOLDER_PATTERN.match(text):
+                continue
+            answer_match = ANSWER_PATTERN.match(text)
+            if answer_match and current is not None:
+                current["model_answer"] = (current["model_answer"] + " " + text[answer_match.end():]).strip()
+                current["in_answer"] = True
+            elif QUESTION_PATTERN.match(text) or is_list_item:
+                if subject is None:
+                    result["warnings"].append(f"Question outside any subject heading skipped: '{text[:60]}'")
+                    continue
+                current = {"subject": subject, "question": QUESTION_PATTERN.sub("", text, count=1).strip(), "model_answer": "", "in_answer": False}
+                result["items"].append(current)
+            elif is_heading(text):
+                subject = match_subject(text)
+                if subject is None:
+                    subject = re.split(r"\s+[–\-:]\s+", text, maxsplit=1)[0].strip()
+                    result["warnings"].append(f"Heading '{text[:60]}' is not a known subject; imported as '{subject}'.")
+                current = None
+            elif current is not None:
+                # Continuation lines (tables, fill-in rows) belong to the open question or answer.
+                key = "model_answer" if current["in_answer"] else "question"
+                current[key] = (current[key] + "\n" + text).strip()
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        result["errors"].append(f"Could not read document: {e}")
+        return result
+
+    seen = set()
+    unique_items = []
+    for item in result["items"]:
+        item.pop("in_answer", None)
+        key = (item["subject"], normalize_text(item["question"]))
+        if key in seen:
+            result["warnings"].append(f"Duplicate question in file skipped: '{item['question'][:60]}'")
+            continue
+        seen.add(key)
+        unique_items.append(item)
+    result["items"] = unique_items
+    if not unique_items:
+        result["warnings"].append("No questions found.")
+    return result
+
+def normalize_text(text):
+    """Lower-cases and collapses whitespace so re-imports map to the same document id."""
+    return " ".join(str(text).lower().split())
+
+def homework_doc_id(class_name, date_str, subject, question):
+    """Builds a deterministic document id for an imported homework question."""
+    key = "|".join([class_name, date_str, subject, normalize_text(question)])
+    return "import_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+def build_homework_docs(parsed, uploaded_by, require_answers):
+    """Turns a parsed file into (doc_id, homework document) pairs in the app's schema."""
+    docs = []
+    date_str = parsed["date"].strftime(DATE_FORMAT)
+    due_date = (parsed["date"] + timedelta(days=1)).strftime(DATE_FORMAT)
+    for item in parsed["items"]:
+        if require_answers and not item["model_answer"]:
+            continue
+        docs.append((homework_doc_id(parsed["class"], date_str, item["subject"], item["question"]), {
+            "Class": parsed["class"], "Date": date_str,
+            "Uploaded_By": uploaded_by, "Subject": item["subject"],
+            "Question": item["question"], "Model_Answer": item["model_answer"],
+            "Due_Date": due_date, "Source_File": parsed["file"].replace(os.sep, "/")
+        }))
+    return docs
+
+def find_homework_files(root, class_filter=None):
+    """Walks HOMEWORK/<class>/<date>.docx and returns the files in a stable order."""
+    files = []
+    for class_name in sorted(os.listdir(root)):
+        class_dir = os.path.join(root, class_name)
+        if not os.path.isdir(class_dir) or (class_filter and class_name != class_filter):
+            continue
+        for file_name in sorted(os.listdir(class_dir)):
+            if file_name.lower().endswith(".docx") and not file_name.startswith("~$"):
+                files.append(os.path.join(class_dir, file_name))
+    return files
+
+# === REPORTING ===
+
+def print_report(report):
+    """Prints the per-file validation report."""
+    print(f"{'File':45} {'Found':>6} {'Import':>7} {'No answer':>10}  Status")
+    for entry in report["files"]:
+        status = "ERROR" if entry["errors"] else ("WARN" if entry["warnings"] else "OK")
+        print(f"{entry['file']:45} {entry['found']:>6} {entry['imported']:>7} {entry['missing_answers']:>10}  {status}")
+        for message in entry["errors"]:
+            print(f"    error: {message}")
+        for message in entry["warnings"]:
+            print(f"    warning: {message}")
+    totals = report["totals"]
+    print(f"\nFiles: {totals['files']} | Questions found: {totals['found']} | "
+          f"Prepared: {totals['imported']} | Written: {totals['written']} | Files with errors: {totals['failed_files']}")
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Import homework docx files into the Firestore 'homework' collection.")
+    parser.add_argument("--root", default=HOMEWORK_DIR, help="Directory laid out as <class>/<YYYY-MM-DD>.docx")
+    parser.add_argument("--class", dest="class_filter", help="Only import one class folder, e.g. 8th")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Parallel parser processes")
+    parser.add_argument("--uploaded-by", default="Bulk Import", help="Value stored in Uploaded_By")
+    parser.add_argument("--allow-missing-answers", action="store_true",
+                        help="Also import questions that have no model answer (students cannot be auto-graded on them)")
+    parser.add_argument("--batch-size", type=int, default=400, help="Writes per batched commit (max 500)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate without writing to Firestore")
+    parser.add_argument("--report", help="Also write the validation report as JSON to this path")
+    args = parser.parse_args()
+
+    files = find_homework_files(args.root, args.class_filter)
+    if not files:
+        print(f"No .docx files found under '{args.root}'.")
+        return 1
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        parsed_files = list(executor.map(parse_homework_file, files))
+
+    report = {"files": [], "totals": {"files": len(files), "found": 0, "imported": 0, "written": 0, "failed_files": 0}}
+    operations = []
+    for parsed in parsed_files:
+        docs = build_homework_docs(parsed, args.uploaded_by, not args.allow_missing_answers) if not parsed["errors"] else []
+        missing_answers = sum(1 for item in parsed["items"] if not item["model_answer"])
+        if missing_answers and not args.allow_missing_answers:
+            parsed["warnings"].append(f"{missing_answers} question(s) without a model answer were skipped.")
+        report["files"].append({
+            "file": parsed["file"], "found": len(parsed["items"]), "imported": len(docs),
+            "missing_answers": missing_answers, "errors": parsed["errors"], "warnings": parsed["warnings"]
+        })
+        report["totals"]["found"] += len(parsed["items"])
+        report["totals"]["imported"] += len(docs)
+        report["totals"]["failed_files"] += 1 if parsed["errors"] else 0
+        operations.extend(docs)
+
+    if operations and not args.dry_run:
+        from firestore_client import connect_to_firestore, commit_in_batches, stamp_update
+        db = connect_to_firestore()
+        if db is None:
+            return 1
+        homework_ref = db.collection(HOMEWORK_COLLECTION)
+        report["totals"]["written"] = commit_in_batches(
+            db, ((homework_ref.document(doc_id), stamp_update(data)) for doc_id, data in operations), args.batch_size
+        )
+        # Re-imports overwrite the same documents, so recount rather than increment.
+        from student_summary import refresh_assigned
+        refresh_assigned(db, sorted({data["Class"] for _, data in operations}))
+        # Imported questions earn no Salary Points; replays count a re-imported id once.
+        from event_log import append_events, homework_posted_event
+        append_events([homework_posted_event(doc_id, data) for doc_id, data in operations])
+
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["totals"]["failed_files"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Bulk importer for the StudentMaster.xlsx / TeacherMaster.xlsx user sheets.
+
+Usage:
+    python import_users.py                              # import both master sheets
+    python import_users.py --dry-run --diff             # show what would change, write nothing
+    python import_users.py NewStudents.xlsx --role Student --report users_report.json
+
+Rows are streamed from each sheet (openpyxl read-only mode), validated, and upserted into
+'users' keyed by Gmail ID: an existing user is updated in place, a new one is created with
+the Gmail ID as its document id, as the registration form does. PINs are stored with the
+same SHA-256 hash the login form checks. Blank cells never overwrite existing values, and
+existing passwords are kept unless --reset-passwords is given. New staff wait for the Admin's
+confirmation, as after registration, unless the sheet has a Confirmed column or
+--confirm-staff is given.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from datetime import datetime, date, timedelta
+
+# === CONFIGURATION ===
+DATE_FORMAT = "%d-%m-%Y"
+USERS_COLLECTION = "users"
+VALID_CLASSES = [f"{i}th" for i in range(5, 13)]
+STAFF_ROLES = ["Teacher", "Principal", "Admin"]
+SUBSCRIPTION_PLANS = {
+    "₹1000 for 6 months (With Advance Classes)": 182,
+    "₹2000 for 1 year (With Advance Classes)": 365,
+    "₹200 for 30 days (Subjects Homework Only)": 30
+}
+DEFAULT_FILES = {"StudentMaster.xlsx": "Student", "TeacherMaster.xlsx": "Teacher"}
+
+# Sheet headings (lower case, punctuation removed) mapped onto user document fields.
+COLUMN_FIELDS = {
+    "student name": "User_Name", "teacher name": "User_Name", "name": "User_Name", "full name": "User_Name",
+    "gmail id": "Gmail_ID", "gmail": "Gmail_ID", "email": "Gmail_ID", "username": "Gmail_ID",
+    "password": "Password", "pin": "Password",
+    "role": "Role", "class": "Class",
+    "father name": "Father_Name", "fathers name": "Father_Name",
+    "parent phonepe": "Parent_PhonePe", "parents phonepe number": "Parent_PhonePe", "phonepe": "Parent_PhonePe",
+    "subscription plan": "Subscription_Plan", "plan": "Subscription_Plan",
+    "subscription date": "Subscription_Date", "subscribed till": "Subscribed_Till",
+    "payment confirmed": "Payment_Confirmed", "confirmed": "Confirmed",
+}
+DATE_FIELDS = ["Subscription_Date", "Subscribed_Till"]
+YES_NO_FIELDS = ["Payment_Confirmed", "Confirmed"]
+
+# Values a new user gets when the sheet leaves them blank (staff still need the Admin's confirmation).
+NEW_STUDENT_DEFAULTS = {"Payment_Confirmed": "No", "Subscription_Date": "", "Subscribed_Till": ""}
+NEW_STAFF_DEFAULTS = {"Confirmed": "No"}
+
+# === SHEET READING ===
+
+def make_hashes(password):
+    """Hashes a PIN exactly like the login form in main.py."""
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+def normalize_heading(value):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", str(value or "").lower())).strip()
+
+def iter_sheet_rows(xlsx_path):
+    """Streams (row number, {field: cell value}) from the first worksheet of an .xlsx file."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        fields = [COLUMN_FIELDS.get(normalize_heading(heading)) for heading in header]
+        for row_number, row in enumerate(rows, start=2):
+            values = {field: value for field, value in zip(fields, row) if field and value not in (None, "")}
+            if values:
+                yield row_number, values
+    finally:
+        workbook.close()
+
+# === VALIDATION ===
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores typed PINs and phone numbers as floats
+    return str(value).strip()
+
+def _date_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime(DATE_FORMAT)
+    text = _text(value)
+    for fmt in (DATE_FORMAT, "%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(text, fmt).strftime(DATE_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(f"'{text}' is not a date")
+
+def _class_name(value):
+    text = _text(value).lower()
+    return f"{text}th" if text.isdigit() else text
+
+def _plan_name(value):
+    text = _text(value)
+    for plan in SUBSCRIPTION_PLANS:
+        if plan.casefold() == text.casefold():
+            return plan
+    return None
+
+def build_user_doc(values, default_role):
+    """Validates one sheet row and returns (user fields, errors)."""
+    errors = []
+    doc = {}
+    gmail = _text(values.get("Gmail_ID", "")).lower()
+    if "@" not in gmail:
+        errors.append(f"invalid Gmail ID '{gmail}'" if gmail else "missing Gmail ID")
+    doc["Gmail_ID"] = gmail
+    if values.get("User_Name"):
+        doc["User_Name"] = _text(values["User_Name"])
+    else:
+        errors.append("missing name")
+
+    role = _text(values.get("Role", default_role)).title()
+    if role != "Student" and role not in STAFF_ROLES:
+        errors.append(f"unknown role '{role}'")
+    doc["Role"] = role
+    if values.get("Password"):
+        doc["Password"] = make_hashes(_text(values["Password"]))
+
+    if role == "Student":
+        class_name = _class_name(values.get("Class", ""))
+        if class_name not in VALID_CLASSES:
+            errors.append(f"class '{values.get('Class', '')}' is not one of {', '.join(VALID_CLASSES)}")
+        doc["Class"] = class_name
+        if values.get("Subscription_Plan"):
+            plan = _plan_name(values["Subscription_Plan"])
+            if plan is None:
+                errors.append(f"unknown subscription plan '{values['Subscription_Plan']}'")
+            doc["Subscription_Plan"] = plan
+        for field in ("Father_Name", "Parent_PhonePe"):
+            if values.get(field):
+                doc[field] = _text(values[field])
+        for field in DATE_FIELDS:
+            if values.get(field):
+                try:
+                    doc[field] = _date_text(values[field])
+                except ValueError as e:
+                    errors.append(f"{field}: {e}")
+        if doc.get("Subscription_Date") and not doc.get("Subscribed_Till") and doc.get("Subscription_Plan"):
+            start = datetime.strptime(doc["Subscription_Date"], DATE_FORMAT)
+            doc["Subscribed_Till"] = (start + timedelta(days=SUBSCRIPTION_PLANS[doc["Subscription_Plan"]])).strftime(DATE_FORMAT)
+
+    for field in YES_NO_FIELDS:
+        if field in values:
+            answer = _text(values[field]).lower()
+            if answer not in ("yes", "y", "true", "1", "no", "n", "false", "0"):
+                errors.append(f"{field} must be Yes or No, not '{values[field]}'")
+            doc[field] = "Yes" if answer in ("yes", "y", "true", "1") else "No"
+    return doc, errors
+
+def read_user_sheets(files):
+    """Validates every row of the given {path: default role} sheets.
+
+    Returns (valid docs by Gmail ID, per-file report entries). A Gmail ID listed more than once
+    is imported from its first row only; the later rows are reported as errors.
+    """
+    docs = {}
+    first_seen = {}
+    report_files = []
+    for path, default_role in files.items():
+        entry = {"file": path, "rows": 0, "valid": 0, "errors": []}
+        try:
+            for row_number, values in iter_sheet_rows(path):
+                entry["rows"] += 1
+                doc, errors = build_user_doc(values, default_role)
+                gmail = doc["Gmail_ID"]
+                if gmail in first_seen and not errors:
+                    errors.append(f"duplicate Gmail ID {gmail} (first listed in {first_seen[gmail]})")
+                if errors:
+                    entry["errors"].extend(f"row {row_number}: {message}" for message in errors)
+                    continue
+                first_seen[gmail] = f"{path} row {row_number}"
+                docs[gmail] = doc
+                entry["valid"] += 1
+        except Exception as e:
+            entry["errors"].append(f"could not read sheet: {e}")
+        report_files.append(entry)
+    return docs, report_files
+
+# === DIFF ===
+
+def load_existing_users(db):
+    """Returns {Gmail ID: (doc id, stored fields)} for every user."""
+    existing = {}
+    for doc in db.collection(USERS_COLLECTION).stream():
+        data = doc.to_dict() or {}
+        gmail = str(data.get("Gmail_ID", "")).strip().lower()
+        if gmail and gmail not in existing:
+            existing[gmail] = (doc.id, data)
+    return existing
+
+def plan_changes(docs, existing, reset_passwords=False, confirm_staff=False):
+    """Splits the validated users into creates and field-level updates.
+
+    Returns a list of {"gmail", "action", "doc_id", "fields", "changes"} entries, where
+    action is "create", "update" or "unchanged" and changes maps field -> (old, new).
+    """
+    plan = []
+    for gmail, doc in docs.items():
+        if gmail not in existing:
+            if doc["Role"] == "Student":
+                defaults = NEW_STUDENT_DEFAULTS
+            else:
+                defaults = {**NEW_STAFF_DEFAULTS, "Confirmed": "Yes"} if confirm_staff else NEW_STAFF_DEFAULTS
+            fields = {**defaults, **doc}
+            if "Password" not in fields:
+                plan.append({"gmail": gmail, "action": "invalid", "doc_id": None, "fields": {},
+                             "changes": {}, "error": "new user without a password"})
+                continue
+            plan.append({"gmail": gmail, "action": "create", "doc_id": gmail, "fields": fields,
+                         "changes": {field: (None, value) for field, value in fields.items()}})
+            continue
+        doc_id, stored = existing[gmail]
+        changes = {}
+        for field, value in doc.items():
+            if field == "Password" and stored.get("Password") and not reset_passwords:
+                continue
+            if stored.get(field) != value:
+                changes[field] = (stored.get(field), value)
+        plan.append({"gmail": gmail, "action": "update" if changes else "unchanged", "doc_id": doc_id,
+                     "fields": {field: new for field, (_, new) in changes.items()}, "changes": changes})
+    return plan
+
+# === REPORTING ===
+
+def _shown(field, value):
+    if field == "Password":
+        return "(hash)" if value else "(none)"
+    return "(blank)" if value in (None, "") else str(value)
+
+def print_report(report, plan, show_diff):
+    """Prints the per-sheet validation report and the planned changes."""
+    print(f"{'Sheet':30} {'Rows':>6} {'Valid':>6}  Status")
+    for entry in report["files"]:
+        print(f"{entry['file']:30} {entry['rows']:>6} {entry['valid']:>6}  {'ERROR' if entry['errors'] else 'OK'}")
+        for message in entry["errors"]:
+            print(f"    error: {message}")
+    for item in plan:
+        if item["action"] == "invalid":
+            print(f"    error: {item['gmail']}: {item['error']}")
+        elif show_diff and item["action"] != "unchanged":
+            print(f"\n{item['action'].upper()} {item['gmail']}")
+            for field, (old, new) in item["changes"].items():
+                print(f"    {field}: {_shown(field, old)} -> {_shown(field, new)}")
+    totals = report["totals"]
+    print(f"\nRows: {totals['rows']} | Invalid: {totals['invalid']} | New: {totals['create']} | "
+          f"Updated: {totals['update']} | Unchanged: {totals['unchanged']} | Written: {totals['written']}")
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the student/teacher master sheets into the Firestore 'users' collection.")
+    parser.add_argument("files", nargs="*", help=f"Sheets to import (default: {', '.join(DEFAULT_FILES)})")
+    parser.add_argument("--role", choices=["Student"] + STAFF_ROLES,
+                        help="Role for rows without a Role column (default: from the file name)")
+    parser.add_argument("--reset-passwords", action="store_true", help="Overwrite the PIN of users that already have one")
+    parser.add_argument("--confirm-staff", action="store_true", help="Confirm new staff without a Confirmed column right away")
+    parser.add_argument("--batch-size", type=int, default=400, help="Writes per batched commit (max 500)")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and compare with Firestore without writing")
+    parser.add_argument("--diff", action="store_true", help="Print field-level changes for every new or updated user")
+    parser.add_argument("--report", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.files:
+        files = {path: args.role or ("Student" if "student" in path.lower() else "Teacher") for path in args.files}
+    else:
+        files = {path: args.role or role for path, role in DEFAULT_FILES.items()}
+
+    docs, report_files = read_user_sheets(files)
+
+    from firestore_client import connect_to_firestore, commit_in_batches, stamp_update
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    plan = plan_changes(docs, load_existing_users(db), args.reset_passwords, args.confirm_staff)
+
+    report = {"files": report_files, "totals": {
+        "rows": sum(entry["rows"] for entry in report_files),
+        "invalid": sum(len(entry["errors"]) for entry in report_files) + sum(1 for item in plan if item["action"] == "invalid"),
+        "create": sum(1 for item in plan if item["action"] == "create"),
+        "update": sum(1 for item in plan if item["action"] == "update"),
+        "unchanged": sum(1 for item in plan if item["action"] == "unchanged"),
+        "written": 0,
+    }}
+    writes = [item for item in plan if item["action"] in ("create", "update")]
+    if writes and not args.dry_run:
+        users_ref = db.collection(USERS_COLLECTION)
+        report["totals"]["written"] = commit_in_batches(
+            db, ((users_ref.document(item["doc_id"]), stamp_update(item["fields"])) for item in writes),
+            args.batch_size, merge=True
+        )
+
+    print_report(report, plan, args.diff)
+    if args.report:
+        report["changes"] = [
+            {"gmail": item["gmail"], "action": item["action"],
+             "changes": {field: [_shown(field, old), _shown(field, new)] for field, (old, new) in item["changes"].items()}}
+            for item in plan if item["action"] != "unchanged"
+        ]
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["totals"]["invalid"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
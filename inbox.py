@@ -0,0 +1,180 @@
+"""Per-user message inboxes: Principal instructions to one user, a whole class or a role.
+
+Every message sent is one document in the 'messages' collection (text, sender, audience,
+recipient count and Read/Replied counters) and is fanned out to each recipient's inbox
+subcollection as users/<user doc id>/inbox/<message id>, in batched commits of
+FANOUT_BATCH_SIZE writes. The inbox item has the message's id, so re-sending a half
+finished fan-out rewrites the same items instead of duplicating them. Items move
+Unread -> Read or Unread -> Replied; the user document itself is never written.
+
+Dashboards read only the newest INBOX_LIMIT unread items of the logged-in user (one small
+query), and the Principal reads the replies to a message with a collection-group query.
+Firestore needs these indexes for that:
+    inbox (single collection): Status ASC, Sent_At DESC
+    inbox (collection group):  Tenant ASC, Message_Id ASC, Status ASC
+
+Instructions stored the old way, in the Instruction/Instruction_Reply/Instruction_Status
+fields of the user documents, are moved into the inboxes (and the fields removed) with:
+    python inbox.py --migrate
+"""
+import argparse
+import sys
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from firebase_admin import firestore
+from firestore_client import commit_in_batches, stamp_update
+from tenancy import TENANT_FIELD, TENANT_HASH_FUNCS
+
+# === CONFIGURATION ===
+MESSAGES_COLLECTION = "messages"
+INBOX_SUBCOLLECTION = "inbox"
+USERS_COLLECTION = "users"
+UNREAD, READ, REPLIED = "Unread", "Read", "Replied"
+FANOUT_BATCH_SIZE = 400
+INBOX_LIMIT = 5           # unread items shown on a dashboard
+HISTORY_LIMIT = 20        # sent messages listed on the Principal dashboard
+DATE_FORMAT = "%d-%m-%Y"
+LEGACY_FIELDS = ["Instruction", "Instruction_Reply", "Instruction_Status"]
+
+# === SENDING ===
+
+def inbox_ref(db, user_doc_id):
+    return db.collection(USERS_COLLECTION).document(str(user_doc_id)).collection(INBOX_SUBCOLLECTION)
+
+def send_message(db, text, sender, audience, recipient_doc_ids, message_id=None):
+    """Records a message and fans it out to every recipient's inbox; returns (message id, items written)."""
+    recipient_doc_ids = list(dict.fromkeys(str(doc_id) for doc_id in recipient_doc_ids if doc_id))
+    if not text or not recipient_doc_ids:
+        return None, 0
+    message_ref = db.collection(MESSAGES_COLLECTION).document(message_id) if message_id else db.collection(MESSAGES_COLLECTION).document()
+    sent_on = datetime.today().strftime(DATE_FORMAT)
+    message_ref.set(stamp_update({"Text": text, "From": sender, "Audience": audience, "Date": sent_on,
+                                  "Sent_At": firestore.SERVER_TIMESTAMP, "Recipients": len(recipient_doc_ids),
+                                  "Read": 0, "Replied": 0}))
+    item = {"Message_Id": message_ref.id, "Text": text, "From": sender, "Audience": audience, "Date": sent_on,
+            "Sent_At": firestore.SERVER_TIMESTAMP, "Status": UNREAD, TENANT_FIELD: db.tenant_id}
+    written = commit_in_batches(db, ((inbox_ref(db, doc_id).document(message_ref.id), stamp_update(dict(item)))
+                                     for doc_id in recipient_doc_ids), batch_size=FANOUT_BATCH_SIZE)
+    return message_ref.id, written
+
+def audience_doc_ids(df_users, role=None, class_name=None):
+    """Doc ids of the users of a role and/or class, from an already loaded users frame."""
+    if df_users.empty:
+        return []
+    mask = pd.Series(True, index=df_users.index)
+    if role:
+        mask &= df_users["Role"].astype(str) == role
+    if class_name:
+        mask &= df_users["Class"].astype(str) == class_name
+    return df_users.loc[mask, "doc_id"].tolist()
+
+# === READ & REPLY ===
+
+def _set_status(db, user_doc_id, message_id, status, reply=None):
+    """Moves an unread item to `status` and counts it on the message, in one batch."""
+    batch = db.batch()
+    update = {"Status": status, f"{status}_At": firestore.SERVER_TIMESTAMP}
+    if reply is not None:
+        update["Reply"] = reply
+    batch.update(inbox_ref(db, user_doc_id).document(message_id), stamp_update(update))
+    counters = {"Read": firestore.Increment(1)}
+    if status == REPLIED:
+        counters["Replied"] = firestore.Increment(1)
+    batch.set(db.collection(MESSAGES_COLLECTION).document(message_id), counters, merge=True)
+    batch.commit()
+    for loader in (load_unread, load_sent_messages, load_replies):
+        loader.clear()
+
+def mark_read(db, user_doc_id, message_id):
+    _set_status(db, user_doc_id, message_id, READ)
+
+def reply_to(db, user_doc_id, message_id, reply):
+    _set_status(db, user_doc_id, message_id, REPLIED, reply)
+
+# === READING ===
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=TENANT_HASH_FUNCS)
+def load_unread(db, user_doc_id, limit=INBOX_LIMIT):
+    """Returns the newest `limit` unread items of a user's inbox, newest first."""
+    query = (inbox_ref(db, user_doc_id).where("Status", "==", UNREAD)
+             .order_by("Sent_At", direction=firestore.Query.DESCENDING).limit(limit))
+    return [{**(doc.to_dict() or {}), "doc_id": doc.id} for doc in query.stream()]
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=TENANT_HASH_FUNCS)
+def load_sent_messages(db, limit=HISTORY_LIMIT):
+    """Returns the latest sent messages with their read and reply counts."""
+    query = db.collection(MESSAGES_COLLECTION).order_by("Sent_At", direction=firestore.Query.DESCENDING).limit(limit)
+    rows = [{**(doc.to_dict() or {}), "doc_id": doc.id} for doc in query.stream()]
+    return pd.DataFrame(rows, columns=["doc_id", "Date", "Audience", "Text", "Recipients", "Read", "Replied"])
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=TENANT_HASH_FUNCS)
+def load_replies(db, message_id, limit=200):
+    """Returns (recipient doc id, reply) of the recipients who replied to a message."""
+    query = db.collection_group(INBOX_SUBCOLLECTION).where("Message_Id", "==", message_id).where("Status", "==", REPLIED).limit(limit)
+    return [(doc.reference.parent.parent.id, (doc.to_dict() or {}).get("Reply", "")) for doc in query.stream()]
+
+# === UI ===
+
+@st.fragment
+def inbox_panel(db, user_doc_id):
+    """Shows the user's unread instructions with reply and mark-as-read actions; reruns only itself."""
+    if db is None or not user_doc_id:
+        return
+    items = load_unread(db, user_doc_id)
+    for item in items:
+        st.warning(f"**New Instruction from {item.get('From') or 'Principal'}** ({item.get('Date')}): {item.get('Text')}")
+        with st.form(key=f"reply_form_{item['doc_id']}"):
+            reply_text = st.text_area("Your Reply:", key=f"reply_{item['doc_id']}")
+            col1, col2 = st.columns(2)
+            send = col1.form_submit_button("Send Reply")
+            dismiss = col2.form_submit_button("Mark as Read")
+            if send:
+                if reply_text:
+                    reply_to(db, user_doc_id, item["doc_id"], reply_text)
+                    st.rerun(scope="fragment")
+                else:
+                    st.warning("Reply cannot be empty.")
+            elif dismiss:
+                mark_read(db, user_doc_id, item["doc_id"])
+                st.rerun(scope="fragment")
+    if len(items) == INBOX_LIMIT:
+        st.caption(f"Showing your {INBOX_LIMIT} newest instructions; older ones appear once these are answered.")
+
+# === MIGRATION ===
+
+def migrate_legacy_instructions(db):
+    """Moves Instruction fields of user documents into inboxes and removes the fields; returns users migrated."""
+    migrated = 0
+    for doc in db.collection(USERS_COLLECTION).select(LEGACY_FIELDS).stream():
+        data = doc.to_dict() or {}
+        if not any(field in data for field in LEGACY_FIELDS):
+            continue
+        text = str(data.get("Instruction") or "").strip()
+        if text:
+            message_id, _ = send_message(db, text, "Principal", "Individual", [doc.id], message_id=f"legacy_{doc.id}")
+            reply = str(data.get("Instruction_Reply") or "").strip()
+            if reply:
+                _set_status(db, doc.id, message_id, REPLIED, reply)
+        db.collection(USERS_COLLECTION).document(doc.id).update(stamp_update({field: firestore.DELETE_FIELD for field in LEGACY_FIELDS}))
+        migrated += 1
+    return migrated
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the per-user instruction inboxes.")
+    parser.add_argument("--migrate", action="store_true", required=True,
+                        help="Move Instruction fields of user documents into the inboxes")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    migrated = migrate_legacy_instructions(db)
+    print(f"Migrated the instructions of {migrated} user{'' if migrated == 1 else 's'}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Durable local job queue backed by SQLite.
+
+Jobs survive restarts of both the Streamlit server and the worker processes. Workers claim
+jobs in small batches inside an IMMEDIATE transaction, so several worker processes (even
+from different Streamlit replicas on the same host) can share one queue file safely.
+"""
+import json
+import os
+import sqlite3
+import time
+
+# === CONFIGURATION ===
+QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", os.path.join("queue", "jobs.db"))
+STALE_AFTER_SECONDS = 300  # a running job whose worker died is re-queued after this long
+MAX_ATTEMPTS = 3
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    acknowledged INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (kind, status, id);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, kind, acknowledged);
+"""
+
+# === CONNECTION ===
+
+def _connect(path=None):
+    """Opens the queue database in WAL mode so readers never block the workers."""
+    path = path or QUEUE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+def _row_to_job(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+# === PRODUCER SIDE ===
+
+def enqueue(kind, payload, owner=None, path=None):
+    """Adds a job to the queue and returns its id."""
+    now = time.time()
+    conn = _connect(path)
+    try:
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, owner, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, owner, json.dumps(payload, default=str), QUEUED, now, now)
+        )
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def get_owner_jobs(owner, kind, include_acknowledged=False, path=None):
+    """Returns an owner's jobs of one kind, newest first."""
+    conn = _connect(path)
+    try:
+        query = "SELECT * FROM jobs WHERE owner = ? AND kind = ?"
+        if not include_acknowledged:
+            query += " AND acknowledged = 0"
+        rows = conn.execute(query + " ORDER BY id DESC", (owner, kind)).fetchall()
+        return [_row_to_job(row) for row in rows]
+    finally:
+        conn.close()
+
+def get_job(job_id, path=None):
+    """Returns one job, or None if it does not exist."""
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+    finally:
+        conn.close()
+
+def acknowledge(job_id, path=None):
+    """Marks a finished job as seen so the page stops reporting it."""
+    conn = _connect(path)
+    try:
+        conn.execute("UPDATE jobs SET acknowledged = 1 WHERE id = ?", (job_id,))
+    finally:
+        conn.close()
+
+def queue_stats(path=None):
+    """Returns job counts per (kind, status)."""
+    conn = _connect(path)
+    try:
+        rows = conn.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status").fetchall()
+        return {(row["kind"], row["status"]): row["n"] for row in rows}
+    finally:
+        conn.close()
+
+# === WORKER SIDE ===
+
+def claim_batch(kind, limit, path=None):
+    """Atomically moves up to `limit` queued jobs to running and returns them."""
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE kind = ? AND status = ? ORDER BY id LIMIT ?", (kind, QUEUED, limit)
+        ).fetchall()
+        if rows:
+            ids = [row["id"] for row in rows]
+            conn.execute(
+                f"UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id IN ({','.join('?' * len(ids))})",
+                [RUNNING, time.time()] + ids
+            )
+        conn.execute("COMMIT")
+        jobs = [_row_to_job(row) for row in rows]
+        for job in jobs:
+            job["attempts"] += 1
+        return jobs
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def complete(job_id, result, path=None):
+    """Stores a job's result and marks it done."""
+    conn = _connect(path)
+    try:
+        conn.execute("UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                     (DONE, json.dumps(result, default=str), time.time(), job_id))
+    finally:
+        conn.close()
+
+def fail(job_id, error, attempts, path=None):
+    """Re-queues a failed job until it has used MAX_ATTEMPTS, then marks it failed."""
+    status = QUEUED if attempts < MAX_ATTEMPTS else FAILED
+    conn = _connect(path)
+    try:
+        conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                     (status, str(error), time.time(), job_id))
+    finally:
+        conn.close()
+
+def requeue_stale(kind, older_than=STALE_AFTER_SECONDS, path=None):
+    """Puts running jobs whose worker stopped updating them back on the queue."""
+    conn = _connect(path)
+    try:
+        cursor = conn.execute("UPDATE jobs SET status = ? WHERE kind = ? AND status = ? AND updated_at < ?",
+                              (QUEUED, kind, RUNNING, time.time() - older_than))
+        return cursor.rowcount
+    finally:
+        conn.close()
@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import json
-import base64
 import hashlib
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firestore_client import stamp_update
+from data_layer import connect_to_firestore
+from assets import render_asset
+from tenancy import DEFAULT_TENANT, QUERY_PARAM, SESSION_KEY, list_tenants
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="PRK Home Tuition - Login")
@@ -20,23 +20,14 @@ SECURITY_QUESTIONS = ["What is your mother's maiden name?", "What was the name o
 
 # === UTILITY FUNCTIONS for FIREBASE ===
 
-@st.cache_resource
-def connect_to_firestore():
-    """Establishes a connection to Google Firestore and caches it."""
-    try:
-        if not firebase_admin._apps:
-            creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
-            creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
-            creds_dict = json.loads(creds_json_str)
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred)
-        return firestore.client()
-    except Exception as e:
-        st.error(f"Error connecting to Firebase Firestore: {e}")
-        return None
+@st.cache_data(ttl=300)
+def load_centres():
+    """Returns {centre id: name} of the registered tuition centres."""
+    db = connect_to_firestore(DEFAULT_TENANT)
+    return list_tenants(db) if db is not None else {DEFAULT_TENANT: ""}
 
 def find_user(gmail):
-    """Finds a user document in Firestore by their Gmail."""
+    """Finds a user document in the selected centre's Firestore data by their Gmail."""
     db = connect_to_firestore()
     if db is None: return None
     
@@ -52,7 +43,7 @@ def add_new_user(user_data):
     db = connect_to_firestore()
     if db is None: return False
     try:
-        db.collection('users').document(user_data['Gmail_ID']).set(user_data)
+        db.collection('users').document(user_data['Gmail_ID']).set(stamp_update(user_data))
         return True
     except Exception as e:
         st.error(f"Failed to save registration data: {e}")
@@ -64,7 +55,7 @@ def update_user_password(doc_id, new_password_hash):
     if db is None: return False
     try:
         user_ref = db.collection('users').document(doc_id)
-        user_ref.update({'Password': new_password_hash})
+        user_ref.update(stamp_update({'Password': new_password_hash}))
         return True
     except Exception as e:
         st.error(f"Failed to update password: {e}")
@@ -112,15 +103,25 @@ else:
     st.sidebar.title("Login / New Registration")
     st.markdown("<style> [data-testid='stSidebarNav'] {display: none;} </style>", unsafe_allow_html=True)
 
-    st.image("Ganesh_logo.png", use_container_width=True)
+    render_asset("ganesh_logo", lazy=False)
     st.markdown(f"""<div style="text-align: center;"><h2>EPS High-tech Homework System 📈</h2></div>""", unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
-        st.image("PRK_logo.jpg", use_container_width=True)
+        render_asset("prk_logo", lazy=False)
     with col2:
-        st.image("Excellent_logo.jpg", use_container_width=True)
+        render_asset("excellent_logo", lazy=False)
     st.markdown("---")
-    
+
+    # Users, homework and answers belong to one centre; ?centre=<id> fixes it for a centre's own link.
+    centres = load_centres()
+    url_centre = st.query_params.get(QUERY_PARAM)
+    if url_centre in centres:
+        st.session_state[SESSION_KEY] = url_centre
+    elif len(centres) > 1:
+        st.session_state[SESSION_KEY] = st.sidebar.selectbox("Centre", list(centres), format_func=lambda centre_id: centres[centre_id])
+    else:
+        st.session_state[SESSION_KEY] = DEFAULT_TENANT
+
     option = st.sidebar.radio("Select an option:", ["Login", "New Registration", "Forgot Password"])
 
     if option == "Login":
@@ -197,7 +198,7 @@ else:
 
         if registration_type == "Student" and 'plan' in locals():
             st.info(f"Please pay {plan.split(' ')[0]} to the UPI ID: **{UPI_ID}**")
-            st.image("Qr logo.jpg", width=250, caption="Scan QR code to pay")
+            render_asset("payment_qr", width=250, caption="Scan QR code to pay")
             whatsapp_link = "https://wa.me/919685840429"
             st.success(f"After payment, send a screenshot with student's name and class to our [Official WhatsApp Support]({whatsapp_link}). Your account will be activated within 24 hours.")
 
@@ -1,76 +1,48 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date, timedelta
-import json
-import base64
+import os
 import time
 import plotly.express as px
-import firebase_admin
-from firebase_admin import credentials, firestore
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import job_queue
+import profiling
+from event_log import ANSWER_SUBMITTED, append_event
+from data_layer import connect_to_firestore, invalidate_collections, load_concurrently, query_spec, format_date, today
+from grading_worker import GRADE_JOB, DEFAULT_WORKERS, start_worker_pool
+from session_store import PageState
+from drafts import DraftBuffer, draft_autosaver
+from inbox import inbox_panel
+from reports import FORMATS as REPORT_FORMATS, REPORT_JOB, enqueue_report, ensure_report_workers, report_jobs_panel
+from tenancy import current_tenant
+from student_summary import RECENT_POINTS, load_student_summary, growth_points, subject_averages
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Student Dashboard")
-DATE_FORMAT = "%d-%m-%Y"
 GRADE_MAP_REVERSE = {1: "Needs Improvement", 2: "Average", 3: "Good", 4: "Very Good", 5: "Outstanding"}
 
-# === UTILITY FUNCTIONS for FIREBASE ===
+# Fields this view reads from each collection; everything else stays on the server.
+STUDENT_VIEW_FIELDS = {
+    "users": ["User_Name", "Gmail_ID", "Class", "Role"],
+    "homework": ["Class", "Date", "Due_Date", "Subject", "Question", "Model_Answer", "Uploaded_By"],
+    "answers": ["Student_Gmail", "Class", "Date", "Subject", "Question", "Answer", "Remarks", "Marks"],
+    "answer_bank": ["Student_Gmail", "Class", "Date", "Subject", "Question", "Answer", "Remarks", "Marks"],
+    "announcements": ["Date", "Message"],
+}
+
+# === UTILITY FUNCTIONS ===
 @st.cache_resource
-def connect_to_firestore():
-    """Establishes a connection to Google Firestore and caches it."""
-    try:
-        if not firebase_admin._apps:
-            creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
-            creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
-            creds_dict = json.loads(creds_json_str)
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred)
-        return firestore.client()
-    except Exception as e:
-        st.error(f"Error connecting to Firebase Firestore: {e}")
-        return None
-
-@st.cache_data(ttl=60)
-def load_all_data():
-    """Loads all necessary collections from Firestore at once to avoid caching issues."""
-    db = connect_to_firestore()
-    if db is None:
-        return {}
-    
-    collections_to_load = ["users", "homework", "answers", "answer_bank", "announcements"]
-    data_frames = {}
-    for coll_name in collections_to_load:
-        try:
-            collection_ref = db.collection(coll_name).stream()
-            data = []
-            for doc in collection_ref:
-                doc_data = doc.to_dict()
-                doc_data['doc_id'] = doc.id
-                data.append(doc_data)
-            df = pd.DataFrame(data) if data else pd.DataFrame()
-            data_frames[coll_name] = df
-        except Exception as e:
-            st.error(f"Failed to load collection '{coll_name}': {e}")
-            data_frames[coll_name] = pd.DataFrame()
-    return data_frames
-
-def get_text_similarity(text1, text2):
-    """Calculates similarity percentage between two texts."""
-    try:
-        if not text1 or not text2: return 0.0
-        vectorizer = TfidfVectorizer().fit_transform([text1.lower(), text2.lower()])
-        similarity_matrix = cosine_similarity(vectorizer)
-        return similarity_matrix[0][1] * 100
-    except Exception:
-        return 0.0
+def ensure_grading_workers():
+    """Starts the grading worker pool once per server process, unless an external pool is configured."""
+    if os.environ.get("GRADING_WORKERS_EXTERNAL"):
+        return []
+    return start_worker_pool(int(os.environ.get("GRADING_WORKERS", DEFAULT_WORKERS)))
 
-def get_grade_from_similarity(percentage):
-    """Assigns a grade score based on similarity percentage."""
-    if percentage >= 95: return 5
-    elif percentage >= 80: return 4
-    elif percentage >= 60: return 3
-    else: return 1
+@st.fragment(run_every=2)
+def grading_status_poller(job_ids):
+    """Reruns the page as soon as one of the student's queued answers has been graded."""
+    for job_id in job_ids:
+        job = job_queue.get_job(job_id)
+        if job is None or job['status'] in (job_queue.DONE, job_queue.FAILED):
+            st.rerun()
 
 # === FIRESTORE COLLECTION NAMES ===
 USERS_COLLECTION = "users"
@@ -85,6 +57,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# Profiles this rerun when profiling is on for the session (see profiling.py).
+profiling.start_capture("Student Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -95,17 +70,38 @@ st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<
 
 # === STUDENT DASHBOARD UI ===
 st.header(f"🧑‍🎓 Student Dashboard: Welcome {st.session_state.user_name}")
+ensure_grading_workers()
+
+# --- Grading results that landed since the last rerun ---
+grading_jobs = job_queue.get_owner_jobs(st.session_state.user_gmail, GRADE_JOB)
+finished_jobs = [job for job in grading_jobs if job['status'] in (job_queue.DONE, job_queue.FAILED)]
+if finished_jobs:
+    invalidate_collections(ANSWERS_COLLECTION, ANSWER_BANK_COLLECTION)
+    load_student_summary.clear()
+for job in finished_jobs:
+    subject = job['payload'].get('Subject')
+    if job['status'] == job_queue.DONE:
+        show_result = st.success if job['result'].get('passed') else st.warning
+        show_result(f"**{subject}:** {job['result'].get('message')}")
+    else:
+        st.error(f"**{subject}:** We could not grade your answer. Please submit it again.")
+    job_queue.acknowledge(job['id'])
+grading_in_progress = {
+    (job['payload'].get('Question'), job['payload'].get('Date')): job['id']
+    for job in grading_jobs if job['status'] in (job_queue.QUEUED, job_queue.RUNNING)
+}
+if grading_in_progress:
+    grading_status_poller(list(grading_in_progress.values()))
 
-# --- Load all necessary data from Firestore ---
-all_data = load_all_data()
-df_all_users = all_data.get('users', pd.DataFrame())
-df_homework = all_data.get('homework', pd.DataFrame())
-df_live_answers = all_data.get('answers', pd.DataFrame())
-df_answer_bank = all_data.get('answer_bank', pd.DataFrame())
-df_announcements = all_data.get('announcements', pd.DataFrame())
+# --- Load the student's own record and today's announcement first (small, filtered queries) ---
+first_paint = load_concurrently({
+    "user": query_spec(USERS_COLLECTION, STUDENT_VIEW_FIELDS, Gmail_ID=st.session_state.user_gmail),
+    "announcements": query_spec(ANNOUNCEMENTS_COLLECTION, STUDENT_VIEW_FIELDS, Date=format_date(today())),
+})
+user_info_row = first_paint["user"]
+df_announcements = first_paint["announcements"]
 
 # --- INSTRUCTION & ANNOUNCEMENT SYSTEMS ---
-user_info_row = df_all_users[df_all_users['Gmail_ID'] == st.session_state.user_gmail] if 'Gmail_ID' in df_all_users.columns else pd.DataFrame()
 if not user_info_row.empty:
     user_info = user_info_row.iloc[0]
     # --- INSTRUCTION & ANNOUNCEMENT SYSTEMS ---
@@ -113,8 +109,7 @@ if not user_info_row.empty:
     try:
         # Ensure the dataframe and the 'Date' column exist before filtering
         if not df_announcements.empty and 'Date' in df_announcements.columns:
-            today_str = datetime.today().strftime(DATE_FORMAT)
-            todays_announcement = df_announcements[df_announcements['Date'] == today_str]
+            todays_announcement = df_announcements[df_announcements['Date'] == today()]
             if not todays_announcement.empty:
                 latest_message = todays_announcement['Message'].iloc[0]
                 st.info(f"📢 **Principal Announcement:** {latest_message}")
@@ -122,35 +117,8 @@ if not user_info_row.empty:
         # Fail silently if announcements can't be loaded or an error occurs
         pass
 
-    # Display Private Instruction for the logged-in user
-    if not user_info_row.empty:
-        user_info = user_info_row.iloc[0]
-        instruction = user_info.get('Instruction', '').strip()
-        reply = user_info.get('Instruction_Reply', '').strip()
-        status = user_info.get('Instruction_Status', '')
-    
-        # Show instruction and reply form ONLY if status is 'Sent' and there's no reply yet
-        if status == 'Sent' and instruction and not reply:
-            st.warning(f"**New Instruction from Principal:** {instruction}")
-            with st.form(key="reply_form"):
-                reply_text = st.text_area("Your Reply:")
-                if st.form_submit_button("Send Reply"):
-                    if reply_text:
-                        with st.spinner("Sending reply..."):
-                            db = connect_to_firestore()
-                            user_doc_id = user_info.get('doc_id')
-                            if user_doc_id:
-                                user_ref = db.collection(USERS_COLLECTION).document(user_doc_id)
-                                user_ref.update({
-                                    'Instruction_Reply': reply_text,
-                                    'Instruction_Status': 'Replied'
-                                })
-                                st.success("Your reply has been sent.")
-                                st.rerun()
-                            else:
-                                st.error("Could not find user document to update.")
-                    else:
-                        st.warning("Reply cannot be empty.")
+    # Display the unread instructions in the student's inbox
+    inbox_panel(connect_to_firestore(), user_info.get('doc_id'))
 
     st.markdown("---")
 
@@ -158,24 +126,17 @@ if not user_info_row.empty:
     st.subheader(f"Your Class: {student_class}")
     st.markdown("---")
 
-    # Filter dataframes for the current student
-    homework_for_class = df_homework[df_homework.get("Class") == student_class] if 'Class' in df_homework.columns else pd.DataFrame()
-    student_answers_live = df_live_answers[df_live_answers.get('Student_Gmail') == st.session_state.user_gmail].copy() if 'Student_Gmail' in df_live_answers.columns else pd.DataFrame()
-    student_answers_from_bank = df_answer_bank[df_answer_bank.get('Student_Gmail') == st.session_state.user_gmail].copy() if 'Student_Gmail' in df_answer_bank.columns else pd.DataFrame()
-    
     # --- Performance Overview Section ---
+    # Rendered from the precomputed summary document: one read, whatever the history length.
     st.header("Your Performance Overview")
-    
-    total_assigned = len(homework_for_class)
-    total_completed = len(student_answers_from_bank)
-    total_pending = total_assigned - total_completed
-    
-    average_score = 0.0
-    if not student_answers_from_bank.empty and 'Marks' in student_answers_from_bank.columns:
-        student_answers_from_bank['Marks_Numeric'] = pd.to_numeric(student_answers_from_bank['Marks'], errors='coerce')
-        graded_answers = student_answers_from_bank.dropna(subset=['Marks_Numeric'])
-        if not graded_answers.empty:
-            average_score = graded_answers['Marks_Numeric'].mean()
+    db = connect_to_firestore()
+    summary = load_student_summary(db, st.session_state.user_gmail, student_class) if db is not None else {}
+
+    total_assigned = int(summary.get('Assigned', 0))
+    total_completed = int(summary.get('Completed', 0))
+    total_pending = max(total_assigned - total_completed, 0)
+    graded_count = int(summary.get('Graded', 0))
+    average_score = summary.get('Marks_Total', 0) / graded_count if graded_count else 0.0
 
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Homework Assigned", f"{total_assigned}")
@@ -191,19 +152,39 @@ if not user_info_row.empty:
             st.plotly_chart(fig_pie, use_container_width=True)
     
     with chart_col2:
-        if not graded_answers.empty:
-            growth_df = graded_answers.sort_values(by='Date')
-            fig_growth = px.line(growth_df, x='Date', y='Marks_Numeric', title='Your Growth Over Time', markers=True)
+        growth_df = pd.DataFrame(growth_points(summary))
+        if not growth_df.empty:
+            fig_growth = px.line(growth_df, x='Date', y='Marks', title=f'Your Growth Over Time (last {RECENT_POINTS} graded answers)', markers=True)
             st.plotly_chart(fig_growth, use_container_width=True)
 
-    if not graded_answers.empty:
-        marks_by_subject = graded_answers.groupby('Subject')['Marks_Numeric'].mean().reset_index()
+    marks_by_subject = pd.DataFrame(list(subject_averages(summary).items()), columns=['Subject', 'Marks'])
+    if not marks_by_subject.empty:
         fig_bar = px.bar(
-            marks_by_subject, x='Subject', y='Marks_Numeric', title='Average Marks by Subject', 
-            color='Subject', text='Marks_Numeric'
+            marks_by_subject, x='Subject', y='Marks', title='Average Marks by Subject', 
+            color='Subject', text='Marks'
         )
-        fig_bar.update_traces(textposition='outside')
+        fig_bar.update_traces(textposition='outside', texttemplate='%{text:.2f}')
         st.plotly_chart(fig_bar, use_container_width=True)
+
+    with st.expander("📄 Printable Progress Report"):
+        col1, col2 = st.columns([1, 2])
+        report_format = col1.selectbox("Format", list(REPORT_FORMATS), label_visibility="collapsed")
+        if col2.button("Prepare My Report"):
+            ensure_report_workers()
+            enqueue_report(st.session_state.user_gmail, current_tenant(), student_class, REPORT_FORMATS[report_format],
+                           student=st.session_state.user_gmail)
+        if job_queue.get_owner_jobs(st.session_state.user_gmail, REPORT_JOB):
+            report_jobs_panel(st.session_state.user_gmail)
+    
+    # This class's homework and this student's answers are only needed below the fold
+    student_data = load_concurrently({
+        "homework": query_spec(HOMEWORK_COLLECTION, STUDENT_VIEW_FIELDS, Class=student_class),
+        "answers": query_spec(ANSWERS_COLLECTION, STUDENT_VIEW_FIELDS, Student_Gmail=st.session_state.user_gmail),
+        "answer_bank": query_spec(ANSWER_BANK_COLLECTION, STUDENT_VIEW_FIELDS, Student_Gmail=st.session_state.user_gmail),
+    })
+    homework_for_class = student_data["homework"]
+    student_answers_live = student_data["answers"]
+    student_answers_from_bank = student_data["answer_bank"]
     
     st.markdown("---")
 
@@ -232,14 +213,22 @@ if not user_info_row.empty:
 
         if not pending_questions_list:
             st.success("🎉 Good job! You have no pending homework.")
+            PageState("pending_questions").retain(())
         else:
             df_pending = pd.DataFrame(pending_questions_list).sort_values(by='Date', ascending=False)
+            # Answer-flow state of the questions in progress; answered questions drop out of the namespace.
+            question_states = PageState("pending_questions")
+            question_states.retain(f"question_{doc_id}" for doc_id in df_pending['doc_id'])
+            # Answers being written are buffered in the session and autosaved on a debounce timer.
+            drafts = DraftBuffer(db, st.session_state.user_gmail)
+            drafts.retain(str(doc_id) for doc_id in df_pending['doc_id'])
+            if any(state == 'show_form' for state in (question_states.get(f"question_{doc_id}") for doc_id in df_pending['doc_id'])):
+                draft_autosaver(drafts)
             for i, row in df_pending.iterrows():
                 question_id = f"question_{row['doc_id']}"
-                if question_id not in st.session_state:
-                    st.session_state[question_id] = 'initial'
+                question_state = question_states.get(question_id, 'initial')
 
-                st.markdown(f"**Subject:** {row.get('Subject')} | **Assignment Date:** {row.get('Date')} | **Due Date:** {row.get('Due_Date')}")
+                st.markdown(f"**Subject:** {row.get('Subject')} | **Assignment Date:** {format_date(row.get('Date'))} | **Due Date:** {format_date(row.get('Due_Date'))}")
                 st.write(f"**Question:** {row.get('Question')}")
                 
                 matching_answer = pd.DataFrame()
@@ -249,12 +238,15 @@ if not user_info_row.empty:
                 if not matching_answer.empty and matching_answer.iloc[0].get('Remarks'):
                     st.warning(f"**Auto-Remark:** {matching_answer.iloc[0].get('Remarks')}")
 
-                if st.session_state[question_id] == 'initial':
+                if (row.get('Question'), format_date(row.get('Date'))) in grading_in_progress:
+                    st.info("⏳ Grading your answer… your result will appear here shortly.")
+
+                elif question_state == 'initial':
                     if st.button("View Model Answer & Start Timer", key=f"view_{i}"):
-                        st.session_state[question_id] = 'timer_running'
+                        question_states.set(question_id, 'timer_running')
                         st.rerun()
                 
-                if st.session_state[question_id] == 'timer_running':
+                if question_state == 'timer_running':
                     model_answer = row.get('Model_Answer', '').strip()
                     if model_answer:
                         word_count = len(model_answer.split())
@@ -265,12 +257,17 @@ if not user_info_row.empty:
                             timer_placeholder.progress(seconds / timer_duration, text=f"Time remaining: {seconds} seconds")
                             time.sleep(1)
                         timer_placeholder.empty()
-                        st.session_state[question_id] = 'show_form'
+                        question_states.set(question_id, 'show_form')
                         st.rerun()
 
-                elif st.session_state[question_id] == 'show_form':
-                    with st.form(key=f"answer_form_{i}"):
-                        answer_text = st.text_area("Your Answer:", key=f"answer_{i}", value=matching_answer.iloc[0].get('Answer', '') if not matching_answer.empty else "")
+                elif question_state == 'show_form':
+                    with st.container(border=True):
+                        homework_id = str(row['doc_id'])
+                        answer_key = f"answer_{homework_id}"
+                        previous_answer = matching_answer.iloc[0].get('Answer', '') if not matching_answer.empty else ""
+                        answer_text = st.text_area("Your Answer:", key=answer_key, value=drafts.text(homework_id, previous_answer),
+                                                   on_change=drafts.edit_from_widget, args=(homework_id, answer_key),
+                                                   help="Your draft is saved automatically when you click outside this box.")
                         
                         math_subjects = ['Math', 'Physics', 'Chemistry', 'Science']
                         if row.get('Subject') in math_subjects:
@@ -278,52 +275,43 @@ if not user_info_row.empty:
                             st.markdown("**Your Answer Preview:**")
                             st.latex(answer_text)
 
-                        if st.form_submit_button("Submit Final Answer"):
+                        if st.button("Submit Final Answer", key=f"submit_{homework_id}"):
                             if answer_text:
-                                with st.spinner("Grading your answer..."):
-                                    model_answer = row.get('Model_Answer', '').strip()
-                                    similarity = get_text_similarity(answer_text, model_answer)
-                                    grade_score = get_grade_from_similarity(similarity)
-                                    db = connect_to_firestore()
-                                    
-                                    if grade_score >= 3:
-                                        collection_ref = db.collection('answer_bank')
-                                        remark = "Good! Try for better performance." if grade_score == 3 else f"Auto-Graded: Excellent! ({similarity:.2f}%)"
-                                        st.success(f"Your answer was {similarity:.2f}% correct and has been saved.")
-                                    else:
-                                        collection_ref = db.collection('answers')
-                                        remark = f"Auto-Remark: Your answer was {similarity:.2f}% correct. Please improve it."
-                                        grade_score = None
-                                        st.warning(f"Your answer was {similarity:.2f}% correct. Please resubmit.")
-                                    
-                                    new_doc_data = {
-                                        "Student_Gmail": st.session_state.user_gmail, "Date": row.get('Date'), 
-                                        "Class": student_class, "Subject": row.get('Subject'), 
-                                        "Question": row.get('Question'), "Answer": answer_text, 
-                                        "Marks": grade_score, "Remarks": remark, "Attempt_Status": 1
-                                    }
-                                    collection_ref.add(new_doc_data)
-                                    
-                                    # Clear cache and rerun
-                                    st.cache_data.clear()
-                                    st.rerun()
+                                # Grading runs in the worker pool; the page shows "Grading…" until the result lands.
+                                job_queue.enqueue(GRADE_JOB, {
+                                    "Student_Gmail": st.session_state.user_gmail, "Date": format_date(row.get('Date')),
+                                    "Class": student_class, "Subject": row.get('Subject'),
+                                    "Question": row.get('Question'), "Answer": answer_text,
+                                    "Model_Answer": row.get('Model_Answer', '').strip(), "Homework_Id": row.get('doc_id'),
+                                    "Due_Date": format_date(row.get('Due_Date')), "Uploaded_By": row.get('Uploaded_By'),
+                                    "Tenant": current_tenant()
+                                }, owner=st.session_state.user_gmail)
+                                try:
+                                    append_event(ANSWER_SUBMITTED, student_class, {
+                                        "Student_Gmail": st.session_state.user_gmail, "Homework_Id": row.get('doc_id'),
+                                        "Subject": row.get('Subject'), "Date": format_date(row.get('Date'))
+                                    })
+                                except Exception:
+                                    pass  # the grade job is already queued; the event log must never fail a submission
+                                question_states.pop(question_id)
+                                drafts.submit(homework_id)
+                                st.rerun()
                             else:
                                 st.warning("Answer cannot be empty.")
                 st.markdown("---")
 
     elif page == "Revision Zone":
         st.subheader("Previously Graded Answers (from Answer Bank)")
-        if not student_answers_from_bank.empty and 'Marks' in student_answers_from_bank.columns:
-            student_answers_from_bank['Marks_Numeric'] = pd.to_numeric(student_answers_from_bank['Marks'], errors='coerce')
-            graded_answers = student_answers_from_bank.dropna(subset=['Marks_Numeric'])
+        if not student_answers_from_bank.empty:
+            graded_answers = student_answers_from_bank.dropna(subset=['Marks'])
             if graded_answers.empty:
                 st.info("You have no graded answers to review yet.")
             else:
                 for i, row in graded_answers.sort_values(by='Date', ascending=False).iterrows():
-                    st.markdown(f"**Date:** {row.get('Date')} | **Subject:** {row.get('Subject')}")
+                    st.markdown(f"**Date:** {format_date(row.get('Date'))} | **Subject:** {row.get('Subject')}")
                     st.write(f"**Question:** {row.get('Question')}")
                     st.info(f"**Your Answer:** {row.get('Answer')}")
-                    grade_value = int(row.get('Marks_Numeric'))
+                    grade_value = int(row.get('Marks'))
                     grade_text = GRADE_MAP_REVERSE.get(grade_value, "N/A")
                     st.success(f"**Grade:** {grade_text} ({grade_value}/5)")
                     remarks = row.get('Remarks', '').strip()
@@ -335,18 +323,23 @@ if not user_info_row.empty:
     
     elif page == "Class Leaderboard":
         st.subheader(f"Class Leaderboard ({student_class})")
-        df_students_class = df_all_users[df_all_users['Class'] == student_class]
-        class_gmail_list = df_students_class['Gmail_ID'].tolist()
-        class_answers_bank = df_answer_bank[df_answer_bank['Student_Gmail'].isin(class_gmail_list)].copy()
-        if class_answers_bank.empty or 'Marks' not in class_answers_bank.columns:
+        with st.spinner("Loading class results..."):
+            class_data = load_concurrently({
+                "students": query_spec(USERS_COLLECTION, STUDENT_VIEW_FIELDS, Class=student_class),
+                "answer_bank": query_spec(ANSWER_BANK_COLLECTION, STUDENT_VIEW_FIELDS, Class=student_class),
+            })
+        df_students_class = class_data["students"]
+        df_class_answer_bank = class_data["answer_bank"]
+        class_gmail_list = df_students_class['Gmail_ID'].tolist() if 'Gmail_ID' in df_students_class.columns else []
+        class_answers_bank = df_class_answer_bank[df_class_answer_bank['Student_Gmail'].isin(class_gmail_list)] if 'Student_Gmail' in df_class_answer_bank.columns else pd.DataFrame()
+        if class_answers_bank.empty:
             st.info("The leaderboard will appear once answers have been graded for your class.")
         else:
-            class_answers_bank['Marks'] = pd.to_numeric(class_answers_bank['Marks'], errors='coerce')
             graded_class_answers = class_answers_bank.dropna(subset=['Marks'])
             if graded_class_answers.empty:
                 st.info("The leaderboard will appear once answers have been graded for your class.")
             else:
-                leaderboard_df = graded_class_answers.groupby('Student_Gmail')['Marks'].mean().reset_index()
+                leaderboard_df = graded_class_answers.groupby('Student_Gmail', observed=True)['Marks'].mean().reset_index()
                 leaderboard_df = pd.merge(leaderboard_df, df_students_class[['User_Name', 'Gmail_ID']], left_on='Student_Gmail', right_on='Gmail_ID', how='left')
                 leaderboard_df['Rank'] = leaderboard_df['Marks'].rank(method='dense', ascending=False).astype(int)
                 leaderboard_df = leaderboard_df.sort_values(by='Rank')
@@ -376,3 +369,5 @@ else:
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+profiling.finish_capture()
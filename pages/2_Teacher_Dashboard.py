@@ -1,55 +1,53 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date, timedelta
-import json
-import base64
+import sys
+from datetime import datetime, timedelta
 import plotly.express as px
-import firebase_admin
-from firebase_admin import credentials, firestore
+import profiling
+from firestore_client import stamp_update
+from data_layer import connect_to_firestore, invalidate_collections, load_matching, load_concurrently, query_spec, format_date, today
+from copy_detection import FLAGS_COLLECTION, homework_key, build_clusters
+from sharded_counters import increment_counter, increment_class_stats, load_counter_values, with_counter_totals
+from exports import render_export_panel
+from session_store import PageState
+from student_summary import record_homework_posted, refresh_assigned
+from rollups import RollupBatch
+from event_log import append_events, homework_posted_event
+from tenancy import current_tenant
+from inbox import inbox_panel
+from question_bank import QuestionBankIndex, INDEXED_FIELDS as QUESTION_BANK_FIELDS, DUPLICATE_THRESHOLD, text_similarity
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Teacher Dashboard")
 DATE_FORMAT = "%d-%m-%Y"
 
-# === UTILITY FUNCTIONS for FIREBASE ===
+# Fields this view reads from each collection; everything else stays on the server.
+TEACHER_VIEW_FIELDS = {
+    "users": ["User_Name", "Gmail_ID", "Role", "Class", "Salary_Points"],
+    "homework": ["Class", "Date", "Due_Date", "Uploaded_By", "Subject", "Question"],
+    "answers": ["Student_Gmail", "Class", "Date", "Question"],
+    "answer_bank": ["Student_Gmail", "Class", "Date", "Question", "Marks"],
+}
+# The question bank indexes every teacher's homework, with model answers for reuse.
+QUESTION_BANK_VIEW_FIELDS = {"homework": QUESTION_BANK_FIELDS}
+
+# === UTILITY FUNCTIONS ===
 @st.cache_resource
-def connect_to_firestore():
-    """Establishes a connection to Google Firestore and caches it."""
-    try:
-        if not firebase_admin._apps:
-            creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
-            creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
-            creds_dict = json.loads(creds_json_str)
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred)
-        return firestore.client()
-    except Exception as e:
-        st.error(f"Error connecting to Firebase Firestore: {e}")
-        return None
+def get_question_bank(tenant_id):
+    """Keeps one question bank index per centre and server process; it is synced incrementally on each rerun."""
+    return QuestionBankIndex()
 
 @st.cache_data(ttl=60)
-def load_all_data():
-    """Loads all necessary collections from Firestore at once."""
-    db = connect_to_firestore()
+def load_copy_flags(tenant_id):
+    """Loads the near-duplicate answer flags raised by copy detection in a centre."""
+    db = connect_to_firestore(tenant_id)
     if db is None:
-        return {}
-    
-    collections_to_load = ["users", "homework", "answers", "answer_bank", "announcements"]
-    data_frames = {}
-    for coll_name in collections_to_load:
-        try:
-            collection_ref = db.collection(coll_name).stream()
-            data = []
-            for doc in collection_ref:
-                doc_data = doc.to_dict()
-                doc_data['doc_id'] = doc.id
-                data.append(doc_data)
-            df = pd.DataFrame(data) if data else pd.DataFrame()
-            data_frames[coll_name] = df
-        except Exception as e:
-            st.error(f"Failed to load collection '{coll_name}': {e}")
-            data_frames[coll_name] = pd.DataFrame()
-    return data_frames
+        return []
+    try:
+        return [doc.to_dict() for doc in db.collection(FLAGS_COLLECTION).stream()]
+    except Exception as e:
+        st.error(f"Failed to load copy detection flags: {e}")
+        return []
 
 # === SECURITY GATEKEEPER ===
 if not st.session_state.get("logged_in") or st.session_state.get("user_role") != "teacher":
@@ -57,6 +55,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# Profiles this rerun when profiling is on for the session (see profiling.py).
+profiling.start_capture("Teacher Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -68,56 +69,44 @@ st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<
 # === TEACHER DASHBOARD UI ===
 st.header(f"🧑‍🏫 Teacher Dashboard: Welcome {st.session_state.user_name}")
 
-# --- Load all necessary data from Firestore ---
-all_data = load_all_data()
-df_users = all_data.get('users', pd.DataFrame())
-df_homework = all_data.get('homework', pd.DataFrame())
-df_live_answers = all_data.get('answers', pd.DataFrame())
-df_answer_bank = all_data.get('answer_bank', pd.DataFrame())
-df_announcements = all_data.get('announcements', pd.DataFrame())
+# --- Load the teacher's own record, the teacher ranking and their own homework first ---
+# Student answers are only loaded by the sections that need them, further down the page.
+first_paint = load_concurrently({
+    "teacher": query_spec('users', TEACHER_VIEW_FIELDS, Gmail_ID=st.session_state.user_gmail),
+    "teachers": query_spec('users', TEACHER_VIEW_FIELDS, Role='Teacher'),
+    "homework": query_spec('homework', TEACHER_VIEW_FIELDS, Uploaded_By=st.session_state.user_name),
+})
+teacher_info_row = first_paint["teacher"]
+df_teachers = first_paint["teachers"]
+teacher_homework = first_paint["homework"]
+
+# Salary points are sharded counters; fold in the shards that have not been consolidated yet.
+db_for_counters = connect_to_firestore()
+if db_for_counters is not None:
+    salary_points = load_counter_values(db_for_counters, 'users', 'Salary_Points')
+    if not teacher_info_row.empty:
+        teacher_info_row = with_counter_totals(teacher_info_row, 'Salary_Points', salary_points)
+    if not df_teachers.empty:
+        df_teachers = with_counter_totals(df_teachers, 'Salary_Points', salary_points)
 
 # --- INSTRUCTION & ANNOUNCEMENT SYSTEMS ---
-teacher_info_row = df_users[df_users['Gmail_ID'] == st.session_state.user_gmail]
 if not teacher_info_row.empty:
     teacher_info = teacher_info_row.iloc[0]
-    instruction = teacher_info.get('Instruction', '').strip()
-    reply = teacher_info.get('Instruction_Reply', '').strip()
-    status = teacher_info.get('Instruction_Status', '')
-
-    if status == 'Sent' and instruction and not reply:
-        st.warning(f"**New Instruction from Principal:** {instruction}")
-        with st.form(key="reply_form"):
-            reply_text = st.text_area("Your Reply:")
-            if st.form_submit_button("Send Reply"):
-                if reply_text:
-                    with st.spinner("Sending reply..."):
-                        db = connect_to_firestore()
-                        user_doc_id = teacher_info.get('doc_id')
-                        user_ref = db.collection('users').document(user_doc_id)
-                        user_ref.update({
-                            'Instruction_Reply': reply_text,
-                            'Instruction_Status': 'Replied'
-                        })
-                        st.success("Your reply has been sent.")
-                        st.rerun()
-                else:
-                    st.warning("Reply cannot be empty.")
+    inbox_panel(db_for_counters, teacher_info.get('doc_id'))
     st.markdown("---")
 
 # --- Top Level Metrics ---
 st.markdown("#### Your Overall Performance")
 col1, col2, col3 = st.columns(3)
 
-points_str = str(teacher_info.get('Salary_Points', '0')).strip()
-my_points = int(points_str) if points_str.isdigit() else 0
+my_points = pd.to_numeric(teacher_info.get('Salary_Points', 0), errors='coerce')
+my_points = int(my_points) if pd.notna(my_points) else 0
 col1.metric("My Salary Points", my_points)
 
-my_questions_count = 0
-if not df_homework.empty and 'Uploaded_By' in df_homework.columns:
-    my_questions_count = len(df_homework[df_homework['Uploaded_By'] == st.session_state.user_name])
+my_questions_count = len(teacher_homework)
 col2.metric("My Total Questions Created", my_questions_count)
 
-df_all_teachers_rank = df_users[df_users['Role'] == 'Teacher'].copy()
+df_all_teachers_rank = df_teachers.copy()
 if not df_all_teachers_rank.empty:
     df_all_teachers_rank['Salary_Points'] = pd.to_numeric(df_all_teachers_rank.get('Salary_Points', 0), errors='coerce').fillna(0)
     df_all_teachers_rank = df_all_teachers_rank.sort_values(by='Salary_Points', ascending=False).reset_index()
@@ -130,17 +119,17 @@ st.markdown("---")
 # --- Radio Button Navigation System ---
 page = st.radio(
     "Navigation",
-    ["Create Homework", "Student Monitoring", "My Reports"],
+    ["Create Homework", "Student Monitoring", "Copy Detection", "My Reports"],
     horizontal=True,
     label_visibility="collapsed"
 )
 
 if page == "Create Homework":
     st.subheader("Create a New Homework Assignment")
-    if 'context_set' not in st.session_state:
-        st.session_state.context_set = False
-        
-    if not st.session_state.context_set:
+    # The draft (context + questions) lives in a bounded namespace; an abandoned draft expires.
+    homework_draft = PageState("create_homework")
+
+    if "context" not in homework_draft:
         with st.form("context_form"):
             subject = st.selectbox("Subject", ["---Select Subject---", "Hindi", "Sanskrit", "English", "Math", "Science", "SST", "Computer", "GK", "Physics", "Chemistry", "Biology", "Advance Classes"])
             cls = st.selectbox("Class", ["---Select Class---"] + [f"{i}th" for i in range(5, 13)])
@@ -149,21 +138,41 @@ if page == "Create Homework":
                 if subject == "---Select Subject---" or cls == "---Select Class---":
                     st.warning("Please select a valid subject and class.")
                 else:
-                    st.session_state.context_set = True
-                    st.session_state.homework_context = {"subject": subject, "class": cls, "date": date_input}
-                    st.session_state.questions_list = []
+                    homework_draft.set("context", {"subject": subject, "class": cls, "date": date_input})
+                    homework_draft.set("questions", [])
                     st.rerun()
     
-    if st.session_state.context_set:
-        ctx = st.session_state.homework_context
+    if "context" in homework_draft:
+        ctx = homework_draft.get("context")
+        questions_list = homework_draft.get("questions", [])
         st.success(f"Creating homework for: **{ctx['class']} - {ctx['subject']}** (Date: {ctx['date'].strftime(DATE_FORMAT)})")
         
         if st.button("🔙 Back to Subject Selection"):
-            del st.session_state.context_set
-            if 'questions_list' in st.session_state:
-                del st.session_state.questions_list
+            homework_draft.clear()
             st.rerun()
 
+        question_bank = get_question_bank(current_tenant())
+        question_bank.sync(load_matching('homework', QUESTION_BANK_VIEW_FIELDS))
+
+        with st.expander("🔎 Search the Question Bank"):
+            search_everywhere = st.checkbox("Search all classes and subjects", key="bank_search_everywhere")
+            bank_query = st.text_input("Search questions", key="bank_query", placeholder="Type a few words of the question...")
+            if bank_query:
+                scope = (None, None) if search_everywhere else (ctx['class'], ctx['subject'])
+                results = question_bank.search(bank_query, *scope)
+                if not results:
+                    st.info("No matching questions in the bank.")
+                for doc_id in results:
+                    entry = question_bank.get(doc_id)
+                    if not entry:
+                        continue  # removed by another session's sync since the search
+                    col_question, col_reuse = st.columns([5, 1])
+                    col_question.markdown(f"**{entry['question']}**  \n{entry['class']} · {entry['subject']} · {entry['date']} · by {entry['uploaded_by']}")
+                    if col_reuse.button("Reuse", key=f"reuse_{doc_id}"):
+                        homework_draft.set("questions", questions_list + [
+                            {"question": entry['question'], "model_answer": entry['model_answer'], "duplicate_of": doc_id}])
+                        st.rerun()
+
         with st.form("add_question_form", clear_on_submit=True):
             question_text = st.text_area("Enter Question:", height=100)
             model_answer_text = st.text_area("Enter Model Answer:", height=100)
@@ -174,14 +183,42 @@ if page == "Create Homework":
             
             if st.form_submit_button("Add Question"):
                 if question_text and model_answer_text:
-                    st.session_state.questions_list.append({"question": question_text, "model_answer": model_answer_text})
+                    new_item = {"question": question_text, "model_answer": model_answer_text}
+                    duplicates = question_bank.find_duplicates(question_text, ctx['class'], ctx['subject'])
+                    in_draft = [item for item in questions_list if text_similarity(question_text, item['question']) >= DUPLICATE_THRESHOLD]
+                    if duplicates or in_draft:
+                        homework_draft.set("possible_duplicate", {"item": new_item, "matches": duplicates[:3], "in_draft": len(in_draft)})
+                    else:
+                        questions_list = questions_list + [new_item]
+                        homework_draft.set("questions", questions_list)
                 else:
                     st.warning("Please enter both a question and a model answer.")
+
+        possible_duplicate = homework_draft.get("possible_duplicate")
+        if possible_duplicate:
+            st.warning(f"**This question looks like one that already exists:** {possible_duplicate['item']['question']}")
+            for doc_id, similarity in possible_duplicate['matches']:
+                entry = question_bank.get(doc_id)
+                if entry:
+                    st.markdown(f"- {similarity:.0%} similar: *{entry['question']}* ({entry['date']}, by {entry['uploaded_by']})")
+            if possible_duplicate['in_draft']:
+                st.markdown("- A similar question is already in this homework.")
+            st.caption("Duplicated questions earn no Salary Points.")
+            col_add, col_discard = st.columns(2)
+            if col_add.button("Add Anyway"):
+                duplicate_of = possible_duplicate['matches'][0][0] if possible_duplicate['matches'] else "draft"
+                homework_draft.set("questions", questions_list + [{**possible_duplicate['item'], "duplicate_of": duplicate_of}])
+                homework_draft.pop("possible_duplicate")
+                st.rerun()
+            if col_discard.button("Discard"):
+                homework_draft.pop("possible_duplicate")
+                st.rerun()
         
-        if st.session_state.get('questions_list'):
+        if questions_list:
             st.write("#### Current Questions:")
-            for i, item in enumerate(st.session_state.questions_list):
-                with st.expander(f"{i + 1}. {item['question']}"):
+            for i, item in enumerate(questions_list):
+                reused = " (reused — no points)" if item.get('duplicate_of') else ""
+                with st.expander(f"{i + 1}. {item['question']}{reused}"):
                     st.info(f"Model Answer: {item['model_answer']}")
             
             if st.button("Final Submit Homework"):
@@ -189,50 +226,84 @@ if page == "Create Homework":
                     db = connect_to_firestore()
                     due_date = (ctx['date'] + timedelta(days=1)).strftime(DATE_FORMAT)
                     
+                    batch = db.batch()
                     total_new_points = 0
-                    for item in st.session_state.questions_list:
+                    posted = []
+                    for item in questions_list:
                         new_homework_doc = {
                             "Class": ctx['class'], "Date": ctx['date'].strftime(DATE_FORMAT),
                             "Uploaded_By": st.session_state.user_name, "Subject": ctx['subject'],
                             "Question": item['question'], "Model_Answer": item['model_answer'],
                             "Due_Date": due_date
                         }
-                        db.collection('homework').add(new_homework_doc)
+                        homework_ref = db.collection('homework').document()
+                        batch.set(homework_ref, stamp_update(new_homework_doc))
                         
-                        word_count = len(item['model_answer'].split())
-                        points_earned = max(1, word_count // 10)
-                        total_new_points += points_earned
+                        # Reused or duplicated questions earn nothing; only new questions add points.
+                        points_earned = 0
+                        if not item.get('duplicate_of'):
+                            word_count = len(item['model_answer'].split())
+                            points_earned = max(1, word_count // 10)
+                            total_new_points += points_earned
+                        posted.append((homework_ref.id, new_homework_doc, points_earned))
 
                     if total_new_points > 0 and not teacher_info_row.empty:
                         teacher_doc_id = teacher_info.get('doc_id')
                         teacher_ref = db.collection('users').document(teacher_doc_id)
-                        teacher_ref.update({'Salary_Points': firestore.Increment(total_new_points)})
+                        increment_counter(teacher_ref, 'Salary_Points', total_new_points, batch)
+                    increment_class_stats(db, ctx['class'], batch, Homework_Posted=len(questions_list))
+                    rollup = RollupBatch()
+                    rollup.add_questions(ctx['date'], ctx['class'], ctx['subject'], st.session_state.user_name, len(questions_list))
+                    rollup.write(db, batch)
+                    batch.commit()
+                    # Index the new questions now, so re-entering one is flagged before the bank reloads.
+                    for doc_id, homework_doc, _ in posted:
+                        question_bank.upsert(doc_id, homework_doc)
+                    try:
+                        append_events([homework_posted_event(doc_id, homework_doc, points) for doc_id, homework_doc, points in posted])
+                    except Exception:
+                        pass  # the homework is already committed; the event log must never fail a submission
+                    try:
+                        record_homework_posted(db, ctx['class'], len(posted))
+                    except Exception as e:
+                        # The homework is committed either way; recounting keeps Assigned from drifting.
+                        try:
+                            refresh_assigned(db, [ctx['class']])
+                        except Exception:
+                            print(f"Could not update Assigned for class {ctx['class']} ({e}); "
+                                  "run `python student_summary.py --rebuild`.", file=sys.stderr)
                 
                 st.success(f"Homework submitted successfully! You earned {total_new_points} Salary Points.")
                 st.cache_data.clear()
-                del st.session_state.context_set, st.session_state.questions_list
+                invalidate_collections('homework', 'users')
+                homework_draft.clear()
                 st.rerun()
 
 elif page == "Student Monitoring":
     st.subheader("Student Homework Monitoring")
     
-    # Filter for homework created by the logged-in teacher
-    teacher_homework = df_homework[df_homework['Uploaded_By'] == st.session_state.user_name] if 'Uploaded_By' in df_homework.columns else pd.DataFrame()
-    
     if not teacher_homework.empty:
-        available_classes = sorted(teacher_homework['Class'].unique())
+        available_classes = sorted(teacher_homework['Class'].dropna().unique())
         selected_class = st.selectbox("Select a Class to Monitor", ["---Select Class---"] + available_classes)
 
         if selected_class != "---Select Class---":
-            # Filter for students in the selected class
-            class_students_df = df_users[(df_users['Role'] == 'Student') & (df_users['Class'] == selected_class)]
+            # Load only the students and answers of the selected class
+            with st.spinner("Loading class submissions..."):
+                class_data = load_concurrently({
+                    "students": query_spec('users', TEACHER_VIEW_FIELDS, Role='Student', Class=selected_class),
+                    "answers": query_spec('answers', TEACHER_VIEW_FIELDS, Class=selected_class),
+                    "answer_bank": query_spec('answer_bank', TEACHER_VIEW_FIELDS, Class=selected_class),
+                })
+            class_students_df = class_data["students"]
+            df_class_live_answers = class_data["answers"]
+            df_class_answer_bank = class_data["answer_bank"]
             teacher_specific_homework_df = teacher_homework[teacher_homework['Class'] == selected_class]
             
             # Combine all submitted answers
-            all_answers_df = pd.concat([df_live_answers, df_answer_bank], ignore_index=True)
+            all_answers_df = pd.concat([df_class_live_answers, df_class_answer_bank], ignore_index=True)
 
             monitoring_data = []
-            today = date.today()
+            today_date = today()
 
             for index, student in class_students_df.iterrows():
                 student_gmail = student['Gmail_ID']
@@ -250,17 +321,14 @@ elif page == "Student Monitoring":
                 # Calculate overdue homework
                 overdue_count = 0
                 for hw_index, hw_row in teacher_specific_homework_df.iterrows():
-                    try:
-                        due_date = datetime.strptime(hw_row['Due_Date'], DATE_FORMAT).date()
-                        if due_date < today:
-                            is_submitted = not completed_df[
-                                (completed_df['Question'] == hw_row['Question']) &
-                                (completed_df['Date'] == hw_row['Date'])
-                            ].empty
-                            if not is_submitted:
-                                overdue_count += 1
-                    except (ValueError, TypeError):
-                        continue # Skip rows with invalid date formats
+                    due_date = hw_row['Due_Date']
+                    if pd.notna(due_date) and due_date < today_date:
+                        is_submitted = not completed_df[
+                            (completed_df['Question'] == hw_row['Question']) &
+                            (completed_df['Date'] == hw_row['Date'])
+                        ].empty
+                        if not is_submitted:
+                            overdue_count += 1
                 
                 monitoring_data.append({
                     'Student Name': student['User_Name'],
@@ -269,14 +337,42 @@ elif page == "Student Monitoring":
                 })
             
             st.dataframe(pd.DataFrame(monitoring_data))
+
+            with st.expander("⬇️ Export this class"):
+                st.markdown("##### Monitoring Report (My Homework)")
+                render_export_panel(db_for_counters, "monitoring", "export_monitoring", available_classes,
+                                    class_name=selected_class, uploaded_by=st.session_state.user_name)
+                st.markdown("##### Answer History")
+                render_export_panel(db_for_counters, "answer_history", "export_history", available_classes, class_name=selected_class)
     else:
         st.info("You have not created any homework yet to monitor.") 
         
+elif page == "Copy Detection":
+    st.subheader("Possible Copied Answers")
+
+    if teacher_homework.empty:
+        st.info("You have not created any homework yet to check.")
+    else:
+        my_homework_keys = {homework_key(row.get('Class'), format_date(row.get('Date')), row.get('Question')) for _, row in teacher_homework.iterrows()}
+        my_flags = [flag for flag in load_copy_flags(current_tenant()) if flag.get('Homework_Key') in my_homework_keys]
+        clusters = build_clusters(my_flags)
+        if not clusters:
+            st.success("No near-identical answers between students have been detected for your homework.")
+        else:
+            df_students = load_matching('users', TEACHER_VIEW_FIELDS, Role='Student')
+            name_by_gmail = dict(zip(df_students['Gmail_ID'], df_students['User_Name'])) if 'Gmail_ID' in df_students.columns else {}
+            st.caption(f"{len(clusters)} group(s) of students submitted near-identical answers to each other.")
+            for cluster in clusters:
+                students = sorted(name_by_gmail.get(gmail, gmail) for gmail in cluster['Student_Gmails'])
+                with st.expander(f"{cluster['Class']} | {cluster['Subject']} | {cluster['Date']} — {len(students)} students, up to {cluster['Max_Similarity']:.0f}% similar"):
+                    st.write(f"**Question:** {cluster['Question']}")
+                    st.write("**Students:** " + ", ".join(students))
+
 elif page == "My Reports":
     st.subheader("Performance Reports")
     
     st.markdown("#### Top Teacher Performers")
-    df_all_teachers = df_users[df_users['Role'] == 'Teacher'].copy()
+    df_all_teachers = df_teachers.copy()
     if not df_all_teachers.empty:
         df_all_teachers['Salary_Points'] = pd.to_numeric(df_all_teachers.get('Salary_Points', 0), errors='coerce').fillna(0)
         ranked_teachers = df_all_teachers.sort_values(by='Salary_Points', ascending=False)
@@ -290,25 +386,35 @@ elif page == "My Reports":
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("##### 🥇 Overall Top 3 Students")
-        df_students = df_users[df_users['Role'] == 'Student']
+        with st.spinner("Loading student results..."):
+            report_data = load_concurrently({
+                "students": query_spec('users', TEACHER_VIEW_FIELDS, Role='Student'),
+                "answer_bank": query_spec('answer_bank', TEACHER_VIEW_FIELDS),
+            })
+        df_students = report_data["students"]
+        df_answer_bank = report_data["answer_bank"]
         if not df_answer_bank.empty:
-            df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
-            overall_student_perf = df_answer_bank.groupby('Student_Gmail')['Marks'].mean().reset_index()
-            merged_df = pd.merge(overall_student_perf, df_students, left_on='Student_Gmail', right_on='Gmail_ID')
+            overall_student_perf = df_answer_bank.groupby('Student_Gmail', observed=True)['Marks'].mean().reset_index()
+            merged_df = pd.merge(overall_student_perf, df_students[['Gmail_ID', 'User_Name', 'Class']], left_on='Student_Gmail', right_on='Gmail_ID')
             top_overall = merged_df.nlargest(3, 'Marks').round(2)
             st.dataframe(top_overall[['User_Name', 'Class', 'Marks']])
     
     with col2:
         st.markdown("##### 🥇 Class-wise Top 3 Students")
         if not df_answer_bank.empty:
-            df_merged_classwise = pd.merge(df_answer_bank, df_students, left_on='Student_Gmail', right_on='Gmail_ID')
-            leaderboard_df = df_merged_classwise.groupby(['Class', 'User_Name'])['Marks'].mean().reset_index()
-            top_classwise = leaderboard_df.groupby('Class').apply(lambda x: x.nlargest(3, 'Marks')).reset_index(drop=True)
+            df_merged_classwise = pd.merge(df_answer_bank[['Student_Gmail', 'Marks']], df_students[['Gmail_ID', 'User_Name', 'Class']], left_on='Student_Gmail', right_on='Gmail_ID')
+            leaderboard_df = df_merged_classwise.groupby(['Class', 'User_Name'], observed=True)['Marks'].mean().reset_index()
+            top_classwise = leaderboard_df.sort_values(['Class', 'Marks'], ascending=[True, False]).groupby('Class', observed=True).head(3).reset_index(drop=True)
             st.dataframe(top_classwise[['User_Name', 'Class', 'Marks']])
 
     if 'top_classwise' in locals() and not top_classwise.empty:
         fig = px.bar(top_classwise, x='User_Name', y='Marks', color='Class', title='Class-wise Top 3 Students')
         st.plotly_chart(fig, use_container_width=True)
 
+    with st.expander("⬇️ Export Student Leaderboard"):
+        render_export_panel(db_for_counters, "leaderboard", "export_leaderboard", [f"{i}th" for i in range(5, 13)])
+
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+profiling.finish_capture()
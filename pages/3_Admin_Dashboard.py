@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
+import time
+import profiling
 from datetime import datetime, timedelta
-import json
-import base64
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firestore_client import stamp_update
+from compact_answers import load_answer_metrics
+from session_store import session_footprint, session_footprints
+from event_log import PAYMENT_CONFIRMED, STAFF_CONFIRMED, PROJECTIONS, append_event, checkpoint_stats, event_stats, replay
+from tenancy import current_tenant, load_tenant_usage, process_usage
+from data_layer import connect_to_firestore, invalidate_collections, load_all_data, cached_frames, memory_report
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Admin Dashboard")
@@ -15,41 +19,11 @@ SUBSCRIPTION_PLANS = {
     "₹200 for 30 days (Subjects Homework Only)": 30
 }
 
-# === UTILITY FUNCTIONS for FIREBASE ===
-@st.cache_resource
-def connect_to_firestore():
-    """Establishes a connection to Google Firestore and caches it."""
-    try:
-        if not firebase_admin._apps:
-            creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
-            creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
-            creds_dict = json.loads(creds_json_str)
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred)
-        return firestore.client()
-    except Exception as e:
-        st.error(f"Error connecting to Firebase Firestore: {e}")
-        return None
-
-@st.cache_data(ttl=60)
-def load_collection(_collection_name):
-    """Loads all documents from a Firestore collection into a Pandas DataFrame."""
-    try:
-        db = connect_to_firestore()
-        if db is None: return pd.DataFrame()
-        
-        collection_ref = db.collection(_collection_name).stream()
-        data = []
-        for doc in collection_ref:
-            doc_data = doc.to_dict()
-            doc_data['doc_id'] = doc.id
-            data.append(doc_data)
-            
-        if not data: return pd.DataFrame()
-        return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Failed to load data from collection '{_collection_name}': {e}")
-        return pd.DataFrame()
+# Fields this view reads; password hashes and security answers are never downloaded.
+ADMIN_VIEW_FIELDS = {
+    "users": ["User_Name", "Gmail_ID", "Role", "Class", "Father_Name", "Parent_PhonePe", "Subscription_Plan",
+              "Payment_Confirmed", "Subscription_Date", "Subscribed_Till", "Confirmed"],
+}
 
 # === FIRESTORE COLLECTION NAMES ===
 USERS_COLLECTION = "users"
@@ -61,6 +35,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# Profiles this rerun when profiling is on for the session (see profiling.py).
+profiling.start_capture("Admin Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -73,7 +50,7 @@ st.sidebar.markdown("<div style='text-align: center;'>© 2025 PRK Home Tuition.<
 st.header("👑 Admin Panel")
 
 # Load all user data from Firestore
-df_users = load_collection(USERS_COLLECTION)
+df_users = load_all_data(ADMIN_VIEW_FIELDS)[USERS_COLLECTION]
 
 if df_users.empty:
     st.warning("No users found in the database.")
@@ -88,7 +65,7 @@ else:
 
     st.markdown("---")
 
-    tab1, tab2 = st.tabs(["Student Management", "Staff Management"])
+    tab1, tab2, tab3 = st.tabs(["Student Management", "Staff Management", "System Health"])
 
     with tab1:
         st.subheader("Manage Student Registrations")
@@ -111,11 +88,18 @@ else:
                     with st.spinner("Activating account..."):
                         db = connect_to_firestore()
                         user_ref = db.collection(USERS_COLLECTION).document(row.get('doc_id'))
-                        user_ref.update({
+                        user_ref.update(stamp_update({
                             'Subscription_Date': today.strftime(DATE_FORMAT),
                             'Subscribed_Till': till_date,
                             'Payment_Confirmed': 'Yes'
-                        })
+                        }))
+                        try:
+                            append_event(PAYMENT_CONFIRMED, row.get('Class'), {
+                                'Student_Gmail': row.get('Gmail_ID'), 'Plan': row.get('Subscription_Plan'), 'Subscribed_Till': till_date
+                            })
+                        except Exception:
+                            pass  # the payment is already confirmed; the event log must never fail it
+                        invalidate_collections(USERS_COLLECTION)
                         st.success(f"Payment confirmed for {row.get('User_Name')}.")
                         st.rerun()
 
@@ -140,7 +124,12 @@ else:
                     with st.spinner("Confirming staff member..."):
                         db = connect_to_firestore()
                         user_ref = db.collection(USERS_COLLECTION).document(row.get('doc_id'))
-                        user_ref.update({'Confirmed': 'Yes'})
+                        user_ref.update(stamp_update({'Confirmed': 'Yes'}))
+                        try:
+                            append_event(STAFF_CONFIRMED, None, {'Gmail_ID': row.get('Gmail_ID'), 'Role': row.get('Role')})
+                        except Exception:
+                            pass  # the staff member is already confirmed; the event log must never fail it
+                        invalidate_collections(USERS_COLLECTION)
                         st.success(f"Staff member {row.get('User_Name')} confirmed.")
                         st.rerun()
 
@@ -149,5 +138,102 @@ else:
         confirmed_staff = df_staff[df_staff.get("Confirmed") == "Yes"]
         st.dataframe(confirmed_staff)
 
+    with tab3:
+        st.subheader("Cached Data Footprint")
+        st.caption("Memory held by this server process for each cached collection projection (typed, shared across sessions).")
+        report_df = memory_report(cached_frames())
+        st.dataframe(report_df, hide_index=True)
+        st.metric("Total Cached Memory", f"{report_df['Memory (MB)'].sum():.2f} MB")
+
+        st.subheader("Centre Usage")
+        st.caption(f"Firestore reads of this centre ('{current_tenant()}'), flushed every minute by each server process.")
+        db_for_usage = connect_to_firestore()
+        usage = load_tenant_usage(db_for_usage) if db_for_usage is not None else {}
+        queries = usage.get('Queries', 0)
+        today_usage = (usage.get('Daily') or {}).get(datetime.today().date().isoformat(), {})
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Reads Today", int(today_usage.get('Reads', 0)))
+        col2.metric("Reads (All Time)", int(usage.get('Reads', 0)))
+        col3.metric("Avg Query Time", f"{usage.get('Read_Seconds', 0) / queries * 1000:.0f} ms" if queries else "—")
+        with st.expander("This server process, all centres"):
+            st.dataframe(process_usage(), hide_index=True)
+
+        st.subheader("Session Memory")
+        st.caption("Page state held per browser session by this server process (sessions that wrote state in the last hour).")
+        sessions_df = session_footprints()
+        if sessions_df.empty:
+            st.info("No session has stored page state yet.")
+        else:
+            st.dataframe(sessions_df.sort_values("Total Size (KB)", ascending=False), hide_index=True)
+            st.metric("Total Session Memory", f"{sessions_df['Total Size (KB)'].sum() / 1024:.2f} MB")
+        with st.expander("This session"):
+            st.dataframe(session_footprint(), hide_index=True)
+
+        st.subheader("Live Answers Collection")
+        st.caption("Updated by the compaction job (python compact_answers.py --every 3600), which archives superseded attempts.")
+        answer_metrics = load_answer_metrics(connect_to_firestore())
+        if not answer_metrics:
+            st.info("The compaction job has not run yet.")
+        else:
+            last_run = answer_metrics.get('Last_Compaction')
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Hot Answers", int(answer_metrics.get('Hot_Count', 0)), delta=f"-{int(answer_metrics.get('Last_Moved', 0))} last run", delta_color="off")
+            col2.metric("Archived (All Time)", int(answer_metrics.get('Archived_Total', 0)))
+            col3.metric("Last Compaction", last_run.strftime("%d-%m-%Y %H:%M") if hasattr(last_run, 'strftime') else "—")
+
+        st.subheader("Event Log")
+        st.caption("Append-only record of homework posts, submissions, grades and confirmations on this server (python event_log.py stats).")
+        events_df = event_stats()
+        if events_df.empty:
+            st.info("No events have been recorded yet.")
+        else:
+            col1, col2 = st.columns(2)
+            col1.metric("Events", int(events_df['Events'].sum()))
+            col2.metric("Stored Size", f"{events_df['Stored Bytes'].sum() / 1024:.1f} KB")
+            st.dataframe(events_df.groupby('Kind', as_index=False)[['Events', 'Stored Bytes']].sum(), hide_index=True)
+            col_projection, col_reset = st.columns([3, 1])
+            projection_name = col_projection.selectbox("Rebuild a projection", list(PROJECTIONS))
+            reset = col_reset.checkbox("From the first event", help="Ignore the saved checkpoints")
+            if st.button("🔁 Replay"):
+                with st.spinner("Replaying events..."):
+                    started = time.time()
+                    projection_df, applied = replay(projection_name, reset=reset)
+                st.success(f"Applied {applied} new events in {time.time() - started:.2f}s.")
+                st.dataframe(projection_df, hide_index=True)
+            with st.expander("Checkpoints"):
+                st.dataframe(checkpoint_stats(), hide_index=True)
+
+        st.subheader("Rerun Profiling")
+        st.caption("cProfile captures of dashboard reruns, saved on this server with the page, role and rows loaded (see profiling.py).")
+        st.toggle("Profile my own reruns", key=profiling.SESSION_KEY)
+        with st.form("profile_user_form"):
+            col_user, col_reruns = st.columns([3, 1])
+            profiled_user = col_user.selectbox("Profile the next reruns of", sorted(df_users['Gmail_ID'].dropna().astype(str).unique()))
+            profiled_reruns = col_reruns.number_input("Reruns", min_value=0, max_value=50, value=5, help="0 cancels")
+            if st.form_submit_button("Start Capture"):
+                profiling.set_target(profiled_user, profiled_reruns)
+                st.success(f"The next {profiled_reruns} reruns of {profiled_user} will be profiled.")
+        pending_targets = profiling.load_targets()
+        if pending_targets:
+            st.caption("Waiting for reruns: " + ", ".join(f"{user} ({count})" for user, count in pending_targets.items()))
+        captures_df = profiling.list_captures()
+        if captures_df.empty:
+            st.info("No reruns have been profiled yet.")
+        else:
+            st.dataframe(captures_df, hide_index=True)
+            capture_id = st.selectbox("Inspect a capture", captures_df['Id'])
+            capture = profiling.load_capture(capture_id)
+            col_libraries, col_frames = st.columns(2)
+            col_libraries.markdown("##### Own Time per Library (s)")
+            col_libraries.dataframe(pd.Series(capture['Libraries'], name="Seconds"))
+            col_frames.markdown("##### Rows Loaded")
+            col_frames.dataframe(pd.Series(capture['Frames'], name="Rows", dtype="int64"))
+            st.markdown("##### Hot Spots")
+            st.dataframe(pd.DataFrame(capture['Hot_Spots']), hide_index=True)
+            with open(profiling.profile_path(capture_id), "rb") as profile_file:
+                st.download_button("⬇️ Download .prof (open with snakeviz)", profile_file.read(), file_name=f"{capture_id}.prof")
+
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+profiling.finish_capture()
@@ -1,51 +1,50 @@
 import streamlit as st
 import pandas as pd
-import json
-import base64
 import plotly.express as px
+import profiling
+import job_queue
 from datetime import datetime, timedelta
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firestore_client import stamp_update
+from data_layer import connect_to_firestore, empty_frame, invalidate_collections, load_all_data, load_matching, format_date, today
+from sharded_counters import load_counter_values, with_counter_totals, load_class_stats
+from user_search import SEARCH_LIMIT, UserSearchIndex
+from exports import EXPORTS, render_export_panel
+from rollups import load_trend
+from tenancy import current_tenant
+from reports import FORMATS as REPORT_FORMATS, REPORT_JOB, enqueue_class_batch, enqueue_report, ensure_report_workers, report_jobs_panel
+from inbox import audience_doc_ids, load_replies, load_sent_messages, send_message
 
 # === CONFIGURATION ===
 st.set_page_config(layout="wide", page_title="Principal Dashboard")
 DATE_FORMAT = "%d-%m-%Y"
 
-# === UTILITY FUNCTIONS for FIREBASE ===
+# Fields this view reads from each collection; answer texts and credentials stay on the server.
+PRINCIPAL_VIEW_FIELDS = {
+    "users": ["User_Name", "Gmail_ID", "Role", "Class", "Salary_Points"],
+    "homework": ["Date", "Uploaded_By", "Subject", "Question"],
+    "answers": ["Question", "Marks"],
+    "answer_bank": ["Student_Gmail", "Subject", "Marks"],
+    "announcements": ["Date", "Message"],
+}
+
+# Collections each section needs; only the selected section's collections are downloaded.
+SECTION_COLLECTIONS = {
+    "Send Messages": ["users"],
+    "Performance Reports": ["users", "homework", "answers", "answer_bank"],
+    "Individual Growth Charts": ["users", "homework", "answer_bank"],
+    "Trends": [],  # read from the precomputed rollups, not the collections
+    "Progress Reports": ["users"],
+}
+# Trend granularity -> (rollup period, buckets shown)
+TREND_WINDOWS = {"Weekly (last 12 weeks)": ("week", 12), "Monthly (last 12 months)": ("month", 12), "Daily (last 30 days)": ("day", 30)}
+TREND_METRICS = {"Submissions": "Submissions", "Average Marks": "Average_Marks", "On-Time Rate (%)": "On_Time_Rate",
+                 "Questions Created": "Questions_Created"}
+
+# === UTILITY FUNCTIONS ===
 @st.cache_resource
-def connect_to_firestore():
-    """Establishes a connection to Google Firestore and caches it."""
-    try:
-        if not firebase_admin._apps:
-            creds_base64 = st.secrets["firebase_service"]["base64_credentials"]
-            creds_json_str = base64.b64decode(creds_base64).decode("utf-8")
-            creds_dict = json.loads(creds_json_str)
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred)
-        return firestore.client()
-    except Exception as e:
-        st.error(f"Error connecting to Firebase Firestore: {e}")
-        return None
-
-@st.cache_data(ttl=60)
-def load_collection(_collection_name):
-    """Loads all documents from a Firestore collection into a Pandas DataFrame."""
-    try:
-        db = connect_to_firestore()
-        if db is None: return pd.DataFrame()
-        
-        collection_ref = db.collection(_collection_name).stream()
-        data = []
-        for doc in collection_ref:
-            doc_data = doc.to_dict()
-            doc_data['doc_id'] = doc.id
-            data.append(doc_data)
-            
-        if not data: return pd.DataFrame()
-        return pd.DataFrame(data)
-    except Exception as e:
-        st.error(f"Failed to load data from collection '{_collection_name}': {e}")
-        return pd.DataFrame()
+def get_user_search_index(tenant_id):
+    """Keeps one user search index per centre and server process; it is synced incrementally on each rerun."""
+    return UserSearchIndex()
 
 # === FIRESTORE COLLECTION NAMES ===
 USERS_COLLECTION = "users"
@@ -60,6 +59,9 @@ if not st.session_state.get("logged_in") or st.session_state.get("user_role") !=
     st.page_link("main.py", label="Go to Login Page")
     st.stop()
 
+# Profiles this rerun when profiling is on for the session (see profiling.py).
+profiling.start_capture("Principal Dashboard")
+
 # === SIDEBAR LOGOUT & COPYRIGHT ===
 st.sidebar.success(f"Welcome, {st.session_state.user_name}")
 if st.sidebar.button("Logout"):
@@ -73,66 +75,87 @@ st.header("🏛️ Principal Dashboard")
 
 # --- Display Public Announcement ---
 try:
-    announcements_df = load_collection(ANNOUNCEMENTS_COLLECTION)
+    announcements_df = load_matching(ANNOUNCEMENTS_COLLECTION, PRINCIPAL_VIEW_FIELDS, Date=format_date(today()))
     if not announcements_df.empty and 'Date' in announcements_df.columns:
-        today_str = datetime.today().strftime(DATE_FORMAT)
-        todays_announcement = announcements_df[announcements_df.get('Date') == today_str]
+        todays_announcement = announcements_df[announcements_df.get('Date') == today()]
         if not todays_announcement.empty:
             latest_message = todays_announcement['Message'].iloc[0]
             st.info(f"📢 **Public Announcement:** {latest_message}")
 except Exception:
     pass
 
-# Load all necessary data from Firestore
-df_users = load_collection(USERS_COLLECTION)
-df_live_answers = load_collection(ANSWERS_COLLECTION)
-df_homework = load_collection(HOMEWORK_COLLECTION)
-df_answer_bank = load_collection(ANSWER_BANK_COLLECTION)
-
 # --- Radio Button Navigation ---
 page = st.radio(
     "Select a section",
-    ["Send Messages", "Performance Reports", "Individual Growth Charts"],
+    ["Send Messages", "Performance Reports", "Individual Growth Charts", "Trends", "Progress Reports"],
     horizontal=True,
     label_visibility="collapsed"
 )
 
+# Load the selected section's data from Firestore (the header and announcement are already on screen)
+with st.spinner("Loading school data..."):
+    view_data = load_all_data({coll_name: PRINCIPAL_VIEW_FIELDS[coll_name] for coll_name in SECTION_COLLECTIONS[page]})
+# Sections that skip a collection still get its (empty) columns, so column lookups below never fail.
+df_users, df_live_answers, df_homework, df_answer_bank = (
+    view_data.get(coll_name, empty_frame(coll_name, PRINCIPAL_VIEW_FIELDS[coll_name]))
+    for coll_name in (USERS_COLLECTION, ANSWERS_COLLECTION, HOMEWORK_COLLECTION, ANSWER_BANK_COLLECTION))
+
+# Salary points are sharded counters; fold in the shards that have not been consolidated yet.
+db_for_counters = connect_to_firestore()
+if db_for_counters is not None and not df_users.empty:
+    df_users = with_counter_totals(df_users, 'Salary_Points', load_counter_values(db_for_counters, USERS_COLLECTION, 'Salary_Points'))
+
 if page == "Send Messages":
     st.subheader("Send a Message")
-    message_type = st.radio("Select message type:", ["Individual Instruction", "Public Announcement"])
+    message_type = st.radio("Select message type:", ["Individual Instruction", "Class / Role Broadcast", "Public Announcement"])
     
     if message_type == "Individual Instruction":
         st.markdown("##### Send an Instruction to a Single User")
         if df_users.empty:
             st.warning("No users found.")
         else:
-            search_term = st.text_input("Search for a User by Name:")
-            df_temp = df_users.copy()
-            df_temp['display_name'] = df_temp.apply(lambda row: f"{row['User_Name']} ({row['Class']})" if row['Role'] == 'Student' and row.get('Class') else row['User_Name'], axis=1)
+            user_index = get_user_search_index(current_tenant())
+            user_index.sync(df_users)
+            search_term = st.text_input("Search for a User by Name, Class, Role or Gmail:")
+            matching_doc_ids = user_index.search(search_term)
+            if search_term and len(matching_doc_ids) == SEARCH_LIMIT:
+                st.caption(f"Showing the first {SEARCH_LIMIT} matches; type more to narrow the list.")
             
-            if search_term:
-                filtered_users = df_temp[df_temp['display_name'].str.contains(search_term, case=False, na=False)]
-            else:
-                filtered_users = df_temp
-            
-            user_list = ["---Select a User---"] + filtered_users['display_name'].tolist()
-            with st.form("instruction_form"):
-                selected_display_name = st.selectbox("Select a User", user_list)
+            with st.form("instruction_form", clear_on_submit=True):
+                selected_doc_id = st.selectbox("Select a User", [None] + matching_doc_ids,
+                                               format_func=lambda doc_id: "---Select a User---" if doc_id is None else user_index.display_name(doc_id))
                 instruction_text = st.text_area("Instruction:")
                 if st.form_submit_button("Send Instruction"):
-                    if selected_display_name != "---Select a User---" and instruction_text:
-                        real_user_name = selected_display_name.split(' (')[0]
-                        user_row = df_users[df_users['User_Name'] == real_user_name]
-                        if not user_row.empty:
-                            user_doc_id = user_row.iloc[0]['doc_id']
-                            db = connect_to_firestore()
-                            user_ref = db.collection('users').document(user_doc_id)
-                            user_ref.update({'Instruction': instruction_text, 'Instruction_Status': 'Sent'})
-                            st.success(f"Instruction sent to {real_user_name}.")
-                            st.rerun()
+                    if selected_doc_id and instruction_text:
+                        send_message(connect_to_firestore(), instruction_text, st.session_state.user_name,
+                                     f"User: {user_index.display_name(selected_doc_id)}", [selected_doc_id])
+                        load_sent_messages.clear()
+                        st.success(f"Instruction sent to {user_index.display_name(selected_doc_id)}.")
                     else:
                         st.warning("Please select a user and write an instruction.")
 
+    elif message_type == "Class / Role Broadcast":
+        st.markdown("##### Send an Instruction to a Whole Class or Role")
+        if df_users.empty:
+            st.warning("No users found.")
+        else:
+            audience_kind = st.radio("Send to:", ["Class", "Role"], horizontal=True)
+            options = sorted(df_users[audience_kind].dropna().astype(str).unique()) if audience_kind in df_users.columns else []
+            audience_value = st.selectbox(f"Select a {audience_kind}", options)
+            recipient_doc_ids = audience_doc_ids(df_users, **{("class_name" if audience_kind == "Class" else "role"): audience_value})
+            st.caption(f"{len(recipient_doc_ids)} recipient(s)")
+            with st.form("broadcast_form", clear_on_submit=True):
+                instruction_text = st.text_area("Instruction:")
+                if st.form_submit_button("Send to All"):
+                    if recipient_doc_ids and instruction_text:
+                        with st.spinner(f"Delivering to {len(recipient_doc_ids)} inboxes..."):
+                            _, delivered = send_message(connect_to_firestore(), instruction_text, st.session_state.user_name,
+                                                        f"{audience_kind}: {audience_value}", recipient_doc_ids)
+                        load_sent_messages.clear()
+                        st.success(f"Instruction delivered to {delivered} users in {audience_kind} {audience_value}.")
+                    else:
+                        st.warning("Please choose an audience with users and write an instruction.")
+
     elif message_type == "Public Announcement":
         with st.form("announcement_form"):
             announcement_text = st.text_area("Enter Public Announcement:")
@@ -140,38 +163,58 @@ if page == "Send Messages":
                 if announcement_text:
                     db = connect_to_firestore()
                     new_announcement = {"Message": announcement_text, "Date": datetime.today().strftime(DATE_FORMAT)}
-                    db.collection(ANNOUNCEMENTS_COLLECTION).add(new_announcement)
+                    db.collection(ANNOUNCEMENTS_COLLECTION).add(stamp_update(new_announcement))
+                    invalidate_collections(ANNOUNCEMENTS_COLLECTION)
                     st.success("Public announcement sent to all dashboards!")
                     st.rerun()
                 else:
                     st.warning("Announcement text cannot be empty.")
 
+    st.markdown("---")
+    st.markdown("#### 📨 Sent Instructions")
+    db_messages = connect_to_firestore()
+    sent_messages = load_sent_messages(db_messages) if db_messages is not None else pd.DataFrame()
+    if sent_messages.empty:
+        st.info("No instructions sent yet.")
+    else:
+        st.dataframe(sent_messages.drop(columns=["doc_id"]), use_container_width=True)
+        message_labels = {row.doc_id: f"{row.Date} | {row.Audience} | {str(row.Text)[:60]}" for row in sent_messages.itertuples()}
+        selected_message = st.selectbox("Show replies to", [None] + list(message_labels),
+                                        format_func=lambda doc_id: "---Select a Message---" if doc_id is None else message_labels[doc_id])
+        if selected_message:
+            replies = load_replies(db_messages, selected_message)
+            names = df_users.set_index("doc_id")["User_Name"].astype(str).to_dict() if not df_users.empty else {}
+            if replies:
+                st.dataframe(pd.DataFrame([{"User": names.get(doc_id, doc_id), "Reply": reply} for doc_id, reply in replies]),
+                             use_container_width=True)
+            else:
+                st.info("No replies yet.")
+
 elif page == "Performance Reports":
     st.subheader("Performance Reports")
     st.markdown("#### 📅 Today's Teacher Activity")
     
-    today_str = datetime.today().strftime(DATE_FORMAT)
     df_teachers_report = df_users[df_users['Role'].isin(['Teacher', 'Admin', 'Principal'])].copy()
-    todays_homework = df_homework[df_homework['Date'] == today_str] if not df_homework.empty else pd.DataFrame()
+    todays_homework = df_homework[df_homework['Date'] == today()] if not df_homework.empty else pd.DataFrame()
     
     if not todays_homework.empty:
-        questions_created = todays_homework.groupby('Uploaded_By').size().reset_index(name='Created Today')
+        questions_created = todays_homework.groupby('Uploaded_By', observed=True).size().reset_index(name='Created Today')
+        questions_created['Uploaded_By'] = questions_created['Uploaded_By'].astype(str)
         teacher_activity = pd.merge(df_teachers_report[['User_Name']], questions_created, left_on='User_Name', right_on='Uploaded_By', how='left')
         teacher_activity.drop(columns=['Uploaded_By'], inplace=True, errors='ignore')
     else:
         teacher_activity = df_teachers_report[['User_Name']].copy()
         teacher_activity['Created Today'] = 0
 
-    df_live_answers['Marks'] = pd.to_numeric(df_live_answers.get('Marks'), errors='coerce')
-    ungraded_answers = df_live_answers[df_live_answers['Marks'].isna()]
+    ungraded_answers = df_live_answers[df_live_answers['Marks'].isna()] if not df_live_answers.empty else pd.DataFrame(columns=['Question'])
     
     pending_summary_list = []
     for teacher_name in teacher_activity['User_Name']:
-        teacher_questions = df_homework[df_homework['Uploaded_By'] == teacher_name]['Question'].tolist()
+        teacher_questions = df_homework[df_homework['Uploaded_By'] == teacher_name]['Question'].tolist() if not df_homework.empty else []
         pending_count = len(ungraded_answers[ungraded_answers['Question'].isin(teacher_questions)])
         pending_summary_list.append({'User_Name': teacher_name, 'Pending Answers': pending_count})
         
-    pending_df = pd.DataFrame(pending_summary_list)
+    pending_df = pd.DataFrame(pending_summary_list, columns=['User_Name', 'Pending Answers'])
     teacher_activity = pd.merge(teacher_activity, pending_df, on='User_Name', how='left')
     
     teacher_activity.fillna(0, inplace=True)
@@ -194,11 +237,10 @@ elif page == "Performance Reports":
         st.markdown("#### 📉 Students Needing Improvement")
         df_students = df_users[df_users['Role'] == 'Student']
         if not df_answer_bank.empty:
-            df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
             graded_answers = df_answer_bank.dropna(subset=['Marks'])
             if not graded_answers.empty:
-                student_performance = graded_answers.groupby('Student_Gmail')['Marks'].mean().reset_index()
-                merged_df = pd.merge(student_performance, df_students, left_on='Student_Gmail', right_on='Gmail_ID')
+                student_performance = graded_answers.groupby('Student_Gmail', observed=True)['Marks'].mean().reset_index()
+                merged_df = pd.merge(student_performance, df_students[['Gmail_ID', 'User_Name', 'Class']], left_on='Student_Gmail', right_on='Gmail_ID')
                 weakest_students = merged_df.nsmallest(5, 'Marks').round(2)
                 st.dataframe(weakest_students[['User_Name', 'Class', 'Marks']])
             else:
@@ -208,19 +250,30 @@ elif page == "Performance Reports":
 
     st.markdown("---")
     
+    st.subheader("📊 Class Statistics")
+    df_class_stats = load_class_stats(db_for_counters) if db_for_counters is not None else pd.DataFrame()
+    if df_class_stats.empty:
+        st.info("Class statistics will appear once homework is posted and answers are submitted.")
+    else:
+        st.dataframe(df_class_stats.rename(columns={
+            'Homework_Posted': 'Questions Posted', 'Submissions': 'Submissions',
+            'Graded_Submissions': 'Passed Submissions', 'Average_Marks': 'Average Marks'
+        }).drop(columns=['Marks_Total']), hide_index=True)
+
+    st.markdown("---")
+
     st.subheader("🥇 Class-wise Top 3 Students")
     df_students_report = df_users[df_users['Role'] == 'Student']
     if df_answer_bank.empty or df_students_report.empty:
         st.info("Leaderboard will be generated once answers are graded and moved to the bank.")
     else:
-        df_answer_bank['Marks'] = pd.to_numeric(df_answer_bank.get('Marks'), errors='coerce')
         graded_answers_all = df_answer_bank.dropna(subset=['Marks'])
         if graded_answers_all.empty:
             st.info("The leaderboard is available after answers have been graded.")
         else:
-            df_merged_all = pd.merge(graded_answers_all, df_students_report, left_on='Student_Gmail', right_on='Gmail_ID')
-            leaderboard_df_all = df_merged_all.groupby(['Class', 'User_Name'])['Marks'].mean().reset_index()
-            top_students_df_all = leaderboard_df_all.groupby('Class').apply(lambda x: x.nlargest(3, 'Marks')).reset_index(drop=True)
+            df_merged_all = pd.merge(graded_answers_all[['Student_Gmail', 'Marks']], df_students_report[['Gmail_ID', 'User_Name', 'Class']], left_on='Student_Gmail', right_on='Gmail_ID')
+            leaderboard_df_all = df_merged_all.groupby(['Class', 'User_Name'], observed=True)['Marks'].mean().reset_index()
+            top_students_df_all = leaderboard_df_all.sort_values(['Class', 'Marks'], ascending=[True, False]).groupby('Class', observed=True).head(3).reset_index(drop=True)
             top_students_df_all['Marks'] = top_students_df_all['Marks'].round(2)
             
             st.markdown("#### Top Performers Summary")
@@ -231,21 +284,27 @@ elif page == "Performance Reports":
                          labels={'Marks': 'Average Marks', 'User_Name': 'Student'})
             st.plotly_chart(fig, use_container_width=True)
 
+    st.markdown("---")
+
+    st.subheader("⬇️ Export Reports")
+    export_name = st.selectbox("Report", list(EXPORTS), format_func=lambda name: EXPORTS[name][0])
+    export_classes = sorted(df_users.loc[df_users['Role'] == 'Student', 'Class'].dropna().astype(str).unique()) if not df_users.empty else []
+    render_export_panel(db_for_counters, export_name, f"export_{export_name}", export_classes)
+
 elif page == "Individual Growth Charts":
     st.subheader("Individual Growth Charts")
     report_type = st.selectbox("Select report type", ["Student", "Teacher"])
 
     if report_type == "Student":
         df_students = df_users[df_users['Role'] == 'Student'].copy()
-        df_students['display_name'] = df_students.apply(lambda row: f"{row['User_Name']} ({row['Class']})", axis=1)
+        df_students['display_name'] = df_students['User_Name'].astype(str) + " (" + df_students['Class'].astype(str) + ")"
         student_name_display = st.selectbox("Select Student", df_students['display_name'].tolist())
         
         if student_name_display:
             real_name = student_name_display.split(' (')[0]
             student_gmail = df_students[df_students['User_Name'] == real_name].iloc[0]['Gmail_ID']
-            student_answers = df_answer_bank[df_answer_bank['Student_Gmail'] == student_gmail].copy()
+            student_answers = df_answer_bank[df_answer_bank['Student_Gmail'] == student_gmail] if not df_answer_bank.empty else pd.DataFrame()
             if not student_answers.empty:
-                student_answers['Marks'] = pd.to_numeric(student_answers['Marks'], errors='coerce')
                 graded_answers = student_answers.dropna(subset=['Marks'])
                 if not graded_answers.empty:
                     fig = px.bar(graded_answers, x='Subject', y='Marks', color='Subject', title=f"Subject-wise Performance for {student_name_display}")
@@ -261,11 +320,71 @@ elif page == "Individual Growth Charts":
         if teacher_name:
             teacher_homework = df_homework[df_homework['Uploaded_By'] == teacher_name]
             if not teacher_homework.empty:
-                questions_by_subject = teacher_homework.groupby('Subject').size().reset_index(name='Question Count')
+                questions_by_subject = teacher_homework.groupby('Subject', observed=True).size().reset_index(name='Question Count')
                 fig = px.bar(questions_by_subject, x='Subject', y='Question Count', color='Subject', title=f"Homework Created by {teacher_name}")
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info(f"{teacher_name} has not created any homework yet.")
 
+elif page == "Trends":
+    st.subheader("📈 Trends")
+    col1, col2, col3 = st.columns(3)
+    window = col1.selectbox("Period", list(TREND_WINDOWS))
+    dimension = col2.selectbox("Compare by", ["Class", "Subject", "Teacher"])
+    metric_label = col3.selectbox("Metric", list(TREND_METRICS))
+    period, bucket_count = TREND_WINDOWS[window]
+    df_trend = load_trend(db_for_counters, period, bucket_count) if db_for_counters is not None else pd.DataFrame()
+    df_trend = df_trend[df_trend['Dimension'] == dimension] if not df_trend.empty else df_trend
+    if df_trend.empty:
+        st.info("No activity has been recorded for this period yet. Run 'python rollups.py --backfill' to build the history.")
+    else:
+        metric = TREND_METRICS[metric_label]
+        fig = px.line(df_trend.dropna(subset=[metric]), x='Start', y=metric, color='Name', markers=True,
+                      title=f"{metric_label} by {dimension}", labels={'Start': period.capitalize(), metric: metric_label, 'Name': dimension})
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f"#### Totals for the {window.split('(')[1].rstrip(')')}")
+        totals = df_trend.groupby('Name')[['Submissions', 'Passed', 'Marks_Total', 'Due_Known', 'On_Time', 'Questions_Created']].sum()
+        totals['Average Marks'] = (totals['Marks_Total'] / totals['Passed'].where(totals['Passed'] > 0)).round(2)
+        totals['On-Time Rate (%)'] = (totals['On_Time'] / totals['Due_Known'].where(totals['Due_Known'] > 0) * 100).round(1)
+        st.dataframe(totals.reset_index().rename(columns={'Name': dimension, 'Questions_Created': 'Questions Created'})
+                     [[dimension, 'Submissions', 'Passed', 'Average Marks', 'On-Time Rate (%)', 'Questions Created']], hide_index=True)
+
+elif page == "Progress Reports":
+    st.subheader("📄 Printable Progress Reports")
+    st.caption("Reports are rendered in the background and reused until the class's marks or homework change.")
+    ensure_report_workers()
+    df_report_students = df_users[df_users['Role'] == 'Student'] if not df_users.empty else df_users
+    if df_report_students.empty:
+        st.warning("No students found.")
+    else:
+        class_options = sorted(df_report_students['Class'].dropna().astype(str).unique())
+        col1, col2 = st.columns(2)
+        report_class = col1.selectbox("Class", class_options)
+        class_students = df_report_students[df_report_students['Class'].astype(str) == report_class]
+        student_names = dict(zip(class_students['Gmail_ID'].astype(str), class_students['User_Name'].astype(str)))
+        report_scope = col2.selectbox("Report", ["Whole class (summary and every student)", "Class summary only"] + list(student_names),
+                                      format_func=lambda option: student_names.get(option, option))
+        with st.form("report_form"):
+            col1, col2 = st.columns(2)
+            report_format = col1.selectbox("Format", list(REPORT_FORMATS))
+            term_range = col2.date_input("Term (leave empty for all time)", value=())
+            if st.form_submit_button("Generate Reports"):
+                term = (term_range[0].strftime(DATE_FORMAT) if len(term_range) > 0 else None,
+                        term_range[-1].strftime(DATE_FORMAT) if len(term_range) > 0 else None)
+                ext = REPORT_FORMATS[report_format]
+                if report_scope.startswith("Whole class"):
+                    job_ids = enqueue_class_batch(st.session_state.user_gmail, current_tenant(), report_class, ext, list(student_names), term)
+                    st.success(f"Queued {len(job_ids)} reports for class {report_class}.")
+                else:
+                    student = None if report_scope == "Class summary only" else report_scope
+                    enqueue_report(st.session_state.user_gmail, current_tenant(), report_class, ext, student, term)
+                    st.success("Report queued.")
+    if job_queue.get_owner_jobs(st.session_state.user_gmail, REPORT_JOB):
+        st.markdown("#### Your Reports")
+        report_jobs_panel(st.session_state.user_gmail)
+
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: grey;'>© 2025 PRK Home Tuition. All Rights Reserved.</p>", unsafe_allow_html=True)
+
+profiling.finish_capture()
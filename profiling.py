@@ -0,0 +1,206 @@
+"""On-demand cProfile capture of dashboard reruns.
+
+A page calls start_capture() after its security gatekeeper and finish_capture() at its end;
+both do nothing unless profiling is on for the session, which is the case when
+    - PROFILE_RERUNS=1 is set in the environment (every rerun of every session), or
+    - an admin switched it on for their own session in the Admin panel, or
+    - an admin asked for the next N reruns of a user (kept in PROFILES_DIR/targets.json,
+      so it reaches that user's running session without a redeploy).
+Each capture is written to PROFILES_DIR as <id>.prof (pstats format, e.g. for snakeviz) and
+<id>.json: page, role, centre, profiled seconds, the rows of every frame the rerun loaded
+(data_layer reports them through note_load()) and the hot spots, both per function and
+summed per library (Firestore, pandas, sklearn, plotly, Streamlit, app code). Reruns faster
+than PROFILE_MIN_SECONDS are not kept; only the newest MAX_PROFILES captures are.
+
+The profiler sees the script thread only: loads running on load_concurrently's pool show up
+as time spent waiting in future.result(), and their row counts in the data sizes.
+A rerun cut short by st.rerun() is saved by the next start_capture() and marked Interrupted.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sysconfig
+import threading
+import time
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from tenancy import current_tenant
+
+# === CONFIGURATION ===
+PROFILES_DIR = os.environ.get("PROFILES_DIR", os.path.join("queue", "profiles"))
+TARGETS_FILE = "targets.json"
+PROFILE_ALL = os.environ.get("PROFILE_RERUNS", "") not in ("", "0")
+PROFILE_MIN_SECONDS = float(os.environ.get("PROFILE_MIN_SECONDS", "0"))
+MAX_PROFILES = 200
+HOT_SPOTS = 25
+SESSION_KEY = "profile_reruns"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+# Library -> path fragments of its files, checked in order; then "Python" (builtins and the
+# standard library), "App" (this repository) and "Other".
+LIBRARIES = [
+    ("Firestore", ("google/cloud/firestore", "google/api_core", "grpc", "firebase_admin")),
+    ("pandas", ("pandas", "numpy", "pyarrow")),
+    ("sklearn", ("sklearn", "scipy", "joblib")),
+    ("plotly", ("plotly",)),
+    ("Streamlit", ("streamlit",)),
+]
+
+# session id -> capture dict of the rerun being profiled
+_active = {}
+_targets_lock = threading.Lock()
+
+# === TARGETS ===
+
+def _targets_path():
+    return os.path.join(PROFILES_DIR, TARGETS_FILE)
+
+def load_targets():
+    """Returns {user gmail: reruns still to capture}."""
+    try:
+        with open(_targets_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_targets(targets):
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    tmp_path = _targets_path() + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({user: count for user, count in targets.items() if count > 0}, f)
+    os.replace(tmp_path, _targets_path())
+
+def set_target(user_gmail, reruns):
+    """Captures the next `reruns` reruns of a user's sessions (0 cancels)."""
+    with _targets_lock:
+        targets = load_targets()
+        targets[user_gmail] = int(reruns)
+        _save_targets(targets)
+
+def _take_target(user_gmail):
+    if not user_gmail or not os.path.exists(_targets_path()):
+        return False
+    with _targets_lock:
+        targets = load_targets()
+        if targets.get(user_gmail, 0) <= 0:
+            return False
+        targets[user_gmail] -= 1
+        _save_targets(targets)
+    return True
+
+def profiling_enabled():
+    return PROFILE_ALL or bool(st.session_state.get(SESSION_KEY)) or _take_target(st.session_state.get("user_gmail"))
+
+# === CAPTURE ===
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def start_capture(page):
+    """Starts profiling this rerun of `page` if profiling is on for the session."""
+    session_id = _session_id()
+    if session_id is None:
+        return
+    if session_id in _active:
+        _save(_active.pop(session_id), interrupted=True)
+    if not profiling_enabled():
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:  # another profiler is already active in this process
+        return
+    _active[session_id] = {"profile": profile, "page": page, "role": st.session_state.get("user_role"),
+                           "centre": current_tenant(), "started": time.time(), "frames": {}}
+
+def note_load(collection_name, filters, df):
+    """Records the rows of a frame loaded during a profiled rerun (called by data_layer)."""
+    capture = _active.get(_session_id())
+    if capture is not None:
+        label = collection_name + ("".join(f" {field}={value}" for field, value in filters) if filters else "")
+        capture["frames"][label] = len(df)
+
+def finish_capture():
+    """Stops profiling this rerun and saves the capture."""
+    capture = _active.pop(_session_id(), None)
+    if capture is not None:
+        _save(capture, interrupted=False)
+
+def _library(filename):
+    path = filename.replace(os.sep, "/")
+    for library, fragments in LIBRARIES:
+        if any(f"/{fragment}/" in path for fragment in fragments):
+            return library
+    if filename == "~" or (filename.startswith(STDLIB_DIR) and "site-packages" not in path):
+        return "Python"
+    return "App" if filename.startswith(APP_DIR) and "site-packages" not in path else "Other"
+
+def hot_spots(stats, limit=HOT_SPOTS):
+    """Returns (functions, libraries): the top functions by own time and own time summed per library."""
+    functions, libraries = [], {}
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        library = _library(filename)
+        libraries[library] = libraries.get(library, 0.0) + own
+        functions.append({"Function": f"{os.path.basename(filename)}:{line}({name})", "Library": library,
+                          "Calls": calls, "Own (s)": round(own, 4), "Cumulative (s)": round(cumulative, 4)})
+    functions.sort(key=lambda row: row["Own (s)"], reverse=True)
+    return functions[:limit], {library: round(seconds, 4) for library, seconds in sorted(libraries.items(), key=lambda item: -item[1])}
+
+def _save(capture, interrupted):
+    profile = capture["profile"]
+    profile.disable()
+    stats = pstats.Stats(profile)
+    if stats.total_tt < PROFILE_MIN_SECONDS:
+        return
+    functions, libraries = hot_spots(stats)
+    capture_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(capture['started']))}-{int(capture['started'] * 1000) % 1000:03d}"
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(PROFILES_DIR, capture_id + ".prof"))
+    meta = {"Id": capture_id, "Captured_At": capture["started"], "Page": capture["page"], "Role": capture["role"],
+            "Centre": capture["centre"], "Seconds": round(stats.total_tt, 3), "Interrupted": interrupted,
+            "Frames": capture["frames"], "Rows": sum(capture["frames"].values()),
+            "Libraries": libraries, "Hot_Spots": functions}
+    with open(os.path.join(PROFILES_DIR, capture_id + ".json"), "w") as f:
+        json.dump(meta, f)
+    _prune()
+
+def _prune():
+    captures = sorted(name[:-5] for name in os.listdir(PROFILES_DIR) if name.endswith(".json") and name != TARGETS_FILE)
+    for capture_id in captures[:-MAX_PROFILES]:
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, capture_id + extension))
+            except OSError:
+                pass
+
+# === READING ===
+
+def load_capture(capture_id):
+    with open(os.path.join(PROFILES_DIR, capture_id + ".json")) as f:
+        return json.load(f)
+
+def profile_path(capture_id):
+    return os.path.join(PROFILES_DIR, capture_id + ".prof")
+
+def list_captures():
+    """Returns one row per saved capture, newest first, with its slowest library."""
+    rows = []
+    if os.path.isdir(PROFILES_DIR):
+        for name in os.listdir(PROFILES_DIR):
+            if not name.endswith(".json") or name == TARGETS_FILE:
+                continue
+            try:
+                meta = load_capture(name[:-5])
+            except (OSError, ValueError):
+                continue
+            top_library = next(iter(meta.get("Libraries") or {}), None)
+            rows.append({"Id": meta["Id"], "Captured": time.strftime("%d-%m-%Y %H:%M:%S", time.localtime(meta["Captured_At"])),
+                         "Page": meta["Page"], "Role": meta["Role"], "Centre": meta["Centre"], "Seconds": meta["Seconds"],
+                         "Rows Loaded": meta["Rows"], "Top Library": top_library,
+                         "Top Function": (meta.get("Hot_Spots") or [{}])[0].get("Function"), "Interrupted": meta["Interrupted"]})
+    columns = ["Id", "Captured", "Page", "Role", "Centre", "Seconds", "Rows Loaded", "Top Library", "Top Function", "Interrupted"]
+    return pd.DataFrame(rows, columns=columns).sort_values("Id", ascending=False, ignore_index=True)
@@ -0,0 +1,192 @@
+"""In-memory question bank over the homework collection, for search and duplicate checks.
+
+Questions are indexed by normalized word tokens (an inverted index token -> doc_ids) and by
+their (Class, Subject) scope. Like the user search index, the bank is synced incrementally
+from the homework frame: rows are hashed and only added, changed or removed questions are
+re-indexed. Newly posted questions can also be added directly with upsert().
+
+search() ranks questions by the inverse document frequency of the query tokens they contain
+(the last query token also matches as a prefix, so results update while typing).
+find_duplicates() draws candidates from the postings of the new question's tokens within its
+class and subject and scores them by Jaccard similarity of character shingles, the same
+measure copy detection uses for answers.
+"""
+import bisect
+import math
+import re
+import threading
+import weakref
+from collections import Counter
+import pandas as pd
+from copy_detection import shingles
+from data_layer import DATE_FORMAT
+from user_search import normalize
+
+# === CONFIGURATION ===
+INDEXED_FIELDS = ["Class", "Subject", "Question", "Model_Answer", "Date", "Uploaded_By"]
+DUPLICATE_THRESHOLD = 0.7   # shingle Jaccard similarity at which a new question is flagged
+MAX_CANDIDATES = 200        # questions sharing the most tokens that are scored exactly
+STOPWORDS = {"a", "an", "the", "is", "are", "of", "to", "in", "on", "and", "or", "what", "which", "why", "how",
+             "write", "explain", "define", "give", "for", "with", "its", "it", "by", "be", "do", "does"}
+
+def tokenize(text):
+    """Splits a question into normalized words (ASCII text skips the slower accent folding)."""
+    text = str(text or "")
+    return re.findall(r"\w+", text.casefold() if text.isascii() else normalize(text))
+
+def question_tokens(text):
+    """Returns the distinct searchable tokens of a question."""
+    return {token for token in tokenize(text) if token not in STOPWORDS}
+
+def _fingerprint(text):
+    """Shingles of a question; questions too short to shingle ('2+2?') fall back to their whole text."""
+    return shingles(text) or {" ".join(tokenize(text))} - {""}
+
+# === INDEX ===
+
+class QuestionBankIndex:
+    """Token and scope index over homework questions, resolving to Firestore doc ids."""
+
+    def __init__(self):
+        self.entries = {}         # doc_id -> {"question", "model_answer", "class", "subject", "date", "uploaded_by", "tokens", "shingles"}
+        self.row_hashes = {}      # doc_id -> hash of the indexed fields
+        self.postings = {}        # token -> set of doc_ids
+        self.sorted_tokens = []   # every token in postings, kept sorted for prefix search
+        self.scopes = {}          # (class, subject) -> set of doc_ids
+        self.lock = threading.Lock()  # the bank is shared by every session of the process; held by every read and write
+        self._synced_frame = None
+
+    def sync(self, df_homework):
+        """Applies added, changed and removed questions from the latest homework DataFrame."""
+        with self.lock:
+            if self._synced_frame is not None and self._synced_frame() is df_homework:
+                return  # the cached frame has not been reloaded since the last sync
+            self._synced_frame = weakref.ref(df_homework)
+            if df_homework.empty or "doc_id" not in df_homework.columns:
+                for doc_id in list(self.entries):
+                    self._remove(doc_id)
+                return
+            rows = df_homework.reindex(columns=["doc_id"] + INDEXED_FIELDS).astype(object)
+            rows["Date"] = pd.to_datetime(rows["Date"], errors="coerce").dt.strftime(DATE_FORMAT)
+            rows = rows.fillna("").astype(str)
+            hashes = pd.util.hash_pandas_object(rows, index=False)
+            columns = list(rows.columns)
+            values = rows.to_numpy()
+            current_ids = set()
+            for position, (doc_id, row_hash) in enumerate(zip(rows["doc_id"], hashes)):
+                current_ids.add(doc_id)
+                if self.row_hashes.get(doc_id) != row_hash:
+                    self._upsert(doc_id, dict(zip(columns, values[position])))
+                    self.row_hashes[doc_id] = row_hash
+            for doc_id in set(self.entries) - current_ids:
+                self._remove(doc_id)
+
+    def upsert(self, doc_id, homework):
+        """Indexes (or re-indexes) one question, e.g. right after it is posted."""
+        with self.lock:
+            self._upsert(doc_id, homework)
+
+    def _upsert(self, doc_id, homework):
+        self._remove(doc_id)
+        question = str(homework.get("Question", "")).strip()
+        scope = (str(homework.get("Class", "")).strip(), str(homework.get("Subject", "")).strip())
+        tokens = question_tokens(question)
+        self.entries[doc_id] = {
+            "question": question, "model_answer": str(homework.get("Model_Answer", "")).strip(),
+            "class": scope[0], "subject": scope[1], "date": str(homework.get("Date", "")),
+            "uploaded_by": str(homework.get("Uploaded_By", "")), "tokens": tokens, "shingles": _fingerprint(question),
+        }
+        self.scopes.setdefault(scope, set()).add(doc_id)
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                bisect.insort(self.sorted_tokens, token)
+            self.postings[token].add(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self.entries.pop(doc_id, None)
+        self.row_hashes.pop(doc_id, None)
+        if entry is None:
+            return
+        scope_ids = self.scopes.get((entry["class"], entry["subject"]))
+        if scope_ids is not None:
+            scope_ids.discard(doc_id)
+        for token in entry["tokens"]:
+            doc_ids = self.postings.get(token)
+            if doc_ids is None:
+                continue
+            doc_ids.discard(doc_id)
+            if not doc_ids:
+                del self.postings[token]
+                position = bisect.bisect_left(self.sorted_tokens, token)
+                if position < len(self.sorted_tokens) and self.sorted_tokens[position] == token:
+                    self.sorted_tokens.pop(position)
+
+    def _prefix_tokens(self, prefix):
+        position = bisect.bisect_left(self.sorted_tokens, prefix)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+            yield self.sorted_tokens[position]
+            position += 1
+
+    def _idf(self, token):
+        return math.log(1 + len(self.entries) / len(self.postings[token])) if token in self.postings else 0.0
+
+    def _scope_ids(self, class_name, subject):
+        if not class_name and not subject:
+            return None  # every question
+        if class_name and subject:
+            return self.scopes.get((class_name, subject), set())
+        return {doc_id for (cls, subj), ids in self.scopes.items()
+                if (not class_name or cls == class_name) and (not subject or subj == subject) for doc_id in ids}
+
+    def search(self, query, class_name=None, subject=None, limit=20):
+        """Returns doc ids of questions matching the query, best matches first."""
+        tokens = [token for token in tokenize(query) if token not in STOPWORDS]
+        if not tokens:
+            return []
+        with self.lock:
+            scope_ids = self._scope_ids(class_name, subject)
+            scores = Counter()
+            for position, token in enumerate(tokens):
+                matched = list(self._prefix_tokens(token)) if position == len(tokens) - 1 else [token]
+                token_hits = Counter()
+                for match in matched:
+                    idf = self._idf(match)
+                    for doc_id in self.postings.get(match, ()):
+                        if idf > token_hits[doc_id]:
+                            token_hits[doc_id] = idf
+                for doc_id, score in token_hits.items():
+                    if scope_ids is None or doc_id in scope_ids:
+                        scores[doc_id] += score
+            return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]]
+
+    def find_duplicates(self, question, class_name, subject, threshold=DUPLICATE_THRESHOLD, exclude=()):
+        """Returns [(doc_id, similarity)] of questions in the same class and subject that nearly match."""
+        new_shingles = _fingerprint(question)
+        if not new_shingles:
+            return []
+        with self.lock:
+            scope_ids = self.scopes.get((class_name, subject), set())
+            shared = Counter()
+            tokens = question_tokens(question)
+            candidate_ids = (doc_id for token in tokens for doc_id in self.postings.get(token, ())) if tokens else scope_ids
+            for doc_id in candidate_ids:
+                if doc_id in scope_ids and doc_id not in exclude:
+                    shared[doc_id] += 1
+            duplicates = []
+            for doc_id, _ in shared.most_common(MAX_CANDIDATES):
+                other = self.entries[doc_id]["shingles"]
+                similarity = len(new_shingles & other) / len(new_shingles | other)
+                if similarity >= threshold:
+                    duplicates.append((doc_id, similarity))
+        return sorted(duplicates, key=lambda item: -item[1])
+
+    def get(self, doc_id):
+        """Returns the indexed question, model answer and metadata of a doc id (None if unknown)."""
+        with self.lock:
+            return self.entries.get(doc_id)
+
+def text_similarity(text1, text2):
+    """Shingle Jaccard similarity of two questions that are not in the index yet."""
+    shingles1, shingles2 = _fingerprint(text1), _fingerprint(text2)
+    return len(shingles1 & shingles2) / len(shingles1 | shingles2) if shingles1 and shingles2 else 0.0
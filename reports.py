@@ -0,0 +1,420 @@
+"""Printable per-student and per-class progress reports, rendered by background workers.
+
+Pages only enqueue "report" jobs on the shared job queue (job_queue); worker processes claim
+them in micro-batches, group the batch by centre, class and term, load that class's data
+once per group and render each job's report as PDF (reportlab) or XLSX (openpyxl). A report
+for a whole class is a batch: one job for the class summary plus one per student, so a
+term's reports for 200 students come out of one worker run and share a single class load.
+
+A report shows subject averages, completion (homework completed of homework assigned),
+overdue homework and rank in class. Without a term they come from the precomputed
+student_summaries; with a term they are computed from that term's answer_bank records.
+Rendered files are cached under REPORTS_DIR/<centre>/<class>/ keyed by a data version: a
+hash of the class's summary and homework Updated_At stamps, the term and today's date
+(overdue depends on it). A request whose data has not changed is served from the cached
+file without rendering, and cached files older than RETENTION_DAYS are removed.
+
+Run a standalone pool, or render one report directly, with:
+    python reports.py --workers 2
+    python reports.py --render --class 8th --format pdf --from 01-04-2025 --to 30-09-2025
+    python reports.py --render --class 8th --student someone@gmail.com --format xlsx
+If no standalone pool is configured (REPORT_WORKERS_EXTERNAL unset), the Streamlit server
+starts one worker itself the first time a page offers reports.
+"""
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from datetime import datetime
+import streamlit as st
+import job_queue
+
+# === CONFIGURATION ===
+REPORT_JOB = "report"
+REPORTS_DIR = os.environ.get("REPORTS_DIR", os.path.join("queue", "reports"))
+FORMATS = {"PDF": "pdf", "Excel": "xlsx"}
+MIME_TYPES = {"pdf": "application/pdf", "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+DEFAULT_WORKERS = 1
+DEFAULT_BATCH_SIZE = 50
+IDLE_SLEEP_SECONDS = 1.0
+RETENTION_DAYS = 30
+LAYOUT_VERSION = 1       # bump when the report layout changes, so cached files are re-rendered
+PANEL_REFRESH_SECONDS = 3
+BATCHES_SHOWN = 10
+DATE_FORMAT = "%d-%m-%Y"
+CLASS_SCOPE = "class"
+
+STUDENT_COLUMNS = ["Rank", "Student Name", "Assigned", "Completed", "Completion %", "Overdue", "Average Marks", "Graded Answers"]
+
+# === REQUESTS ===
+
+def enqueue_report(owner, tenant_id, class_name, fmt, student=None, term=(None, None)):
+    """Queues one report (a student's, or the class summary if `student` is None); returns the job id."""
+    payload = {"Tenant": tenant_id, "Class": class_name, "Format": fmt, "Student": student,
+               "Term_From": term[0], "Term_To": term[1], "Batch": f"{time.time():.6f}"}
+    return job_queue.enqueue(REPORT_JOB, payload, owner=owner)
+
+def enqueue_class_batch(owner, tenant_id, class_name, fmt, students, term=(None, None)):
+    """Queues the class summary and every student's report as one batch; returns the job ids."""
+    batch_id = f"{time.time():.6f}"
+    payload = {"Tenant": tenant_id, "Class": class_name, "Format": fmt, "Term_From": term[0], "Term_To": term[1], "Batch": batch_id}
+    return [job_queue.enqueue(REPORT_JOB, {**payload, "Student": student}, owner=owner) for student in [None] + list(students)]
+
+# === CLASS DATA ===
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+def load_class_data(db, class_name, term_from=None, term_to=None):
+    """Reads what a class's reports are built from and the data version it hashes to.
+
+    Costs one read per student summary plus the class's homework; the answer records a
+    report also needs are only streamed by build_rows(), on a cache miss.
+    """
+    from exports import iter_records, load_student_names
+    from firestore_client import UPDATED_AT_FIELD
+    from student_summary import summary_ref
+    names = load_student_names(db, class_name)
+    summaries = {snapshot.id: snapshot.to_dict() or {} for snapshot in db.get_all([summary_ref(db, gmail) for gmail in names])
+                 if snapshot.exists} if names else {}
+    homework = list(iter_records(db, "homework", ["Class", "Date", "Due_Date", "Question", UPDATED_AT_FIELD], class_name,
+                                 None, _parse_date(term_from), _parse_date(term_to)))
+    stamps = [LAYOUT_VERSION, class_name, term_from, term_to, datetime.today().strftime(DATE_FORMAT),
+              sorted((gmail, name, str(summaries.get(gmail, {}).get(UPDATED_AT_FIELD))) for gmail, (name, _) in names.items()),
+              sorted(str(record.get(UPDATED_AT_FIELD)) for record in homework)]
+    version = hashlib.sha1(json.dumps(stamps, default=str).encode("utf-8")).hexdigest()[:16]
+    return {"class": class_name, "term": (term_from, term_to), "names": names, "summaries": summaries,
+            "homework": homework, "version": version}
+
+def build_rows(db, data):
+    """Returns one report row per student of the class (ranked by average marks) and {student: subject averages}."""
+    from exports import iter_records
+    term_from, term_to = (_parse_date(value) for value in data["term"])
+    by_term = term_from is not None or term_to is not None
+    due_dates = {(record.get("Date"), record.get("Question")): _parse_date(record.get("Due_Date")) for record in data["homework"]}
+    done, graded = {}, {}  # student -> homework keys passed / {subject: [marks total, graded]}
+    for record in iter_records(db, "answer_bank", ["Student_Gmail", "Subject", "Date", "Question", "Marks"], data["class"],
+                               None, term_from, term_to):
+        gmail = record.get("Student_Gmail")
+        key = (record.get("Date"), record.get("Question"))
+        if key in due_dates:
+            done.setdefault(gmail, set()).add(key)
+        if by_term and isinstance(record.get("Marks"), (int, float)):
+            totals = graded.setdefault(gmail, {}).setdefault(str(record.get("Subject") or "Other"), [0.0, 0])
+            totals[0] += record["Marks"]
+            totals[1] += 1
+
+    today = datetime.today().date()
+    rows, subjects = [], {}
+    for gmail, (name, _) in data["names"].items():
+        summary = data["summaries"].get(gmail, {})
+        if by_term:
+            subject_totals = graded.get(gmail, {})
+            assigned, completed = len(due_dates), len(done.get(gmail, ()))
+        else:
+            subject_totals = {subject: [totals.get("Marks_Total", 0), totals.get("Graded", 0)]
+                              for subject, totals in (summary.get("Subjects") or {}).items()}
+            assigned, completed = summary.get("Assigned", len(due_dates)), summary.get("Completed", 0)
+        marks_total = sum(totals[0] for totals in subject_totals.values())
+        graded_count = sum(totals[1] for totals in subject_totals.values())
+        subjects[gmail] = {subject: round(total / count, 2) for subject, (total, count) in sorted(subject_totals.items()) if count}
+        overdue = sum(1 for key, due in due_dates.items() if due and due < today and key not in done.get(gmail, ()))
+        rows.append({"Gmail": gmail, "Student Name": name, "Assigned": assigned, "Completed": completed,
+                     "Completion %": round(completed / assigned * 100, 1) if assigned else 0.0, "Overdue": overdue,
+                     "Average Marks": round(marks_total / graded_count, 2) if graded_count else None, "Graded Answers": graded_count})
+    rows.sort(key=lambda row: (row["Average Marks"] is None, -(row["Average Marks"] or 0), str(row["Student Name"])))
+    rank, previous = 0, None
+    for row in rows:
+        if row["Average Marks"] is not None and row["Average Marks"] != previous:
+            rank += 1
+            previous = row["Average Marks"]
+        row["Rank"] = rank if row["Average Marks"] is not None else None
+    return rows, subjects
+
+# === RENDERING ===
+
+def _term_label(term):
+    term_from, term_to = term
+    if not term_from and not term_to:
+        return "All time"
+    return f"{term_from or '…'} to {term_to or '…'}"
+
+def _cell(value):
+    return "—" if value is None else value
+
+def write_pdf(out, title, subtitle, tables):
+    """Writes a PDF with a title, a subtitle and (heading, columns, rows) tables."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    styles = getSampleStyleSheet()
+    story = [Paragraph(title, styles["Title"]), Paragraph(subtitle, styles["Normal"]), Spacer(1, 12)]
+    for heading, columns, rows in tables:
+        story.append(Paragraph(heading, styles["Heading3"]))
+        table = Table([columns] + [[_cell(value) for value in row] for row in rows] if rows else [columns, ["—"] * len(columns)],
+                      repeatRows=1)
+        table.setStyle(TableStyle([("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1f4e79")),
+                                   ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                                   ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                                   ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#eef3f8")]),
+                                   ("FONTSIZE", (0, 0), (-1, -1), 9)]))
+        story += [table, Spacer(1, 12)]
+    SimpleDocTemplate(out, pagesize=A4, title=title).build(story)
+
+def write_xlsx(out, title, subtitle, tables):
+    """Writes the same tables as write_pdf, one worksheet each."""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for heading, columns, rows in tables:
+        sheet = workbook.create_sheet(heading[:31])
+        sheet.append([title])
+        sheet.append([subtitle])
+        sheet.append([])
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(list(row))
+    workbook.save(out)
+
+WRITERS = {"pdf": write_pdf, "xlsx": write_xlsx}
+
+def report_tables(rows, subjects, student=None):
+    """Returns (title, tables) of the class summary, or of one student's report."""
+    if student is None:
+        class_subjects = {}
+        for averages in subjects.values():
+            for subject, average in averages.items():
+                class_subjects.setdefault(subject, []).append(average)
+        return "Class Progress Report", [
+            ("Students", STUDENT_COLUMNS, [[row[column] for column in STUDENT_COLUMNS] for row in rows]),
+            ("Subject Averages", ["Subject", "Class Average", "Students Graded"],
+             [[subject, round(sum(values) / len(values), 2), len(values)] for subject, values in sorted(class_subjects.items())]),
+        ]
+    row = next(row for row in rows if row["Gmail"] == student)
+    ranked = sum(1 for other in rows if other["Rank"] is not None)
+    overview = [[column, _cell(row[column])] for column in STUDENT_COLUMNS[2:]]
+    overview.append(["Rank in Class", f"{row['Rank']} of {ranked}" if row["Rank"] else "Not ranked yet"])
+    return f"Progress Report: {row['Student Name']}", [
+        ("Overview", ["Measure", "Value"], overview),
+        ("Subject Averages", ["Subject", "Average Marks"], [[subject, average] for subject, average in subjects.get(student, {}).items()]),
+    ]
+
+def _safe(value):
+    return re.sub(r"[^A-Za-z0-9@._-]+", "_", str(value))
+
+def report_path(tenant_id, data, student, ext):
+    scope = _safe(student) if student else CLASS_SCOPE
+    return os.path.join(REPORTS_DIR, _safe(tenant_id), _safe(data["class"]), f"{scope}-{data['version']}.{ext}")
+
+def download_name(class_name, student_name, term, ext):
+    parts = ["Progress_Report", class_name, student_name, term[0], term[1]]
+    return "_".join(_safe(part) for part in parts if part) + f".{ext}"
+
+# === WORKER ===
+
+def render_reports(db, tenant_id, data, jobs):
+    """Renders (or finds cached) the reports of jobs that share one class load.
+
+    Returns {job id: result}, where the result of a job that could not be rendered is its exception.
+    """
+    rows, subjects, results = None, None, {}
+    for job in jobs:
+        payload = job["payload"]
+        ext, student = payload["Format"], payload.get("Student")
+        try:
+            if student and student not in data["names"]:
+                raise ValueError(f"{student} is not a student of class {data['class']}.")
+            path = report_path(tenant_id, data, student, ext)
+            cached = os.path.exists(path)
+            if not cached:
+                if rows is None:
+                    rows, subjects = build_rows(db, data)
+                title, tables = report_tables(rows, subjects, student)
+                subtitle = f"Class {data['class']} · {_term_label(data['term'])} · generated {datetime.today().strftime(DATE_FORMAT)}"
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as out:
+                    WRITERS[ext](out, title, subtitle, tables)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            results[job["id"]] = e
+            continue
+        student_name = data["names"][student][0] if student else None
+        results[job["id"]] = {"path": path, "cached": cached, "student_name": student_name,
+                              "file_name": download_name(data["class"], student_name, data["term"], ext)}
+    return results
+
+def process_batch(db, jobs):
+    """Groups claimed jobs by centre, class and term, and renders each group from one class load."""
+    from tenancy import DEFAULT_TENANT, for_tenant
+    groups = {}
+    for job in jobs:
+        payload = job["payload"]
+        key = (payload.get("Tenant") or DEFAULT_TENANT, payload["Class"], payload.get("Term_From"), payload.get("Term_To"))
+        groups.setdefault(key, []).append(job)
+    for (tenant_id, class_name, term_from, term_to), group_jobs in groups.items():
+        try:
+            tenant_db = for_tenant(db, tenant_id)
+            results = render_reports(tenant_db, tenant_id, load_class_data(tenant_db, class_name, term_from, term_to), group_jobs)
+        except Exception as e:
+            results = {job["id"]: e for job in group_jobs}
+        for job in group_jobs:
+            if isinstance(results[job["id"]], Exception):
+                job_queue.fail(job["id"], results[job["id"]], job["attempts"])
+            else:
+                job_queue.complete(job["id"], results[job["id"]])
+
+def prune_reports(max_age_days=RETENTION_DAYS):
+    """Deletes cached report files older than `max_age_days`; returns how many were removed."""
+    cutoff, removed = time.time() - max_age_days * 86400, 0
+    for directory, _, files in os.walk(REPORTS_DIR):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+def worker_loop(batch_size=DEFAULT_BATCH_SIZE, queue_path=None):
+    """Runs in a worker process: claims and renders report jobs until terminated."""
+    if queue_path:
+        job_queue.QUEUE_PATH = queue_path
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return
+    last_housekeeping = 0.0
+    while True:
+        if time.time() - last_housekeeping > 3600:
+            job_queue.requeue_stale(REPORT_JOB)
+            prune_reports()
+            last_housekeeping = time.time()
+        jobs = job_queue.claim_batch(REPORT_JOB, batch_size)
+        if not jobs:
+            time.sleep(IDLE_SLEEP_SECONDS)
+            continue
+        process_batch(db, jobs)
+
+def start_worker_pool(num_workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+    """Starts daemon report processes and returns them."""
+    context = multiprocessing.get_context("spawn")  # firebase/grpc clients are not fork-safe
+    processes = []
+    for _ in range(num_workers):
+        process = context.Process(target=worker_loop, args=(batch_size, job_queue.QUEUE_PATH), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+@st.cache_resource
+def ensure_report_workers():
+    """Starts the report worker pool once per server process, unless an external pool is configured."""
+    if os.environ.get("REPORT_WORKERS_EXTERNAL"):
+        return []
+    return start_worker_pool(int(os.environ.get("REPORT_WORKERS", DEFAULT_WORKERS)))
+
+# === UI ===
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _zip(jobs):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for job in jobs:
+            archive.write(job["result"]["path"], job["result"]["file_name"])
+    return buffer.getvalue()
+
+@st.fragment(run_every=PANEL_REFRESH_SECONDS)
+def report_jobs_panel(owner):
+    """Lists the owner's report requests with their progress and download buttons."""
+    batches = {}
+    for job in job_queue.get_owner_jobs(owner, REPORT_JOB):
+        batches.setdefault(job["payload"]["Batch"], []).append(job)
+    for batch_id, jobs in list(batches.items())[:BATCHES_SHOWN]:
+        payload = jobs[0]["payload"]
+        finished = [job for job in jobs if job["status"] == job_queue.DONE]
+        failed = [job for job in jobs if job["status"] == job_queue.FAILED]
+        ext = payload["Format"]
+        if len(jobs) > 1:
+            label = f"Class {payload['Class']}: class summary and {len(jobs) - 1} student reports"
+        elif payload.get("Student"):
+            label = f"Class {payload['Class']}: {(jobs[0]['result'] or {}).get('student_name') or payload['Student']}"
+        else:
+            label = f"Class {payload['Class']}: class summary"
+        st.markdown(f"**{label}** ({ext.upper()}, {_term_label((payload.get('Term_From'), payload.get('Term_To')))})")
+        col_status, col_download, col_clear = st.columns([3, 2, 1])
+        if len(finished) + len(failed) < len(jobs):
+            col_status.progress(len(finished) / len(jobs), text=f"{len(finished)} of {len(jobs)} ready")
+        elif failed:
+            col_status.error(f"{len(failed)} report(s) failed: {failed[0]['error']}")
+        else:
+            cached = sum(1 for job in finished if job["result"].get("cached"))
+            col_status.success(f"{len(finished)} ready" + (f" ({cached} unchanged, served from cache)" if cached else ""))
+        if len(finished) == 1 and len(jobs) == 1:
+            result = finished[0]["result"]
+            col_download.download_button("⬇️ Download", data=lambda path=result["path"]: _read(path), file_name=result["file_name"],
+                                         mime=MIME_TYPES[ext], key=f"report_{batch_id}", on_click="ignore")
+        elif finished and len(finished) + len(failed) == len(jobs):
+            col_download.download_button("⬇️ Download all (zip)", data=lambda done=finished: _zip(done),
+                                         file_name=f"Progress_Reports_{_safe(payload['Class'])}.zip", mime="application/zip",
+                                         key=f"report_{batch_id}", on_click="ignore")
+        if col_clear.button("Clear", key=f"clear_report_{batch_id}"):
+            for job in jobs:
+                job_queue.acknowledge(job["id"])
+            st.rerun(scope="fragment")
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Run report workers, or render one progress report directly.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--render", action="store_true", help="Render one report now instead of running workers")
+    parser.add_argument("--class", dest="class_name", help="Class of the report, e.g. 8th")
+    parser.add_argument("--student", help="Only this student's report (Gmail ID); the class summary otherwise")
+    parser.add_argument("--format", choices=list(FORMATS.values()), default="pdf")
+    parser.add_argument("--from", dest="term_from", help=f"First date of the term ({DATE_FORMAT.replace('%', '')})")
+    parser.add_argument("--to", dest="term_to", help="Last date of the term")
+    args = parser.parse_args()
+
+    if args.render:
+        if not args.class_name:
+            parser.error("--render needs --class")
+        from firestore_client import connect_to_firestore
+        db = connect_to_firestore()
+        if db is None:
+            return 1
+        data = load_class_data(db, args.class_name, args.term_from, args.term_to)
+        job = {"id": 0, "payload": {"Format": args.format, "Student": args.student}}
+        result = render_reports(db, db.tenant_id, data, [job])[0]
+        if isinstance(result, Exception):
+            print(f"Could not render the report: {result}")
+            return 1
+        print(f"{'Cached' if result['cached'] else 'Wrote'} {result['path']}")
+        return 0
+
+    processes = start_worker_pool(args.workers, args.batch_size)
+    print(f"Started {len(processes)} report workers on {job_queue.QUEUE_PATH}.")
+    try:
+        while True:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    processes[i] = start_worker_pool(1, args.batch_size)[0]
+            time.sleep(5)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Daily, weekly and monthly rollups of school activity per class, subject and teacher.
+
+Each bucket is one document in the 'rollups' collection (ids like day_2025-07-14,
+week_2025-W29, month_2025-07) with a map per dimension:
+    {"Classes": {"8th": {...}}, "Subjects": {"Math": {...}}, "Teachers": {"RK": {...}}}
+and these counters per entry:
+    Submissions, Passed, Marks_Total, Due_Known, On_Time, Questions_Created
+
+Writers add to the buckets with Increment in the same batched commit as their own write:
+the grading worker per graded micro-batch (one update per bucket, not per answer) and the
+Teacher dashboard when homework is posted. Trend charts then read one document per bucket,
+so twelve weeks of history cost twelve reads however many answers they contain.
+
+Backfill (or repair) every bucket from the collections, e.g. after a bulk homework import:
+    python rollups.py --backfill
+Run it when few answers are being graded: it replaces the buckets it rebuilds.
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta, timezone
+import pandas as pd
+import streamlit as st
+from firebase_admin import firestore
+from firestore_client import UPDATED_AT_FIELD, commit_in_batches, stamp_update
+from tenancy import TENANT_HASH_FUNCS
+
+# === CONFIGURATION ===
+ROLLUPS_COLLECTION = "rollups"
+DATE_FORMAT = "%d-%m-%Y"
+PERIODS = ["day", "week", "month"]
+DIMENSIONS = {"Classes": "Class", "Subjects": "Subject", "Teachers": "Teacher"}
+COUNTERS = ["Submissions", "Passed", "Marks_Total", "Due_Known", "On_Time", "Questions_Created"]
+SUBMISSION_COLLECTIONS = ["answer_bank", "answers", "answers_archive"]  # every graded attempt, passed or not
+
+# === BUCKETS ===
+
+def bucket_id(period, day):
+    """Returns the rollup document id of the bucket containing `day`."""
+    if period == "day":
+        return f"day_{day.isoformat()}"
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"week_{year}-W{week:02d}"
+    return f"month_{day.year}-{day.month:02d}"
+
+def bucket_start(period, day):
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def recent_bucket_ids(period, count, until=None):
+    """Returns the ids of the last `count` buckets of a period, oldest first."""
+    day = bucket_start(period, until or date.today())
+    starts = []
+    for _ in range(count):
+        starts.append(day)
+        day = bucket_start(period, day - timedelta(days=1))
+    return [(bucket_id(period, start), start) for start in reversed(starts)]
+
+def parse_date(value):
+    """Parses a dd-mm-YYYY string (or passes a date/datetime through); None if it is not a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+# === ACCUMULATING ===
+
+class RollupBatch:
+    """Accumulates counter increments for several buckets and writes them as one update per bucket."""
+
+    def __init__(self):
+        self.buckets = {}  # bucket id -> {"Period", "Start", dimension -> {name -> {counter -> amount}}}
+
+    def add(self, day, dimensions, **amounts):
+        """Adds counters for one event on `day` under each (dimension -> name) it belongs to."""
+        day = parse_date(day)
+        if day is None:
+            return
+        for period in PERIODS:
+            bucket = self.buckets.setdefault(bucket_id(period, day), {"Period": period, "Start": bucket_start(period, day).isoformat()})
+            for dimension, name in dimensions.items():
+                if not name:
+                    continue
+                counters = bucket.setdefault(dimension, {}).setdefault(str(name), {})
+                for counter, amount in amounts.items():
+                    if amount:
+                        counters[counter] = counters.get(counter, 0) + amount
+
+    def add_submission(self, submitted_on, class_name, subject, teacher, marks, due_date=None):
+        """Adds one graded attempt; `marks` is None for an attempt that did not pass."""
+        due = parse_date(due_date)
+        submitted = parse_date(submitted_on)
+        self.add(submitted, {"Classes": class_name, "Subjects": subject, "Teachers": teacher},
+                 Submissions=1, Passed=1 if marks is not None else 0, Marks_Total=marks or 0,
+                 Due_Known=1 if due else 0, On_Time=1 if due and submitted and submitted <= due else 0)
+
+    def add_questions(self, created_on, class_name, subject, teacher, count):
+        self.add(created_on, {"Classes": class_name, "Subjects": subject, "Teachers": teacher}, Questions_Created=count)
+
+    def write(self, db, batch):
+        """Adds one merged Increment update per touched bucket to `batch`."""
+        for doc_id, bucket in self.buckets.items():
+            data = {"Period": bucket["Period"], "Start": bucket["Start"]}
+            for dimension in DIMENSIONS:
+                if dimension in bucket:
+                    data[dimension] = {name: {counter: firestore.Increment(amount) for counter, amount in counters.items()}
+                                       for name, counters in bucket[dimension].items()}
+            batch.set(db.collection(ROLLUPS_COLLECTION).document(doc_id), stamp_update(data), merge=True)
+
+def utc_today():
+    """The day a live submission is bucketed under: the UTC date, as backfill() reads it from Updated_At."""
+    return datetime.now(timezone.utc).date()
+
+# === BACKFILL ===
+
+def _submitted_on(data):
+    stamp = data.get(UPDATED_AT_FIELD)
+    if hasattr(stamp, "astimezone"):
+        return stamp.astimezone(timezone.utc).date()
+    return parse_date(data.get("Date"))  # answers written before stamps existed: use the homework date
+
+def backfill(db):
+    """Recomputes every bucket from homework and all graded attempts; returns how many buckets were written."""
+    rollup = RollupBatch()
+    homework_info = {}  # (Class, Date, Question) -> (teacher, due date)
+    for doc in db.collection("homework").select(["Class", "Subject", "Uploaded_By", "Date", "Due_Date", "Question"]).stream():
+        data = doc.to_dict() or {}
+        homework_info[(data.get("Class"), data.get("Date"), data.get("Question"))] = (data.get("Uploaded_By"), data.get("Due_Date"))
+        rollup.add_questions(data.get("Date"), data.get("Class"), data.get("Subject"), data.get("Uploaded_By"), 1)
+    fields = ["Class", "Subject", "Date", "Question", "Marks", UPDATED_AT_FIELD]
+    for collection_name in SUBMISSION_COLLECTIONS:
+        for doc in db.collection(collection_name).select(fields).stream():
+            data = doc.to_dict() or {}
+            teacher, due_date = homework_info.get((data.get("Class"), data.get("Date"), data.get("Question")), (None, None))
+            marks = data.get("Marks") if isinstance(data.get("Marks"), (int, float)) else None
+            rollup.add_submission(_submitted_on(data), data.get("Class"), data.get("Subject"), teacher, marks, due_date)
+    rollups_ref = db.collection(ROLLUPS_COLLECTION)
+    return commit_in_batches(db, ((rollups_ref.document(doc_id), stamp_update(bucket)) for doc_id, bucket in rollup.buckets.items()))
+
+# === READING ===
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs=TENANT_HASH_FUNCS)
+def load_trend(db, period, count):
+    """Returns one row per (bucket, dimension, name) for the last `count` buckets of a period.
+
+    Columns: Start, Dimension, Name, the raw counters, Average_Marks and On_Time_Rate (%).
+    """
+    bucket_ids = recent_bucket_ids(period, count)
+    refs = [db.collection(ROLLUPS_COLLECTION).document(doc_id) for doc_id, _ in bucket_ids]
+    snapshots = {snapshot.id: snapshot.to_dict() or {} for snapshot in db.get_all(refs) if snapshot.exists}
+    rows = []
+    for doc_id, start in bucket_ids:
+        bucket = snapshots.get(doc_id, {})
+        for dimension in DIMENSIONS:
+            for name, counters in (bucket.get(dimension) or {}).items():
+                rows.append({"Start": pd.Timestamp(start), "Dimension": DIMENSIONS[dimension], "Name": name,
+                             **{counter: counters.get(counter, 0) for counter in COUNTERS}})
+    df = pd.DataFrame(rows, columns=["Start", "Dimension", "Name"] + COUNTERS)
+    df["Average_Marks"] = (df["Marks_Total"] / df["Passed"].where(df["Passed"] > 0)).round(2)
+    df["On_Time_Rate"] = (df["On_Time"] / df["Due_Known"].where(df["Due_Known"] > 0) * 100).round(1)
+    return df
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily/weekly/monthly activity rollups.")
+    parser.add_argument("--backfill", action="store_true", required=True, help="Recompute every bucket from the collections")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    print(f"Wrote {backfill(db)} rollup buckets.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
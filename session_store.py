@@ -0,0 +1,169 @@
+"""Bounded, namespaced page state kept in st.session_state.
+
+Pages keep their per-item state (e.g. the answer flow of each pending question) in a
+PageState namespace instead of loose session keys. A namespace is an LRU map capped at
+`max_entries`; entries untouched for `stale_seconds` are dropped, and retain() drops the
+entries of items that are no longer active (answered questions, finished homework drafts),
+so a session's state stays proportional to the work on screen rather than to how long the
+session has been open.
+
+Namespace writes only mark the session's footprint as stale; it is measured (which pickles
+the session state) when a page next opens a namespace, so about once per rerun rather than
+once per write, and kept in a process-wide registry that the Admin panel reads through
+session_footprints().
+"""
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# === CONFIGURATION ===
+MAX_ENTRIES_PER_NAMESPACE = 50
+STALE_SECONDS = 2 * 3600
+FOOTPRINT_TTL_SECONDS = 3600  # sessions that have not written state for this long drop out of the report
+NAMESPACE_PREFIX = "_page_state:"
+
+# session id -> {"user": str, "footprint": session_footprint() frame, "updated_at": float}
+_footprints = {}
+_footprints_lock = threading.Lock()
+# ids of the sessions whose state changed since their footprint was last measured
+_dirty_sessions = set()
+
+# === SIZING ===
+
+def estimate_size(value):
+    """Approximate memory of a session value in bytes (pickled size, or shallow size if unpicklable)."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+# === PAGE STATE ===
+
+class PageState:
+    """An LRU- and age-bounded map of one page's state inside st.session_state."""
+
+    def __init__(self, namespace, max_entries=MAX_ENTRIES_PER_NAMESPACE, stale_seconds=STALE_SECONDS):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.session_key = NAMESPACE_PREFIX + namespace
+        if self.session_key not in st.session_state:
+            st.session_state[self.session_key] = OrderedDict()  # key -> (last used, value)
+        self._evict_stale()
+        record_footprint()
+
+    @property
+    def entries(self):
+        return st.session_state[self.session_key]
+
+    def get(self, key, default=None):
+        """Returns an entry's value (marking it recently used), or `default`."""
+        if key not in self.entries:
+            return default
+        value = self.entries[key][1]
+        self.entries[key] = (time.time(), value)
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Stores an entry, evicting the least recently used ones beyond the cap."""
+        self.entries[key] = (time.time(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        mark_footprint_dirty()
+
+    def setdefault(self, key, default):
+        if key not in self.entries:
+            self.set(key, default)
+        return self.get(key)
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            mark_footprint_dirty()
+        return entry[1] if entry is not None else default
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def retain(self, active_keys):
+        """Drops every entry whose key is not in `active_keys` (e.g. answered questions)."""
+        active_keys = set(active_keys)
+        dropped = [key for key in self.entries if key not in active_keys]
+        for key in dropped:
+            del self.entries[key]
+        if dropped:
+            mark_footprint_dirty()
+
+    def clear(self):
+        self.entries.clear()
+        mark_footprint_dirty()
+
+    def _evict_stale(self):
+        cutoff = time.time() - self.stale_seconds
+        stale = [key for key, (used_at, _) in self.entries.items() if used_at < cutoff]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            mark_footprint_dirty()
+
+# === FOOTPRINT ===
+
+def session_footprint():
+    """Returns this session's state per namespace (plus unmanaged keys) with entry counts and sizes."""
+    rows = []
+    unmanaged_bytes, unmanaged_keys = 0, 0
+    for key in list(st.session_state.keys()):
+        value = st.session_state[key]
+        if isinstance(key, str) and key.startswith(NAMESPACE_PREFIX):
+            rows.append({"Namespace": key[len(NAMESPACE_PREFIX):], "Entries": len(value), "Size (KB)": round(estimate_size(value) / 1024, 2)})
+        else:
+            unmanaged_keys += 1
+            unmanaged_bytes += estimate_size(value)
+    rows.append({"Namespace": "(other keys)", "Entries": unmanaged_keys, "Size (KB)": round(unmanaged_bytes / 1024, 2)})
+    return pd.DataFrame(rows)
+
+def mark_footprint_dirty():
+    """Notes that this session's state changed; cheap enough to call on every write."""
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        with _footprints_lock:
+            _dirty_sessions.add(ctx.session_id)
+
+def record_footprint():
+    """Measures this session's footprint into the registry read by the Admin panel, if its state changed."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    with _footprints_lock:
+        if ctx.session_id not in _dirty_sessions:
+            return
+        _dirty_sessions.discard(ctx.session_id)
+    footprint = session_footprint()
+    now = time.time()
+    with _footprints_lock:
+        _footprints[ctx.session_id] = {"user": st.session_state.get("user_gmail", ""), "footprint": footprint, "updated_at": now}
+        for session_id in [sid for sid, entry in _footprints.items() if now - entry["updated_at"] > FOOTPRINT_TTL_SECONDS]:
+            del _footprints[session_id]
+
+def session_footprints():
+    """Returns one row per recently active session of this process: user, managed entries and total size."""
+    with _footprints_lock:
+        entries = list(_footprints.items())
+    rows = []
+    for session_id, entry in entries:
+        footprint = entry["footprint"]
+        managed = footprint[footprint["Namespace"] != "(other keys)"]
+        rows.append({
+            "Session": session_id[:8], "User": entry["user"],
+            "Namespaces": len(managed), "Managed Entries": int(managed["Entries"].sum()),
+            "Total Size (KB)": round(float(footprint["Size (KB)"].sum()), 2),
+            "Last Write": time.strftime("%H:%M:%S", time.localtime(entry["updated_at"])),
+        })
+    return pd.DataFrame(rows, columns=["Session", "User", "Namespaces", "Managed Entries", "Total Size (KB)", "Last Write"])
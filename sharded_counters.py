@@ -0,0 +1,175 @@
+"""Sharded counters for hot numeric fields such as a teacher's Salary_Points.
+
+A single Firestore document sustains roughly one write per second. Instead of incrementing
+the field on the parent document, each increment goes to one of NUM_SHARDS shard documents
+in the parent's "counter_shards" subcollection. The true value is the parent's field plus
+the sum of its shards; the consolidation job periodically folds shards back into the parent.
+Dashboards read the parent values and the shards at one shared read time and cache them
+together, so a fold running meanwhile is never half seen.
+
+Shards carry the centre of their parent document (tenancy.TENANT_FIELD), so a centre's
+dashboards only read that centre's shards. The consolidation job folds every centre's shards.
+
+Consolidate with:
+    python sharded_counters.py --consolidate              # once
+    python sharded_counters.py --consolidate --every 3600  # hourly
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import streamlit as st
+from firebase_admin import firestore
+from firestore_client import stamp_update
+from tenancy import TENANT_FIELD, TENANT_HASH_FUNCS, tenant_of_path
+
+# === CONFIGURATION ===
+NUM_SHARDS = 10
+SHARDS_SUBCOLLECTION = "counter_shards"
+CLASS_STATS_COLLECTION = "class_stats"
+CLASS_STAT_FIELDS = ["Homework_Posted", "Submissions", "Graded_Submissions", "Marks_Total"]
+READ_TIME_LAG_SECONDS = 1  # point-in-time reads must not ask for the future
+
+# === WRITING ===
+
+def increment_counter(doc_ref, field, amount, batch=None):
+    """Adds `amount` to a sharded counter on `doc_ref` (inside `batch` if one is given)."""
+    shard_ref = doc_ref.collection(SHARDS_SUBCOLLECTION).document(f"{field}_{random.randrange(NUM_SHARDS)}")
+    shard_data = {"Collection": doc_ref.parent.id, "Field": field, TENANT_FIELD: tenant_of_path(doc_ref.path),
+                  "Count": firestore.Increment(amount)}
+    if batch is not None:
+        batch.set(shard_ref, shard_data, merge=True)
+    else:
+        shard_ref.set(shard_data, merge=True)
+
+def increment_class_stats(db, class_name, batch=None, **amounts):
+    """Increments class-level counters, e.g. increment_class_stats(db, '8th', Submissions=1)."""
+    if not class_name:
+        return
+    class_ref = db.collection(CLASS_STATS_COLLECTION).document(str(class_name))
+    for field, amount in amounts.items():
+        if amount:
+            increment_counter(class_ref, field, amount, batch)
+
+# === READING ===
+
+def get_counter(doc_ref, field):
+    """Reads one counter: the parent's consolidated value plus its unconsolidated shards."""
+    snapshot = doc_ref.get()
+    total = _as_number((snapshot.to_dict() or {}).get(field)) if snapshot.exists else 0
+    for shard in doc_ref.collection(SHARDS_SUBCOLLECTION).where("Field", "==", field).stream():
+        total += _as_number((shard.to_dict() or {}).get("Count"))
+    return total
+
+def _read_time():
+    """One instant at which to read both parents and shards.
+
+    Consolidation folds shards into their parent and deletes them in one transaction; reading
+    both sides at the same instant sees each fold entirely or not at all, so no shard is
+    dropped or counted twice.
+    """
+    return datetime.now(timezone.utc) - timedelta(seconds=READ_TIME_LAG_SECONDS)
+
+def _shard_totals(db, read_time):
+    """Sums the centre's unconsolidated shards, keyed by (parent collection, parent doc id, field)."""
+    totals = {}
+    for shard in db.collection_group(SHARDS_SUBCOLLECTION).stream(read_time=read_time):
+        data = shard.to_dict() or {}
+        parent = shard.reference.parent.parent
+        key = (parent.parent.id, parent.id, data.get("Field"))
+        totals[key] = totals.get(key, 0) + _as_number(data.get("Count"))
+    return totals
+
+@st.cache_data(ttl=30, hash_funcs=TENANT_HASH_FUNCS)
+def load_counter_values(db, collection_name, field):
+    """Returns {doc id: consolidated value + unconsolidated shards} of one counter field of a collection."""
+    read_time = _read_time()
+    values = {doc.id: _as_number((doc.to_dict() or {}).get(field))
+              for doc in db.collection(collection_name).select([field]).stream(read_time=read_time)}
+    for (parent_collection, doc_id, shard_field), count in _shard_totals(db, read_time).items():
+        if parent_collection == collection_name and shard_field == field:
+            values[doc_id] = values.get(doc_id, 0) + count
+    return values
+
+def with_counter_totals(df, field, counter_values):
+    """Returns a copy of `df` whose `field` column holds the counter values from load_counter_values().
+
+    Documents the values do not know yet (created after they were read) keep the frame's value.
+    """
+    df = df.copy()
+    base = pd.to_numeric(df[field], errors="coerce").fillna(0) if field in df.columns else pd.Series(0, index=df.index)
+    df[field] = df["doc_id"].map(counter_values).fillna(base) if "doc_id" in df.columns else base
+    return df
+
+@st.cache_data(ttl=30, hash_funcs=TENANT_HASH_FUNCS)
+def load_class_stats(db):
+    """Returns one row per class with its counters and the derived average marks."""
+    read_time = _read_time()
+    shard_totals = _shard_totals(db, read_time)
+    rows = {}
+    for doc in db.collection(CLASS_STATS_COLLECTION).stream(read_time=read_time):
+        rows[doc.id] = {field: _as_number((doc.to_dict() or {}).get(field)) for field in CLASS_STAT_FIELDS}
+    for (collection_name, doc_id, field), count in shard_totals.items():
+        if collection_name == CLASS_STATS_COLLECTION and field in CLASS_STAT_FIELDS:
+            rows.setdefault(doc_id, {f: 0 for f in CLASS_STAT_FIELDS})[field] += count
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame.from_dict(rows, orient="index").rename_axis("Class").reset_index()
+    graded = df["Graded_Submissions"].where(df["Graded_Submissions"] > 0)
+    df["Average_Marks"] = (df["Marks_Total"] / graded).round(2).fillna(0)
+    return df.sort_values("Class")
+
+def _as_number(value):
+    try:
+        return float(value) if value not in (None, "") else 0
+    except (TypeError, ValueError):
+        return 0
+
+# === CONSOLIDATION ===
+
+def consolidate(db):
+    """Folds every shard into its parent document's field and deletes the shard; returns parents updated."""
+    shards_by_parent = {}
+    for shard in db.collection_group(SHARDS_SUBCOLLECTION).stream():
+        shards_by_parent.setdefault(shard.reference.parent.parent.path, []).append(shard.reference)
+
+    @firestore.transactional
+    def fold(transaction, parent_ref, shard_refs):
+        totals = {}
+        for shard in transaction.get_all(shard_refs):
+            if shard.exists:
+                data = shard.to_dict() or {}
+                totals[data.get("Field")] = totals.get(data.get("Field"), 0) + _as_number(data.get("Count"))
+        if totals:
+            transaction.set(parent_ref, stamp_update({field: firestore.Increment(total) for field, total in totals.items() if field}), merge=True)
+        for shard_ref in shard_refs:
+            transaction.delete(shard_ref)
+
+    for parent_path, shard_refs in shards_by_parent.items():
+        fold(db.transaction(), db.document(parent_path), shard_refs)
+    return len(shards_by_parent)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold sharded counters back into their parent documents.")
+    parser.add_argument("--consolidate", action="store_true")
+    parser.add_argument("--every", type=int, default=0, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+    if not args.consolidate:
+        parser.print_help()
+        return 0
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    while True:
+        # The unscoped client sees the shards of every centre (and those written before centres had a Tenant field).
+        print(f"Consolidated counters on {consolidate(db.client)} documents.")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Disk-persisted collection snapshots for the data layer, backed by SQLite.
+
+Every full-collection load is also written here, one row per document, together with the
+newest Updated_At stamp seen. After a restart the first load of a collection is served from
+the snapshot immediately while a background thread fetches only the documents changed since
+then; later loads in the same process refresh the snapshot with the same delta query before
+returning. Deleted documents carry no stamp, so a snapshot is rebuilt from a full scan once
+it is older than FULL_REFRESH_SECONDS.
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+# === CONFIGURATION ===
+SNAPSHOT_CACHE_PATH = os.environ.get("SNAPSHOT_CACHE_PATH", os.path.join("cache", "snapshots.db"))
+FULL_REFRESH_SECONDS = 6 * 3600
+CLOCK_SKEW_SECONDS = 5  # re-read this much before the newest stamp; upserts make the overlap harmless
+READ_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    newest_update REAL NOT NULL DEFAULT 0,
+    full_sync_at REAL NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (key, doc_id)
+);
+"""
+
+# === CONNECTION ===
+
+def _connect(path=None):
+    """Opens the snapshot database in WAL mode so page loads never block a refresh."""
+    path = path or SNAPSHOT_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+def snapshot_key(collection_name, fields):
+    """Identifies one (collection, projection) snapshot."""
+    return json.dumps([collection_name, list(fields) if fields is not None else None])
+
+# === READING ===
+
+def get_snapshot(key, path=None):
+    """Returns a snapshot's metadata (newest_update, full_sync_at, synced_at), or None if there is none."""
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT * FROM snapshots WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def iter_record_chunks(key, chunk_size=READ_CHUNK_SIZE, path=None):
+    """Yields the snapshot's documents as lists of record dicts (each with its 'doc_id')."""
+    conn = _connect(path)
+    try:
+        cursor = conn.execute("SELECT doc_id, data FROM documents WHERE key = ? ORDER BY doc_id", (key,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [{**json.loads(row["data"]), "doc_id": row["doc_id"]} for row in rows]
+    finally:
+        conn.close()
+
+# === WRITING ===
+
+STAGING_SEPARATOR = "#pending:"
+
+def start_full_sync(key, path=None):
+    """Opens a staging area of its own for one full scan and returns its id; readers keep seeing the old snapshot.
+
+    Each scan stages under its own id, so scans of the same key that overlap (a background and a
+    foreground refresh, or two server processes) never clear or swap in each other's rows. Staging
+    areas left by scans that died more than FULL_REFRESH_SECONDS ago are removed here.
+    """
+    prefix = key + STAGING_SEPARATOR
+    conn = _connect(path)
+    try:
+        for row in conn.execute("SELECT DISTINCT key FROM documents WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")).fetchall():
+            started = float(row["key"][len(prefix):].split("/")[0] or 0)
+            if time.time() - started > FULL_REFRESH_SECONDS:
+                conn.execute("DELETE FROM documents WHERE key = ?", (row["key"],))
+    finally:
+        conn.close()
+    return f"{prefix}{time.time():.6f}/{uuid.uuid4().hex[:8]}"
+
+def stage_records(staging_id, records, path=None):
+    """Adds one chunk of a running full scan to its staging area."""
+    upsert_records(staging_id, records, path)
+
+def discard_full_sync(staging_id, path=None):
+    """Drops the staged rows of a scan that failed."""
+    conn = _connect(path)
+    try:
+        conn.execute("DELETE FROM documents WHERE key = ?", (staging_id,))
+    finally:
+        conn.close()
+
+def finish_full_sync(key, staging_id, collection_name, newest_update, path=None):
+    """Swaps a scan's staged documents in for the snapshot in one transaction."""
+    now = time.time()
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM documents WHERE key = ?", (key,))
+        conn.execute("UPDATE documents SET key = ? WHERE key = ?", (key, staging_id))
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshots (key, collection, newest_update, full_sync_at, synced_at) VALUES (?, ?, ?, ?, ?)",
+            (key, collection_name, newest_update, now, now)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def upsert_records(key, records, path=None):
+    """Stores (or replaces) documents of a snapshot; records carry their 'doc_id'."""
+    if not records:
+        return
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR REPLACE INTO documents (key, doc_id, data) VALUES (?, ?, ?)",
+            [(key, record["doc_id"], json.dumps({k: v for k, v in record.items() if k != "doc_id"}, default=str))
+             for record in records]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def mark_synced(key, newest_update, path=None):
+    """Records a finished delta refresh of a snapshot."""
+    conn = _connect(path)
+    try:
+        conn.execute("UPDATE snapshots SET newest_update = MAX(newest_update, ?), synced_at = ? WHERE key = ?",
+                     (newest_update, time.time(), key))
+    finally:
+        conn.close()
+
+def clear(path=None):
+    """Deletes every snapshot, e.g. after a bulk change made outside the app."""
+    conn = _connect(path)
+    try:
+        conn.execute("DELETE FROM documents")
+        conn.execute("DELETE FROM snapshots")
+    finally:
+        conn.close()
@@ -0,0 +1,167 @@
+"""Precomputed per-student dashboard summaries in the 'student_summaries' collection.
+
+One document per student (id = Gmail ID) holds what the top of the Student dashboard shows:
+homework assigned to the student's class, homework completed, graded count and marks total,
+per-subject marks totals and the last RECENT_POINTS graded answers for the growth chart.
+
+The summaries are kept current incrementally:
+    - posting homework increments Assigned on every student of the class (record_homework_posted)
+    - a bulk homework import recounts Assigned for the imported classes (refresh_assigned)
+    - the grading worker adds each passed answer to the student's summary in the same batched
+      commit as the answer itself (add_graded_answer)
+A summary that is missing or was built for another class is rebuilt from the collections the
+first time the student opens the dashboard. Rebuild every summary with:
+    python student_summary.py --rebuild
+    python student_summary.py --rebuild --student someone@gmail.com
+"""
+import argparse
+import sys
+from collections import Counter
+from datetime import datetime
+import streamlit as st
+from firebase_admin import firestore
+from firestore_client import UPDATED_AT_FIELD, commit_in_batches, stamp_update
+from tenancy import TENANT_HASH_FUNCS
+
+# === CONFIGURATION ===
+SUMMARIES_COLLECTION = "student_summaries"
+RECENT_POINTS = 30  # graded answers kept for the growth chart
+DATE_FORMAT = "%d-%m-%Y"
+
+# === WRITING ===
+
+def summary_ref(db, student_gmail):
+    return db.collection(SUMMARIES_COLLECTION).document(str(student_gmail))
+
+def _class_students(db, class_name):
+    query = db.collection("users").where("Role", "==", "Student").where("Class", "==", class_name).select(["Gmail_ID"])
+    return [gmail for gmail in ((doc.to_dict() or {}).get("Gmail_ID") for doc in query.stream()) if gmail]
+
+def record_homework_posted(db, class_name, count):
+    """Adds `count` newly posted questions to the Assigned total of every student in the class."""
+    if not class_name or not count:
+        return 0
+    return commit_in_batches(db, ((summary_ref(db, gmail), stamp_update({"Assigned": firestore.Increment(count)}))
+                                  for gmail in _class_students(db, class_name)), merge=True)
+
+def refresh_assigned(db, class_names):
+    """Recounts the homework of each class and stores it as Assigned on its students (idempotent)."""
+    written = 0
+    for class_name in class_names:
+        assigned = sum(1 for _ in db.collection("homework").where("Class", "==", class_name).select(["Class"]).stream())
+        written += commit_in_batches(db, ((summary_ref(db, gmail), stamp_update({"Class": class_name, "Assigned": assigned}))
+                                          for gmail in _class_students(db, class_name)), merge=True)
+    return written
+
+def add_graded_answer(db, batch, answer_id, answer_doc):
+    """Adds a passed answer to its student's summary, as part of the grading worker's batch."""
+    marks = answer_doc.get("Marks")
+    if marks is None or not answer_doc.get("Student_Gmail"):
+        return
+    subject = str(answer_doc.get("Subject") or "Other")
+    batch.set(summary_ref(db, answer_doc["Student_Gmail"]), stamp_update({
+        "Completed": firestore.Increment(1), "Graded": firestore.Increment(1), "Marks_Total": firestore.Increment(marks),
+        "Subjects": {subject: {"Marks_Total": firestore.Increment(marks), "Graded": firestore.Increment(1)}},
+        # Trimmed back to RECENT_POINTS by the dashboard when it grows past twice that.
+        "Recent_Grades": firestore.ArrayUnion([{"Id": answer_id, "Date": answer_doc.get("Date"), "Subject": subject, "Marks": marks}]),
+    }), merge=True)
+
+# === BUILDING ===
+
+def build_summary(class_name, assigned, bank_records):
+    """Computes a summary document from a student's answer_bank records (oldest first)."""
+    graded = [record for record in bank_records if isinstance(record.get("Marks"), (int, float))]
+    subjects = {}
+    for record in graded:
+        totals = subjects.setdefault(str(record.get("Subject") or "Other"), {"Marks_Total": 0, "Graded": 0})
+        totals["Marks_Total"] += record["Marks"]
+        totals["Graded"] += 1
+    return {
+        "Class": class_name, "Assigned": assigned, "Completed": len(bank_records), "Graded": len(graded),
+        "Marks_Total": sum(record["Marks"] for record in graded), "Subjects": subjects,
+        "Recent_Grades": [{"Id": record.get("doc_id"), "Date": record.get("Date"), "Subject": str(record.get("Subject") or "Other"),
+                           "Marks": record["Marks"]} for record in graded[-RECENT_POINTS:]],
+    }
+
+def _written_at(record):
+    stamp = record.get(UPDATED_AT_FIELD)
+    return stamp.timestamp() if hasattr(stamp, "timestamp") else 0.0
+
+def rebuild_summaries(db, student_gmail=None):
+    """Recomputes summaries from users, homework and answer_bank; returns how many were written."""
+    students = db.collection("users").where("Role", "==", "Student")
+    if student_gmail:
+        students = students.where("Gmail_ID", "==", student_gmail)
+    class_by_student = {data.get("Gmail_ID"): data.get("Class") for data in
+                        (doc.to_dict() or {} for doc in students.select(["Gmail_ID", "Class"]).stream()) if data.get("Gmail_ID")}
+    homework = db.collection("homework")
+    if student_gmail and class_by_student:
+        homework = homework.where("Class", "==", class_by_student[student_gmail])
+    assigned = Counter((doc.to_dict() or {}).get("Class") for doc in homework.select(["Class"]).stream())
+    answers = db.collection("answer_bank")
+    if student_gmail:
+        answers = answers.where("Student_Gmail", "==", student_gmail)
+    records = {}
+    for doc in answers.select(["Student_Gmail", "Subject", "Date", "Marks", UPDATED_AT_FIELD]).stream():
+        data = doc.to_dict() or {}
+        if data.get("Student_Gmail") in class_by_student:
+            records.setdefault(data["Student_Gmail"], []).append({**data, "doc_id": doc.id})
+    return commit_in_batches(db, (
+        (summary_ref(db, gmail), stamp_update({**build_summary(class_name, assigned.get(class_name, 0),
+                                                               sorted(records.get(gmail, []), key=_written_at)),
+                                               "Rebuilt_At": firestore.SERVER_TIMESTAMP}))
+        for gmail, class_name in class_by_student.items()
+    ))
+
+# === READING ===
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs=TENANT_HASH_FUNCS)
+def load_student_summary(db, student_gmail, class_name):
+    """Reads a student's summary (one document), rebuilding it first if it is missing or stale."""
+    ref = summary_ref(db, student_gmail)
+    snapshot = ref.get()
+    summary = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    # Incremental updates can create a partial document before the first full build.
+    if "Rebuilt_At" not in summary or summary.get("Class") != class_name:
+        rebuild_summaries(db, student_gmail)
+        summary = ref.get().to_dict() or {}
+    recent = summary.get("Recent_Grades") or []
+    if len(recent) > 2 * RECENT_POINTS:
+        summary["Recent_Grades"] = recent[-RECENT_POINTS:]
+        ref.update({"Recent_Grades": summary["Recent_Grades"]})
+    return summary
+
+def growth_points(summary):
+    """Returns the summary's recent grades as (date, subject, marks) rows, oldest first."""
+    rows = []
+    for point in summary.get("Recent_Grades") or []:
+        try:
+            date = datetime.strptime(str(point.get("Date")), DATE_FORMAT)
+        except ValueError:
+            continue
+        rows.append({"Date": date, "Subject": point.get("Subject"), "Marks": point.get("Marks")})
+    return sorted(rows, key=lambda row: row["Date"])
+
+def subject_averages(summary):
+    """Returns {subject: average marks} from the summary's per-subject totals."""
+    return {subject: totals["Marks_Total"] / totals["Graded"]
+            for subject, totals in (summary.get("Subjects") or {}).items() if totals.get("Graded")}
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the per-student dashboard summaries.")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="Recompute summaries from the collections")
+    parser.add_argument("--student", help="Only rebuild this student's summary (Gmail ID)")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    written = rebuild_summaries(db, args.student)
+    print(f"Rebuilt {written} student summar{'y' if written == 1 else 'ies'}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
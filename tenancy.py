@@ -0,0 +1,273 @@
+"""Multi-centre tenancy: each tuition centre's data lives under its own collection path.
+
+The default centre (DEFAULT_TENANT, the original single-centre deployment) keeps its
+collections at the database root; every other centre's collections live under
+    centres/<centre id>/<collection>     e.g. centres/bhopal/users, centres/bhopal/homework
+TenantClient wraps the Firestore client so that code written against db.collection("users")
+or db.document("system_metrics/deletions") reads and writes the current centre's subtree.
+A query therefore only ever scans one centre's documents, and caches keyed by the centre
+(see data_layer) hold only that centre's frames.
+
+Collection-group queries (the counter shards) cannot be scoped by path, so they are filtered
+on the TENANT_FIELD the shards carry; Firestore needs a collection-group index on
+counter_shards.Tenant for that.
+
+The centre of a session is chosen at login (or fixed with ?centre=<id> in the URL) and kept
+in st.session_state; command-line tools use the centre in the CENTRE_ID environment
+variable, e.g. CENTRE_ID=bhopal python rollups.py --backfill.
+
+Every document a TenantClient reads is counted per centre (a query returning nothing is
+billed as one read) together with the time spent reading. The counts are flushed every
+READS_FLUSH_SECONDS to tenant_usage/<centre id> at the root, so usage and latency can be
+compared across centres:
+    python tenancy.py --list
+    python tenancy.py --create bhopal --name "PRK Home Tuition, Bhopal"
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# === CONFIGURATION ===
+DEFAULT_TENANT = os.environ.get("DEFAULT_CENTRE_ID", "main")
+DEFAULT_TENANT_NAME = "PRK Home Tuition"
+TENANTS_COLLECTION = "centres"
+TENANT_USAGE_COLLECTION = "tenant_usage"
+TENANT_FIELD = "Tenant"
+SESSION_KEY = "tenant_id"
+QUERY_PARAM = "centre"
+READS_FLUSH_SECONDS = 60
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{1,39}$")
+
+# Query methods that return another query (or reference) to be wrapped in turn.
+_CHAINED_METHODS = {"where", "select", "order_by", "limit", "limit_to_last", "offset", "start_at", "start_after",
+                    "end_at", "end_before", "collection", "document"}
+
+# tenant id -> {"Reads", "Queries", "Read_Seconds"} not yet flushed / since this process started
+_pending_usage = {}
+_process_usage = {}
+_usage_lock = threading.Lock()
+_last_flush = [time.time()]
+
+# === SCOPING ===
+
+def current_tenant():
+    """The centre of this session, or CENTRE_ID (default centre) outside a Streamlit session."""
+    if get_script_run_ctx() is not None:
+        tenant_id = st.session_state.get(SESSION_KEY)
+        if tenant_id:
+            return tenant_id
+    return os.environ.get("CENTRE_ID") or DEFAULT_TENANT
+
+def tenant_prefix(tenant_id):
+    """Path prefix of a centre's collections ('' for the default centre)."""
+    return "" if tenant_id in (None, "", DEFAULT_TENANT) else f"{TENANTS_COLLECTION}/{tenant_id}/"
+
+def tenant_of_path(path):
+    """Returns the centre a document path belongs to."""
+    parts = path.split("/")
+    return parts[1] if len(parts) > 2 and parts[0] == TENANTS_COLLECTION else DEFAULT_TENANT
+
+def scoped_name(collection_name, tenant_id):
+    """A collection's name qualified by its centre, for cache keys and version namespaces."""
+    return tenant_prefix(tenant_id) + collection_name
+
+# === CLIENT ===
+
+class _CountedQuery:
+    """Forwards to a Firestore query or collection reference, counting the documents it streams."""
+
+    def __init__(self, target, tenant):
+        self._target = target
+        self._tenant = tenant
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in _CHAINED_METHODS:
+            return lambda *args, **kwargs: _wrap(attr(*args, **kwargs), self._tenant)
+        return attr
+
+    def stream(self, *args, **kwargs):
+        started, count = time.monotonic(), 0
+        try:
+            for snapshot in self._target.stream(*args, **kwargs):
+                count += 1
+                yield snapshot
+        finally:
+            self._tenant.record_reads(max(count, 1), time.monotonic() - started)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+class _CountedDocument:
+    """Forwards to a Firestore document reference, counting its reads."""
+
+    def __init__(self, target, tenant):
+        self._target = target
+        self._tenant = tenant
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in _CHAINED_METHODS:
+            return lambda *args, **kwargs: _wrap(attr(*args, **kwargs), self._tenant)
+        return attr
+
+    def get(self, *args, **kwargs):
+        started = time.monotonic()
+        snapshot = self._target.get(*args, **kwargs)
+        self._tenant.record_reads(1, time.monotonic() - started)
+        return snapshot
+
+def _wrap(target, tenant):
+    return _CountedQuery(target, tenant) if hasattr(target, "stream") else _CountedDocument(target, tenant)
+
+def _unwrap(ref):
+    return getattr(ref, "_target", ref)
+
+class TenantClient:
+    """A Firestore client scoped to one centre's collections, with per-centre read accounting.
+
+    Batches and transactions come from the underlying client and accept the scoped references.
+    """
+
+    def __init__(self, client, tenant_id):
+        self.client = client
+        self.tenant_id = tenant_id or DEFAULT_TENANT
+        self.prefix = tenant_prefix(self.tenant_id)
+
+    def collection(self, name):
+        return _CountedQuery(self.client.collection(self.prefix + name), self)
+
+    def document(self, path):
+        return _CountedDocument(self.client.document(self.prefix + path), self)
+
+    def collection_group(self, name):
+        return _CountedQuery(self.client.collection_group(name).where(TENANT_FIELD, "==", self.tenant_id), self)
+
+    def get_all(self, refs, *args, **kwargs):
+        refs = [_unwrap(ref) for ref in refs]
+        started = time.monotonic()
+        snapshots = list(self.client.get_all(refs, *args, **kwargs))
+        self.record_reads(max(len(refs), 1), time.monotonic() - started)
+        return snapshots
+
+    def batch(self):
+        return self.client.batch()
+
+    def transaction(self, *args, **kwargs):
+        return self.client.transaction(*args, **kwargs)
+
+    def record_reads(self, documents, seconds):
+        record_usage(self.client, self.tenant_id, documents, seconds)
+
+def for_tenant(db, tenant_id):
+    """Returns a client scoped to `tenant_id` from any (scoped or root) client."""
+    return TenantClient(getattr(db, "client", db), tenant_id)
+
+# Cache hash for functions that take a client: entries are kept per centre.
+TENANT_HASH_FUNCS = {TenantClient: lambda db: db.tenant_id}
+
+# === READ ACCOUNTING ===
+
+def record_usage(client, tenant_id, documents, seconds):
+    """Adds reads of one query to a centre's counters; flushes them to Firestore every READS_FLUSH_SECONDS."""
+    with _usage_lock:
+        for usage in (_pending_usage, _process_usage):
+            counters = usage.setdefault(tenant_id, {"Reads": 0, "Queries": 0, "Read_Seconds": 0.0})
+            counters["Reads"] += documents
+            counters["Queries"] += 1
+            counters["Read_Seconds"] += seconds
+        due = time.time() - _last_flush[0] >= READS_FLUSH_SECONDS
+        if due:
+            _last_flush[0] = time.time()
+    if due:
+        threading.Thread(target=flush_usage, args=(client,), daemon=True).start()
+
+def flush_usage(client):
+    """Writes the counters gathered since the last flush to tenant_usage/<centre id>."""
+    from firebase_admin import firestore
+    with _usage_lock:
+        pending = dict(_pending_usage)
+        _pending_usage.clear()
+    day = date.today().isoformat()
+    try:
+        batch = client.batch()
+        for tenant_id, counters in pending.items():
+            increments = {field: firestore.Increment(value) for field, value in counters.items()}
+            batch.set(client.collection(TENANT_USAGE_COLLECTION).document(tenant_id),
+                      {**increments, "Daily": {day: increments}, "Updated_At": firestore.SERVER_TIMESTAMP}, merge=True)
+        batch.commit()
+    except Exception:
+        with _usage_lock:  # keep the counts for the next flush
+            for tenant_id, counters in pending.items():
+                merged = _pending_usage.setdefault(tenant_id, {"Reads": 0, "Queries": 0, "Read_Seconds": 0.0})
+                for field, value in counters.items():
+                    merged[field] += value
+
+def process_usage():
+    """Reads per centre by this server process since it started."""
+    with _usage_lock:
+        rows = [{"Centre": tenant_id, **counters} for tenant_id, counters in _process_usage.items()]
+    df = pd.DataFrame(rows, columns=["Centre", "Reads", "Queries", "Read_Seconds"])
+    df["Avg Query (ms)"] = (df["Read_Seconds"] / df["Queries"].where(df["Queries"] > 0) * 1000).round(1)
+    return df
+
+def load_tenant_usage(db, tenant_id=None):
+    """Returns a centre's flushed usage: all-time totals and the Daily map."""
+    client = getattr(db, "client", db)
+    snapshot = client.collection(TENANT_USAGE_COLLECTION).document(tenant_id or db.tenant_id).get()
+    return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+# === CENTRES ===
+
+def list_tenants(db):
+    """Returns {centre id: name} of every registered centre, the default centre first."""
+    client = getattr(db, "client", db)
+    tenants = {DEFAULT_TENANT: DEFAULT_TENANT_NAME}
+    for doc in client.collection(TENANTS_COLLECTION).stream():
+        tenants.setdefault(doc.id, (doc.to_dict() or {}).get("Name") or doc.id)
+    return tenants
+
+def register_tenant(db, tenant_id, name):
+    """Adds a centre to the registry; its collections are created by its first writes."""
+    if not TENANT_ID_PATTERN.match(tenant_id) or tenant_id == DEFAULT_TENANT:
+        raise ValueError(f"'{tenant_id}' is not a valid centre id (lower-case letters, digits, '-' and '_').")
+    from firestore_client import stamp_update
+    client = getattr(db, "client", db)
+    client.collection(TENANTS_COLLECTION).document(tenant_id).set(stamp_update({"Name": name}), merge=True)
+
+# === MAIN ===
+
+def main():
+    parser = argparse.ArgumentParser(description="List or register tuition centres.")
+    parser.add_argument("--list", action="store_true", help="List centres with their read usage")
+    parser.add_argument("--create", metavar="CENTRE_ID", help="Register a new centre")
+    parser.add_argument("--name", help="Display name of the new centre")
+    args = parser.parse_args()
+
+    from firestore_client import connect_to_firestore
+    db = connect_to_firestore()
+    if db is None:
+        return 1
+    if args.create:
+        register_tenant(db, args.create, args.name or args.create)
+        print(f"Registered centre '{args.create}'. Run its tools with CENTRE_ID={args.create}.")
+        return 0
+    rows = []
+    for tenant_id, name in list_tenants(db).items():
+        usage = load_tenant_usage(db, tenant_id)
+        queries = usage.get("Queries", 0)
+        rows.append({"Centre": tenant_id, "Name": name, "Path": tenant_prefix(tenant_id) or "(root)",
+                     "Reads": usage.get("Reads", 0), "Queries": queries,
+                     "Avg Query (ms)": round(usage.get("Read_Seconds", 0) / queries * 1000, 1) if queries else None})
+    print(pd.DataFrame(rows).to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""In-memory search index over users for the Principal's instruction sender.
+
+The index keeps a token -> doc_id map plus a sorted token list for prefix lookups, and is
+synced incrementally: each rerun hashes the user rows (vectorized) and only re-indexes rows
+whose hash changed, so searching stays instant with thousands of users.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+import pandas as pd
+
+# === CONFIGURATION ===
+INDEXED_FIELDS = ["User_Name", "Class", "Role", "Gmail_ID"]
+SEARCH_LIMIT = 50  # matches returned for a typed query
+
+# === NORMALIZATION ===
+
+def normalize(text):
+    """Case-folds and strips accents so 'Shukla', 'shukla' and 'SHUKLĀ' match."""
+    text = unicodedata.normalize("NFKD", str(text or "")).casefold()
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def tokenize(text):
+    """Splits normalized text into word tokens (Gmail IDs are split on '.', '_' and '@' too)."""
+    return [token for token in re.split(r"[^\w]+|_", normalize(text)) if token]
+
+# === INDEX ===
+
+class UserSearchIndex:
+    """Prefix and token search over users that resolves straight to Firestore doc ids."""
+
+    def __init__(self):
+        self.entries = {}         # doc_id -> {"display": str, "sort_key": str, "tokens": set}
+        self.row_hashes = {}      # doc_id -> hash of the indexed fields
+        self.postings = {}        # token -> set of doc_ids
+        self.sorted_tokens = []   # every token in postings, kept sorted for prefix search
+        self.lock = threading.Lock()  # the index is shared by every session of the tenant
+
+    def sync(self, df_users):
+        """Applies added, changed and removed users from the latest users DataFrame."""
+        if df_users.empty or "doc_id" not in df_users.columns:
+            with self.lock:
+                for doc_id in list(self.entries):
+                    self._remove(doc_id)
+            return
+        rows = df_users.reindex(columns=["doc_id"] + INDEXED_FIELDS).astype(object).fillna("").astype(str)
+        hashes = pd.util.hash_pandas_object(rows, index=False)
+        with self.lock:
+            current_ids = set()
+            for position, (doc_id, row_hash) in enumerate(zip(rows["doc_id"], hashes)):
+                current_ids.add(doc_id)
+                if self.row_hashes.get(doc_id) != row_hash:
+                    self._upsert(doc_id, rows.iloc[position].to_dict())
+                    self.row_hashes[doc_id] = row_hash
+            for doc_id in set(self.entries) - current_ids:
+                self._remove(doc_id)
+
+    def upsert(self, doc_id, user):
+        """Indexes (or re-indexes) one user."""
+        with self.lock:
+            self._upsert(doc_id, user)
+
+    def _upsert(self, doc_id, user):
+        self._remove(doc_id)
+        name = str(user.get("User_Name", "")).strip()
+        role = str(user.get("Role", "")).strip()
+        class_name = str(user.get("Class", "")).strip()
+        gmail = str(user.get("Gmail_ID", "")).strip()
+        display = f"{name} ({class_name})" if role == "Student" and class_name else name
+        display = f"{display} · {role} · {gmail}" if gmail else f"{display} · {role}"
+        tokens = set(tokenize(name)) | set(tokenize(class_name)) | set(tokenize(role)) | set(tokenize(gmail))
+        if gmail:
+            tokens.add(normalize(gmail))
+        self.entries[doc_id] = {"display": display, "sort_key": normalize(name), "tokens": tokens}
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                bisect.insort(self.sorted_tokens, token)
+            self.postings[token].add(doc_id)
+
+    def remove(self, doc_id):
+        """Drops one user from the index."""
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        entry = self.entries.pop(doc_id, None)
+        self.row_hashes.pop(doc_id, None)
+        if entry is None:
+            return
+        for token in entry["tokens"]:
+            doc_ids = self.postings.get(token)
+            if doc_ids is None:
+                continue
+            doc_ids.discard(doc_id)
+            if not doc_ids:
+                del self.postings[token]
+                position = bisect.bisect_left(self.sorted_tokens, token)
+                if position < len(self.sorted_tokens) and self.sorted_tokens[position] == token:
+                    self.sorted_tokens.pop(position)
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect.bisect_left(self.sorted_tokens, prefix)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+            matches |= self.postings[self.sorted_tokens[position]]
+            position += 1
+        return matches
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Returns doc ids whose tokens start with every query token, sorted by name.
+
+        An empty query lists every user; `limit` only caps the matches of a typed query.
+        """
+        query_tokens = tokenize(query)
+        with self.lock:
+            if not query_tokens:
+                doc_ids, limit = self.entries.keys(), None
+            else:
+                doc_ids = None
+                for token in query_tokens:
+                    matches = self._prefix_matches(token)
+                    doc_ids = matches if doc_ids is None else doc_ids & matches
+                    if not doc_ids:
+                        return []
+            return sorted(doc_ids, key=lambda doc_id: (self.entries[doc_id]["sort_key"], doc_id))[:limit]
+
+    def display_name(self, doc_id):
+        """Returns the label shown for a user in pickers."""
+        with self.lock:
+            entry = self.entries.get(doc_id)
+        return entry["display"] if entry else str(doc_id)